@@ -0,0 +1,457 @@
+import os
+import json
+import time
+import threading
+from contextlib import ExitStack, contextmanager
+from collections import defaultdict, deque
+
+import event_log
+import tracing
+import quota_coordinator
+
+
+def percentile(values, p):
+    """Nearest-rank `p`th percentile of values"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Hedger:
+    """Opt-in request hedging: duplicate a call that is slower than usual and keep the first response.
+
+    Latencies are tracked per stage (e.g. "optimal_response", "emotions"). Once a stage has min_samples
+    recent latencies, a call still running after the stage's `percentile` latency gets a duplicate request.
+    The first response to complete is used and the other request is closed as soon as it starts streaming,
+    so it stops generating output. At most max_share of all calls are hedged, which bounds the extra spend.
+    """
+
+    def __init__(self, enabled=False, percentile=95, max_share=0.1, min_samples=20, window=200, max_workers=64):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_share = max_share
+        self.min_samples = min_samples
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+        self.lock = threading.Lock()
+        self.max_workers = max_workers
+        self.executor = None
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def configure(self, enabled=True, percentile=None, max_share=None, min_samples=None):
+        self.enabled = enabled
+        if percentile is not None:
+            self.percentile = percentile
+        if max_share is not None:
+            self.max_share = max_share
+        if min_samples is not None:
+            self.min_samples = min_samples
+        return self
+
+    def record_latency(self, stage, seconds):
+        with self.lock:
+            self.latencies[stage].append(seconds)
+
+    def threshold(self, stage):
+        """The stage's recent latency percentile, or None while there are too few samples"""
+        with self.lock:
+            recent = list(self.latencies[stage])
+        if len(recent) < self.min_samples:
+            return None
+        return percentile(recent, self.percentile)
+
+    def take_hedge(self):
+        """Reserve a hedge if that keeps hedged calls within max_share of all calls"""
+        with self.lock:
+            if self.hedged + 1 > self.max_share * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def stats(self):
+        with self.lock:
+            stages = list(self.latencies)
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedged_share": self.hedged / self.calls if self.calls else 0.0,
+            "thresholds": {stage: self.threshold(stage) for stage in stages},
+        }
+
+    def create(self, client, stage, request):
+        """Send the request, hedging it if it runs past the stage's latency threshold"""
+        with self.lock:
+            self.calls += 1
+        threshold = self.threshold(stage) if self.enabled else None
+        if threshold is None:
+            start = time.perf_counter()
+            message = send_request(client, request)
+            self.record_latency(stage, time.perf_counter() - start)
+            return message
+
+        # Imported here to keep startup fast when hedging is off
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        cancelled = threading.Event()
+        start = time.perf_counter()
+        # The primary gets a thread of its own, so it never queues in the pool behind slow copies that are still
+        # closing; the pool only runs hedge copies
+        futures = {run_in_thread(send_cancellable_request, client, request, cancelled): ("primary", start)}
+        done, _ = wait(futures, timeout=threshold)
+        if not done and self.take_hedge():
+            futures[self.executor.submit(send_cancellable_request, client, request, cancelled)] = (
+                "hedge", time.perf_counter()
+            )
+
+        error = None
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        message = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    kind, sent = futures[future]
+                    self.record_latency(stage, time.perf_counter() - sent)
+                    if kind == "hedge":
+                        with self.lock:
+                            self.hedge_wins += 1
+                    return message
+            raise error
+        finally:
+            # Stop the slower request
+            cancelled.set()
+
+
+def run_in_thread(function, *args):
+    """Run function(*args) on a new daemon thread and return a Future of its result"""
+    from concurrent.futures import Future
+
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def send_request(client, request):
+    """One Messages API call under the shared quota"""
+    with quota_coordinator.permit(request.get("system"), request["messages"]) as permit:
+        message = client.messages.create(**request)
+        permit.record(message.usage)
+    return message
+
+
+def partial_usage(stream=None):
+    """Usage of a stream closed early: the input tokens reported when it started and an estimate of the output
+    generated so far (about 4 characters per token); nothing for a request that was never sent"""
+    from types import SimpleNamespace
+
+    try:
+        snapshot = stream.current_message_snapshot
+    except (AttributeError, AssertionError):
+        # Not sent, or closed before the first event
+        return SimpleNamespace(input_tokens=0, output_tokens=0)
+    text = "".join(getattr(block, "text", "") or "" for block in snapshot.content)
+    return SimpleNamespace(
+        input_tokens=snapshot.usage.input_tokens,
+        cache_creation_input_tokens=getattr(snapshot.usage, "cache_creation_input_tokens", 0),
+        output_tokens=max(snapshot.usage.output_tokens or 0, len(text) // 4),
+    )
+
+
+def send_cancellable_request(client, request, cancelled):
+    """Like send_request, but streamed so the request can be dropped once another copy has won.
+
+    A dropped copy returns None; the tokens it used up to that point are still charged to the quota.
+    """
+    with quota_coordinator.permit(request.get("system"), request["messages"]) as permit:
+        if cancelled.is_set():
+            permit.record(partial_usage())
+            return None
+        with client.messages.stream(**request) as stream:
+            for _ in stream:
+                if cancelled.is_set():
+                    permit.record(partial_usage(stream))
+                    # Leaving the block closes the connection, which stops the generation
+                    return None
+            message = stream.get_final_message()
+        permit.record(message.usage)
+    return message
+
+
+class CircuitBreaker:
+    """Circuit breaker shared by every API call of the process, for overload errors (HTTP 529).
+
+    closed: calls are sent. After failure_threshold consecutive overload errors the breaker opens.
+    open: no call is sent; callers wait until the cooldown (open_seconds, doubling while the API stays
+    overloaded, up to max_open_seconds) is over, then the breaker becomes half-open.
+    half_open: a single probe request is sent while the others keep waiting; success closes the breaker,
+    another overload error opens it again.
+    A call that fails with an overload error is requeued (sent again once admitted) instead of failing,
+    for up to max_wait seconds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, open_seconds=10, max_open_seconds=120, max_wait=1800):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.max_wait = max_wait
+        self.condition = threading.Condition()
+        self.state = self.CLOSED
+        self.consecutive_overloads = 0
+        self.cooldown = open_seconds
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.overloads = 0
+        self.requeued = 0
+        # The most recent state changes, for run metrics
+        self.transitions = deque(maxlen=100)
+
+    def transition(self, state, reason):
+        """Change state (with the condition held) and record the transition"""
+        self.transitions.append({"time": time.time(), "from": self.state, "to": state, "reason": reason})
+        event_log.log(event_log.WARNING if state == self.OPEN else event_log.INFO, "breaker_transition",
+                      f"Circuit breaker {self.state} -> {state}: {reason}",
+                      from_state=self.state, to_state=state, reason=reason)
+        self.state = state
+        self.condition.notify_all()
+
+    def trip(self, reason):
+        self.open_until = time.monotonic() + self.cooldown
+        self.transition(self.OPEN, f"{reason}; pausing all calls for {self.cooldown:.0f}s")
+
+    def admit(self, deadline):
+        """Block until a call may be sent; returns True if the call is the half-open probe"""
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.state == self.OPEN and now >= self.open_until:
+                    self.transition(self.HALF_OPEN, "cooldown over, probing with one request")
+                if self.state == self.CLOSED:
+                    return False
+                if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                    self.probe_in_flight = True
+                    return True
+                if now >= deadline:
+                    raise TimeoutError(f"API still overloaded after waiting {self.max_wait}s")
+                wait_time = self.open_until - now if self.state == self.OPEN else 1.0
+                self.condition.wait(max(0.05, min(wait_time, deadline - now)))
+
+    def record_success(self, probe):
+        with self.condition:
+            self.consecutive_overloads = 0
+            if probe:
+                self.probe_in_flight = False
+                self.cooldown = self.open_seconds
+                self.transition(self.CLOSED, "probe succeeded")
+
+    def record_overload(self, probe):
+        with self.condition:
+            self.overloads += 1
+            self.requeued += 1
+            if probe:
+                self.probe_in_flight = False
+                self.cooldown = min(self.cooldown * 2, self.max_open_seconds)
+                self.trip("probe was rejected as overloaded")
+            elif self.state == self.CLOSED:
+                self.consecutive_overloads += 1
+                if self.consecutive_overloads >= self.failure_threshold:
+                    self.trip(f"{self.consecutive_overloads} overload errors in a row")
+
+    def record_error(self, probe):
+        """Any other error says nothing about overload: let another call probe"""
+        if probe:
+            with self.condition:
+                self.probe_in_flight = False
+                self.condition.notify_all()
+
+    def call(self, send):
+        """Run send() (one API call) once the breaker admits it, requeueing it on overload errors"""
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            probe = self.admit(deadline)
+            try:
+                result = send()
+            except Exception as e:
+                if getattr(e, "status_code", None) == 529:
+                    self.record_overload(probe)
+                    continue
+                self.record_error(probe)
+                raise
+            self.record_success(probe)
+            return result
+
+    def stats(self):
+        with self.condition:
+            return {
+                "state": self.state,
+                "overloads": self.overloads,
+                "requeued": self.requeued,
+                "transitions": list(self.transitions),
+            }
+
+    def report(self):
+        """One-line summary for the end of a run"""
+        stats = self.stats()
+        opened = sum(1 for t in stats["transitions"] if t["to"] == self.OPEN)
+        return (f"Circuit breaker: {stats['state']}, opened {opened} times, "
+                f"{stats['overloads']} overload errors, {stats['requeued']} calls requeued")
+
+
+# Request settings a route can override for a stage
+ROUTE_KEYS = {"model": str, "max_tokens": int, "temperature": float}
+
+
+class Router:
+    """Per-stage model routing: maps a stage (e.g. "score", "optimal_response") to a model, max_tokens and
+    temperature. Stages without a route keep the values set at their call site.
+
+    Routes come from a JSON file ({"score": {"model": "...", "max_tokens": 300}, ...}), EQ_ROUTING naming such
+    a file, or "stage.key=value" overrides from the command line.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = {stage: dict(route) for stage, route in (routes or {}).items()}
+        self.env_loaded = False
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as f:
+            for stage, route in json.load(f).items():
+                for key, value in route.items():
+                    self.set(stage, key, value)
+        return self
+
+    def set(self, stage, key, value):
+        if key not in ROUTE_KEYS:
+            raise ValueError(f"Unknown route setting {key!r} for stage {stage!r} (use {', '.join(ROUTE_KEYS)})")
+        self.routes.setdefault(stage, {})[key] = ROUTE_KEYS[key](value)
+
+    def set_from_spec(self, spec):
+        """Apply a stage.key=value override, e.g. score.model=claude-3-5-haiku-20241022"""
+        name, _, value = spec.partition("=")
+        stage, _, key = name.partition(".")
+        if not (stage and key and value):
+            raise ValueError(f"Invalid route {spec!r}: expected stage.key=value")
+        self.set(stage, key, value)
+
+    def apply(self, stage, request):
+        """The request with the stage's route applied"""
+        if not self.env_loaded:
+            self.env_loaded = True
+            if os.getenv("EQ_ROUTING"):
+                self.load(os.getenv("EQ_ROUTING"))
+        route = self.routes.get(stage)
+        return dict(request, **route) if route else request
+
+
+def add_routing_arguments(parser):
+    parser.add_argument('--routing', type=str, default=None,
+                        help='JSON file mapping stages to a model, max_tokens and temperature (also EQ_ROUTING)')
+    parser.add_argument('--route', type=str, action='append', default=[],
+                        help='Route override stage.key=value, e.g. score.model=claude-3-5-haiku-20241022 (repeatable)')
+
+
+def apply_routing_arguments(args):
+    if args.routing:
+        router.load(args.routing)
+    for spec in args.route:
+        router.set_from_spec(spec)
+
+
+class StageUsage:
+    """Calls, latency and tokens per stage, for run metrics and the routing benchmark"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0})
+
+    def record(self, stage, seconds, usage, model=None):
+        with self.lock:
+            totals = self.stages[stage]
+            totals["model"] = model
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            totals["input_tokens"] += sum(getattr(usage, key, 0) or 0 for key in (
+                "input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"
+            ))
+            totals["output_tokens"] += getattr(usage, "output_tokens", 0) or 0
+
+    def snapshot(self):
+        with self.lock:
+            return {stage: dict(totals) for stage, totals in self.stages.items()}
+
+
+# Hedging is off unless EQ_HEDGE=1 or a script enables it with hedging.configure()
+hedging = Hedger(enabled=os.getenv("EQ_HEDGE", "").lower() in ("true", "1", "yes"))
+breaker = CircuitBreaker()
+router = Router()
+stage_usage = StageUsage()
+
+
+def create_message(client, stage="default", **request):
+    """Send a Messages API request (the arguments of client.messages.create) and return the message.
+
+    This is the call path of every generator and interviewer request (stream_message for streamed replies):
+    the stage's route (if any) sets the model, max_tokens and temperature, the circuit breaker requeues calls
+    rejected as overloaded, the shared quota coordinator (when a budget is configured) admits each call, and
+    with hedging enabled slow calls are hedged. `stage` names the kind of call so each kind gets its own
+    routing and latency statistics.
+    """
+    request = router.apply(stage, request)
+    start = time.perf_counter()
+    with tracing.span(f"api_call:{stage}", model=request.get("model")) as trace_args:
+        message = breaker.call(lambda: hedging.create(client, stage, request))
+        if trace_args is not None:
+            trace_args["input_tokens"] = message.usage.input_tokens
+            trace_args["output_tokens"] = message.usage.output_tokens
+    seconds = time.perf_counter() - start
+    stage_usage.record(stage, seconds, message.usage, request.get("model"))
+    event_log.debug("api_call", stage=stage, model=request.get("model"), seconds=round(seconds, 3),
+                    input_tokens=message.usage.input_tokens, output_tokens=message.usage.output_tokens)
+    return message
+
+
+@contextmanager
+def stream_message(client, stage="default", **request):
+    """Open a streamed Messages API request (the arguments of client.messages.stream) and yield the stream.
+
+    Like create_message without hedging: the stage's route applies, the request is admitted by the circuit
+    breaker (a stream rejected as overloaded when it opens is requeued) and the quota coordinator, and the
+    usage is recorded once the caller has read the stream to the end.
+    """
+    request = router.apply(stage, request)
+    start = time.perf_counter()
+    with tracing.span(f"api_call:{stage}", model=request.get("model"), stream=True) as trace_args, \
+            ExitStack() as stack:
+        def open_stream():
+            permit = stack.enter_context(quota_coordinator.permit(request.get("system"), request["messages"]))
+            return permit, stack.enter_context(client.messages.stream(**request))
+
+        permit, stream = breaker.call(open_stream)
+        yield stream
+        usage = stream.get_final_message().usage
+        permit.record(usage)
+        if trace_args is not None:
+            trace_args["input_tokens"] = usage.input_tokens
+            trace_args["output_tokens"] = usage.output_tokens
+    seconds = time.perf_counter() - start
+    stage_usage.record(stage, seconds, usage, request.get("model"))
+    event_log.debug("api_call", stage=stage, model=request.get("model"), seconds=round(seconds, 3),
+                    input_tokens=usage.input_tokens, output_tokens=usage.output_tokens, stream=True)
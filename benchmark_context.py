@@ -0,0 +1,110 @@
+import os
+import time
+import argparse
+
+from mock_anthropic_server import start_mock_server
+
+# Scripted candidate replies, cycled for long interviews
+CANDIDATE_REPLIES = [
+    "I have eight years of experience in product management, mostly in B2B SaaS.",
+    "For market positioning, I typically analyze competitors and identify gaps in their offering.",
+    "When calculating TAM, I start with the total market size and narrow down by segment and region.",
+    "My MRDs focus on the customer problem, and the PRD then breaks it down into requirements engineering can size.",
+    "With engineering I run weekly syncs and keep a shared roadmap so tradeoffs are visible early.",
+    "For launch we had a beta program with ten design partners before general availability.",
+    "End of life is mostly about communication, migration paths and support commitments.",
+]
+
+
+# Interviewer options for each benchmarked mode
+MODES = {
+    "full": {"prompt_caching": False},
+    "cached": {"prompt_caching": True},
+    "bounded": {"prompt_caching": False, "context_turns": 4},
+    "bounded+cached": {"prompt_caching": True, "context_turns": 4},
+    "fused": {"prompt_caching": False, "fused": True},
+    "fused+cached": {"prompt_caching": True, "fused": True},
+}
+
+
+def input_cost(row):
+    """Prompt cost in base input-token units (cache writes cost 1.25x, cache reads 0.1x)."""
+    return row["input_tokens"] + 1.25 * row["cache_creation_input_tokens"] + 0.1 * row["cache_read_input_tokens"]
+
+
+def run_session(num_turns, **interviewer_options):
+    """Run a scripted interview and return per-turn token usage and latency rows."""
+    from emotional_interviewer import Interviewer
+
+    interviewer = Interviewer(**interviewer_options)
+    rows = []
+    for turn in range(num_turns):
+        reply = CANDIDATE_REPLIES[turn % len(CANDIDATE_REPLIES)]
+        start = time.perf_counter()
+        interviewer.get_response(reply)
+        row = dict(interviewer.usage_log[-1], turn=turn + 1, latency=time.perf_counter() - start)
+        row["prompt_tokens"] = row["input_tokens"] + row["cache_creation_input_tokens"] + row["cache_read_input_tokens"]
+        rows.append(row)
+    return rows
+
+
+def print_comparison(results, every=5):
+    """Print per-turn prompt tokens, prompt cost and latency for each mode side by side."""
+    header = f"{'turn':>5}"
+    for mode in results:
+        header += f" | {mode + ' tokens':>21} {'cost':>7} {'s':>5}"
+    print(header)
+    num_turns = len(next(iter(results.values())))
+    for i in range(num_turns):
+        turn = i + 1
+        if turn == 1 or turn % every == 0 or turn == num_turns:
+            line = f"{turn:>5}"
+            for rows in results.values():
+                line += f" | {rows[i]['prompt_tokens']:>21} {input_cost(rows[i]):>7.0f} {rows[i]['latency']:>5.2f}"
+            print(line)
+
+    print("\nTotals over the interview:")
+    for mode, rows in results.items():
+        print(f"  {mode:>15}: prompt tokens={sum(r['prompt_tokens'] for r in rows)}, "
+              f"cache reads={sum(r['cache_read_input_tokens'] for r in rows)}, "
+              f"cache writes={sum(r['cache_creation_input_tokens'] for r in rows)}, "
+              f"prompt cost={sum(input_cost(r) for r in rows):.0f}, "
+              f"output tokens={sum(r['output_tokens'] for r in rows)}, "
+              f"calls={sum(r['calls'] for r in rows)}, "
+              f"latency={sum(r['latency'] for r in rows):.1f}s "
+              f"(mean {sum(r['latency'] for r in rows) / len(rows):.2f}s per turn)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark interviewer prompt size, prompt cost and latency as the interview grows')
+    parser.add_argument('--turns', type=int, default=40,
+                        help='Number of candidate turns per interview')
+    parser.add_argument('--context_turns', type=int, default=4,
+                        help='Turns kept verbatim in the bounded modes')
+    parser.add_argument('--budget', type=int, default=6000,
+                        help='Prompt token budget in the bounded modes')
+    parser.add_argument('--modes', type=str, default=",".join(MODES),
+                        help='Comma-separated modes to compare: ' + ", ".join(MODES))
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='Mock server base latency in seconds')
+    parser.add_argument('--input_token_delay', type=float, default=0.00002,
+                        help='Mock server seconds per uncached prompt token')
+
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, token_delay=0.0,
+                                         input_token_delay=args.input_token_delay)
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "mock")
+    # The mock API has no quota to share
+    os.environ.setdefault("EQ_QUOTA_DISABLED", "1")
+
+    print(f"Running {args.turns}-turn interviews against mock server at {base_url}\n")
+    results = {}
+    for mode in args.modes.split(","):
+        options = dict(MODES[mode])
+        if "context_turns" in options:
+            options.update(context_turns=args.context_turns, context_token_budget=args.budget)
+        results[mode] = run_session(args.turns, **options)
+    print_comparison(results)
+    server.shutdown()
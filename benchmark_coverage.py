@@ -0,0 +1,92 @@
+import io
+import os
+import json
+import random
+import argparse
+import tempfile
+import contextlib
+
+import api_client
+import event_log
+import generate_eq_training_data as generator
+from coverage_planner import CoveragePlanner
+from mock_anthropic_server import start_mock_server
+from benchmark_routing import SAMPLE_SCENARIOS
+
+DEFAULT_QUOTAS = '{"persona": 4, "stage": 8, "emotion": 4}'
+
+
+def write_scenarios(path, per_persona, seed):
+    """Scenarios for every persona, in random order (as --max_scenarios samples them)"""
+    import pandas as pd
+
+    rows = []
+    for persona in generator.persona_map:
+        for i in range(per_persona):
+            sample = SAMPLE_SCENARIOS[(len(rows)) % len(SAMPLE_SCENARIOS)]
+            rows.append({"scenario": f"{sample['scenario']} (case {len(rows) + 1})",
+                         "conversation_needed": sample["conversation_needed"], "persona": persona})
+    random.Random(seed).shuffle(rows)
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def run(workdir, quotas, steer, per_persona, variations, seed):
+    """One generation run until the quotas are filled (or the scenarios run out); returns its coverage stats"""
+    input_file = os.path.join(workdir, f"scenarios_{seed}.csv")
+    write_scenarios(input_file, per_persona, seed)
+    planner = CoveragePlanner(quotas, personas=list(generator.persona_map), steer=steer)
+    before = api_client.stage_usage.snapshot()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        generator.process_scenarios_with_variations(
+            input_file, os.path.join(workdir, f"out_{seed}_{steer}.csv"), variations_per_scenario=variations,
+            planner=planner, variation_pause=0, scenario_pause=0,
+        )
+    after = api_client.stage_usage.snapshot()
+    usage = {key: sum(totals[key] - before.get(stage, {}).get(key, 0) for stage, totals in after.items())
+             for key in ("calls", "input_tokens", "output_tokens")}
+    return {**usage, "rows": planner.rows, "useful_rows": planner.useful_rows, "skipped": planner.skipped,
+            "filled": len(planner.filled()), "buckets": sum(len(q) for q in planner.quotas.values()),
+            "complete": planner.complete()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the calls needed to fill coverage quotas with and without steering')
+    parser.add_argument('--quotas', type=str, default=DEFAULT_QUOTAS,
+                        help='Coverage quotas as inline JSON')
+    parser.add_argument('--scenarios_per_persona', type=int, default=4,
+                        help='Input scenarios per persona')
+    parser.add_argument('--variations', type=int, default=10,
+                        help='Variations per scenario (--variations of generate_eq_training_data.py)')
+    parser.add_argument('--trials', type=int, default=3,
+                        help='Runs per mode, each with its own scenario order')
+    parser.add_argument('--hint_compliance', type=float, default=0.85,
+                        help='Share of mock variations that meet the coverage targets in their prompt')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='Mock server time to first token in seconds')
+
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, token_delay=0.0, hint_compliance=args.hint_compliance)
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "mock")
+    # The mock API has no quota to share
+    os.environ.setdefault("EQ_QUOTA_DISABLED", "1")
+    event_log.configure(console_level="error")
+
+    quotas = json.loads(args.quotas)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode, steer in (("untargeted", False), ("targeted", True)):
+            runs = [run(workdir, quotas, steer, args.scenarios_per_persona, args.variations, seed)
+                    for seed in range(args.trials)]
+            results[mode] = {key: sum(r[key] for r in runs) / len(runs) for key in runs[0]}
+    server.shutdown()
+
+    print(f"Quotas {args.quotas}, {args.scenarios_per_persona} scenarios per persona, {args.variations} variations "
+          f"per scenario, mean of {args.trials} runs (mock hint compliance {args.hint_compliance:.0%})")
+    print(f"{'mode':<12}{'calls':>7}{'rows':>7}{'useful':>8}{'skipped':>9}{'filled':>10}{'complete':>10}"
+          f"{'calls/quota':>13}{'out tokens':>12}")
+    for mode, r in results.items():
+        print(f"{mode:<12}{r['calls']:>7.1f}{r['rows']:>7.1f}{r['useful_rows']:>8.1f}{r['skipped']:>9.1f}"
+              f"{r['filled']:>6.1f}/{r['buckets']:<3.0f}{r['complete']:>10.0%}"
+              f"{r['calls'] / max(1, r['filled']):>13.2f}{r['output_tokens']:>12.0f}")
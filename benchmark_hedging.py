@@ -0,0 +1,98 @@
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_anthropic_server import start_mock_server
+
+# The mock API has no quota to share
+os.environ["EQ_QUOTA_DISABLED"] = "1"
+
+import api_client
+from api_client import percentile
+
+PROMPT = (
+    "Generate the optimal next response for the conversation below, demonstrating emotional intelligence.\n"
+    + "The manager interrupted again and the room went quiet. " * 40
+)
+
+
+def run_calls(base_url, server, num_calls, concurrency, hedge, hedge_percentile, max_share):
+    """Send num_calls requests through api_client and return latency and token statistics"""
+    from anthropic import Anthropic
+
+    client = Anthropic(api_key="mock", base_url=base_url)
+    api_client.hedging = api_client.Hedger(enabled=hedge, percentile=hedge_percentile, max_share=max_share)
+    log_start = len(server.request_log)
+
+    def call(_):
+        start = time.perf_counter()
+        api_client.create_message(
+            client,
+            stage="optimal_response",
+            model="claude-3-5-sonnet-20240620",
+            max_tokens=1000,
+            system="You are an expert in emotional intelligence.",
+            messages=[{"role": "user", "content": PROMPT}],
+        )
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(call, range(num_calls)))
+    # Let cancelled streams record how far they got
+    time.sleep(0.5)
+
+    requests = server.request_log[log_start:]
+    tokens = sum(r["input_tokens"] + r["output_tokens"] for r in requests)
+    stats = api_client.hedging.stats()
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+        "requests": len(requests),
+        "tokens": tokens,
+        "hedged": stats["hedged"],
+        "hedge_wins": stats["hedge_wins"],
+        "cancelled": sum(1 for r in requests if r.get("cancelled")),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure tail latency and extra tokens of request hedging on the mock API')
+    parser.add_argument('--calls', type=int, default=400,
+                        help='Number of calls per run')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Calls in flight at once')
+    parser.add_argument('--latency', type=float, default=0.3,
+                        help='Normal time to first token of the mock API in seconds')
+    parser.add_argument('--tail_share', type=float, default=0.03,
+                        help='Share of mock requests that are slow outliers')
+    parser.add_argument('--tail_latency', type=float, default=3.0,
+                        help='Extra seconds of a slow outlier')
+    parser.add_argument('--percentile', type=float, default=95,
+                        help='Hedge calls still running after this percentile of recent latency')
+    parser.add_argument('--max_share', type=float, default=0.1,
+                        help='Maximum share of calls that are hedged')
+
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, token_delay=0.002,
+                                         tail_share=args.tail_share, tail_latency=args.tail_latency)
+    print(f"Mock API: {args.latency}s to first token, {args.tail_share:.0%} of requests +{args.tail_latency}s")
+
+    results = {}
+    for name, hedge in (("no hedging", False), ("hedging", True)):
+        results[name] = run_calls(base_url, server, args.calls, args.concurrency, hedge,
+                                  args.percentile, args.max_share)
+
+    print(f"\n{'':<12}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'requests':>10}{'hedged':>8}{'won':>6}{'tokens':>10}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['p50']:>7.2f}s{r['p95']:>7.2f}s{r['p99']:>7.2f}s{r['max']:>7.2f}s"
+              f"{r['requests']:>10}{r['hedged']:>8}{r['hedge_wins']:>6}{r['tokens']:>10}")
+
+    base, hedged = results["no hedging"], results["hedging"]
+    print(f"\np99 latency: {base['p99']:.2f}s -> {hedged['p99']:.2f}s "
+          f"({1 - hedged['p99'] / base['p99']:.0%} lower)")
+    print(f"Extra tokens: {hedged['tokens'] - base['tokens']} "
+          f"({hedged['tokens'] / base['tokens'] - 1:+.1%}), {hedged['cancelled']} hedged copies cancelled")
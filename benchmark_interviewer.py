@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from mock_anthropic_server import start_mock_server
+from api_client import percentile
+from benchmark_context import CANDIDATE_REPLIES, MODES, input_cost
+
+# Session lengths in turns
+DEFAULT_LENGTHS = (5, 20, 100)
+
+# Metrics compared with a baseline; a result is a regression when it is this much worse than the baseline
+REGRESSION_METRICS = ("p50", "p95", "p99", "prompt_tokens_per_call", "last_prompt_tokens_per_call", "peak_memory")
+
+
+def play_session(interviewer, num_turns):
+    """Run the scripted candidate replies through get_response; returns the latency of each turn"""
+    latencies = []
+    for turn in range(num_turns):
+        start = time.perf_counter()
+        interviewer.get_response(CANDIDATE_REPLIES[turn % len(CANDIDATE_REPLIES)])
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_session(num_turns, **interviewer_options):
+    """Drive one synthetic session through get_response; returns per-turn latency, prompt tokens and memory"""
+    from emotional_interviewer import Interviewer
+
+    # Warm up on a throwaway session: the first call imports the SDK and builds the shared client, which
+    # would otherwise count as the session's first-turn latency and peak memory
+    Interviewer(**interviewer_options).get_response(CANDIDATE_REPLIES[0])
+
+    # Latency and tokens come from an untraced session: tracemalloc slows every thread, the in-process mock
+    # server's included. Peak memory comes from a second, identical session (the seeded mock repeats its replies).
+    interviewer = Interviewer(**interviewer_options)
+    latencies = play_session(interviewer, num_turns)
+    tracemalloc.start()
+    play_session(Interviewer(**interviewer_options), num_turns)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    prompt_tokens_per_call = [
+        (u["input_tokens"] + u["cache_creation_input_tokens"] + u["cache_read_input_tokens"]) / max(1, u["calls"])
+        for u in interviewer.usage_log
+    ]
+    return {
+        "turns": num_turns,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "prompt_tokens_per_call": sum(prompt_tokens_per_call) / num_turns,
+        "last_prompt_tokens_per_call": prompt_tokens_per_call[-1],
+        "prompt_cost_per_turn": sum(input_cost(u) for u in interviewer.usage_log) / num_turns,
+        "calls_per_turn": sum(u["calls"] for u in interviewer.usage_log) / num_turns,
+        "peak_memory": peak_memory,
+    }
+
+
+def run_benchmark(modes, lengths):
+    """Run every mode at every session length; returns {mode: {length: result}}"""
+    results = {}
+    for mode in modes:
+        results[mode] = {}
+        for length in lengths:
+            results[mode][str(length)] = run_session(length, **MODES[mode])
+            print(f"{mode}: {length}-turn session done", file=sys.stderr)
+    return results
+
+
+def print_results(results):
+    print(f"{'mode':<16}{'turns':>6}{'p50':>8}{'p95':>8}{'p99':>8}{'tok/call':>10}{'last':>8}{'calls':>7}{'peak mem':>11}")
+    for mode, by_length in results.items():
+        for length, r in by_length.items():
+            print(f"{mode:<16}{length:>6}{r['p50']:>7.2f}s{r['p95']:>7.2f}s{r['p99']:>7.2f}s"
+                  f"{r['prompt_tokens_per_call']:>10.0f}{r['last_prompt_tokens_per_call']:>8.0f}"
+                  f"{r['calls_per_turn']:>7.1f}{r['peak_memory'] / 1e6:>9.2f}MB")
+
+
+def compare(results, baseline, tolerance):
+    """Print the metrics that are more than `tolerance` worse than the baseline; returns how many"""
+    regressions = 0
+    for mode, by_length in results.items():
+        for length, r in by_length.items():
+            base = baseline.get(mode, {}).get(length)
+            if base is None:
+                continue
+            for metric in REGRESSION_METRICS:
+                if base[metric] and r[metric] > base[metric] * (1 + tolerance):
+                    regressions += 1
+                    print(f"REGRESSION {mode} {length} turns {metric}: {base[metric]:.4g} -> {r[metric]:.4g} "
+                          f"({r[metric] / base[metric] - 1:+.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark interviewer turn latency, prompt tokens and memory as sessions grow')
+    parser.add_argument('--lengths', type=str, default=",".join(str(n) for n in DEFAULT_LENGTHS),
+                        help='Comma-separated session lengths in turns')
+    parser.add_argument('--modes', type=str, default="full,cached,fused",
+                        help='Comma-separated call modes: ' + ", ".join(MODES))
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Mock server time to first token in seconds')
+    parser.add_argument('--token_delay', type=float, default=0.001,
+                        help='Mock server seconds per output token')
+    parser.add_argument('--input_token_delay', type=float, default=0.00002,
+                        help='Mock server seconds per uncached prompt token')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Mock server seed, so every run gets the same replies')
+    parser.add_argument('--save', type=str, default=None,
+                        help='Save the results as a JSON baseline')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Compare with a saved baseline and exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative increase over the baseline')
+
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, token_delay=args.token_delay,
+                                         input_token_delay=args.input_token_delay, seed=args.seed)
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "mock")
+    # The mock API has no quota to share
+    os.environ.setdefault("EQ_QUOTA_DISABLED", "1")
+
+    lengths = [int(n) for n in args.lengths.split(",")]
+    results = run_benchmark(args.modes.split(","), lengths)
+    server.shutdown()
+    print_results(results)
+
+    if args.save:
+        config = {"latency": args.latency, "token_delay": args.token_delay, "input_token_delay": args.input_token_delay,
+                  "seed": args.seed}
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{regressions} metric(s) more than {args.tolerance:.0%} worse than {args.baseline}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
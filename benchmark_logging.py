@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+
+import event_log
+from mock_anthropic_server import start_mock_server
+from benchmark_routing import SAMPLE_SCENARIOS
+
+# Logging setups compared, in this order (once an event file is set it stays on for the later setups)
+SETUPS = {
+    "no logging": {"console_level": "error"},
+    "console": {"console_level": "info"},
+    "console+file": {"console_level": "info", "log": True, "sample_rate": 0.05},
+    "console+file, every preview": {"console_level": "info", "log": True, "sample_rate": 1.0},
+}
+
+# A prompt-sized text, as previewed by the generators
+PREVIEW_TEXT = "Given the following scenario, conversation history, and emotional intelligence profile, " * 20
+
+
+def write_scenarios(path, count):
+    import pandas as pd
+
+    rows = [SAMPLE_SCENARIOS[i % len(SAMPLE_SCENARIOS)] for i in range(count)]
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def run_pipeline(workdir, name, setup, input_file, workers):
+    """process_existing_scenarios with `workers` threads and no pauses; returns rows per minute.
+
+    Console output goes to a file, as when a run is redirected to a log file.
+    """
+    import process_existing_scenarios
+
+    slug = name.replace(" ", "_").replace(",", "").replace("+", "_")
+    event_log.configure(os.path.join(workdir, f"{slug}.jsonl") if setup.get("log") else None,
+                        setup["console_level"], setup.get("sample_rate"))
+    with open(os.path.join(workdir, f"{slug}_console.txt"), "w", encoding="utf-8", buffering=1) as console, \
+            contextlib.redirect_stdout(console), contextlib.redirect_stderr(console):
+        start = time.perf_counter()
+        rows = process_existing_scenarios.process_scenarios(
+            input_file, os.path.join(workdir, f"{slug}.csv"), workers=workers, pause=0
+        )
+        elapsed = time.perf_counter() - start
+        event_log.flush()
+    return len(rows) / (elapsed / 60)
+
+
+def emit_cost(workdir, threads, events_per_thread, mode):
+    """Seconds the callers spend emitting previews from `threads` threads at once (and the drain time after)"""
+    barrier = threading.Barrier(threads + 1)
+
+    def emit_print():
+        barrier.wait()
+        for _ in range(events_per_thread):
+            # What the generators printed for every call before
+            print("\n--- Prompt Preview (first 200 chars) ---")
+            print(PREVIEW_TEXT[:200] + "...")
+            print("--- End Prompt ---\n")
+
+    def emit_event_log():
+        barrier.wait()
+        for _ in range(events_per_thread):
+            with event_log.call_context(stage="benchmark"):
+                event_log.preview("prompt_preview", PREVIEW_TEXT, attempt=1)
+
+    with open(os.path.join(workdir, f"emit_{mode}.txt"), "w", encoding="utf-8", buffering=1) as console, \
+            contextlib.redirect_stdout(console):
+        workers = [threading.Thread(target=emit_print if mode == "print" else emit_event_log) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        emitted = time.perf_counter() - start
+        event_log.flush(timeout=60)
+        drained = time.perf_counter() - start
+    return emitted, drained
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure what logging costs the generators at high concurrency')
+    parser.add_argument('--scenarios', type=int, default=96,
+                        help='Scenarios per pipeline run')
+    parser.add_argument('--workers', type=int, default=32,
+                        help='Scenarios processed concurrently')
+    parser.add_argument('--repeats', type=int, default=2,
+                        help='Pipeline runs per setup (the best is reported)')
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help='Mock server time to first token in seconds')
+    parser.add_argument('--threads', type=int, default=32,
+                        help='Threads emitting events at once in the emit benchmark')
+    parser.add_argument('--events', type=int, default=2000,
+                        help='Previews emitted per thread in the emit benchmark')
+
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, token_delay=0.001, min_words=10, max_words=30)
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "mock")
+    # The mock API has no quota to share
+    os.environ.setdefault("EQ_QUOTA_DISABLED", "1")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        input_file = os.path.join(workdir, "scenarios.csv")
+        write_scenarios(input_file, args.scenarios)
+
+        # Untimed run first: imports and client creation would otherwise count against the first setup
+        run_pipeline(workdir, "warmup", SETUPS["no logging"], input_file, args.workers)
+        throughput = {}
+        for name, setup in SETUPS.items():
+            throughput[name] = max(run_pipeline(workdir, name, setup, input_file, args.workers)
+                                   for _ in range(args.repeats))
+            print(f"{name}: done", file=sys.stderr)
+        server.shutdown()
+
+        emits = {mode: emit_cost(workdir, args.threads, args.events, mode) for mode in ("print", "event_log")}
+
+    base = throughput["no logging"]
+    print(f"process_existing_scenarios, {args.scenarios} scenarios, {args.workers} workers, "
+          f"best of {args.repeats} (mock latency {args.latency}s)")
+    print(f"{'setup':<30}{'rows/min':>10}{'vs none':>9}")
+    for name, rows_per_minute in throughput.items():
+        print(f"{name:<30}{rows_per_minute:>10.1f}{rows_per_minute / base - 1:>+9.1%}")
+
+    total = args.threads * args.events
+    print(f"\n{args.threads} threads emitting {total} prompt previews")
+    print(f"{'mode':<12}{'callers':>10}{'per event':>11}{'written':>10}")
+    for mode, (emitted, drained) in emits.items():
+        print(f"{mode:<12}{emitted:>9.2f}s{emitted / total * 1e6:>9.1f}us{drained:>9.2f}s")
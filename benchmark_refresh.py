@@ -0,0 +1,93 @@
+import os
+import time
+import argparse
+
+from mock_anthropic_server import start_mock_server
+
+# A scripted interview: substantive answers mixed with the short acknowledgements real candidates send
+SCRIPT = [
+    "Hello, I'm here for the interview.",
+    "I have eight years of experience in product management, mostly in B2B SaaS.",
+    "ok, sure",
+    "For market positioning, I typically analyze competitors and identify gaps in their offering.",
+    "Yes.",
+    "Got it.",
+    "When calculating TAM, I start with the total market size and narrow down by segment and region.",
+    "Makes sense.",
+    "My MRDs focus on the customer problem, and the PRD then breaks it down into requirements engineering can size.",
+    "Sure, go ahead.",
+    "With engineering I run weekly syncs and keep a shared roadmap so tradeoffs are visible early.",
+    "Thanks.",
+    "For launch we had a beta program with ten design partners before general availability.",
+    "Okay.",
+    "End of life is mostly about communication, migration paths and support commitments.",
+    "Right.",
+]
+
+# Refresh policies compared; None regenerates emotions and thoughts for every message
+POLICIES = {
+    "always": None,
+    "lazy thoughts": {"min_words": 4, "refresh_every": 3, "score_threshold": 15},
+    "lazy thoughts+emotions": {"min_words": 4, "refresh_every": 3, "score_threshold": 15, "reuse_emotions": True},
+}
+
+
+def run_session(script, policy):
+    """Run the scripted interview; returns calls, per-turn latency and the refresh counts"""
+    from emotional_interviewer import Interviewer
+    from interviewer_refresh import RefreshPolicy
+
+    interviewer = Interviewer(refresh_policy=RefreshPolicy(**policy) if policy else None)
+    latencies = []
+    for text in script:
+        start = time.perf_counter()
+        interviewer.get_response(text)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "calls": sum(u["calls"] for u in interviewer.usage_log),
+        "input_tokens": sum(u["input_tokens"] + u["cache_read_input_tokens"] + u["cache_creation_input_tokens"]
+                            for u in interviewer.usage_log),
+        "seconds": sum(latencies),
+        "mean_latency": sum(latencies) / len(latencies),
+        "refresh_stats": interviewer.refresh_stats,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare interviewer calls and latency with and without a lazy refresh policy')
+    parser.add_argument('--sessions', type=int, default=3,
+                        help='Scripted sessions per policy')
+    parser.add_argument('--latency', type=float, default=0.3,
+                        help='Mock server time to first token in seconds')
+    parser.add_argument('--token_delay', type=float, default=0.002,
+                        help='Mock server seconds per output token')
+    parser.add_argument('--score_threshold', type=float, default=15,
+                        help='Emotion score change that forces a refresh (mock scores are random, so this often fires)')
+
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, token_delay=args.token_delay)
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "mock")
+    # The mock API has no quota to share
+    os.environ.setdefault("EQ_QUOTA_DISABLED", "1")
+
+    print(f"{len(SCRIPT)}-message scripted session, {args.sessions} sessions per policy\n")
+    results = {}
+    for name, policy in POLICIES.items():
+        if policy:
+            policy = dict(policy, score_threshold=args.score_threshold)
+        runs = [run_session(SCRIPT, policy) for _ in range(args.sessions)]
+        results[name] = {key: sum(r[key] for r in runs) / len(runs)
+                         for key in ("calls", "input_tokens", "seconds", "mean_latency")}
+        results[name]["refresh_stats"] = runs[-1]["refresh_stats"]
+
+    base = results["always"]
+    print(f"{'policy':<24}{'calls':>7}{'saved':>7}{'session':>9}{'saved':>8}{'per turn':>10}{'prompt tok':>12}")
+    for name, r in results.items():
+        print(f"{name:<24}{r['calls']:>7.0f}{base['calls'] - r['calls']:>7.0f}{r['seconds']:>8.1f}s"
+              f"{base['seconds'] - r['seconds']:>7.1f}s{r['mean_latency']:>9.2f}s{r['input_tokens']:>12.0f}")
+    for name, r in results.items():
+        if name != "always":
+            print(f"{name}: {r['refresh_stats']}")
+    server.shutdown()
@@ -0,0 +1,216 @@
+import io
+import os
+import json
+import time
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import api_client
+import generate_scenarios
+import generate_eq_training_data
+from emotional_interviewer import Interviewer, API_ERROR_REPLY, EMPTY_RESPONSE_REPLY
+
+STAGES = ("scenario", "variations", "optimal_response", "emotions", "score", "monologue", "reply")
+
+HAIKU = "claude-3-5-haiku-20241022"
+
+# Routings compared by default: today's models everywhere, a small model for the cheap stages, and everywhere
+CANDIDATE_ROUTINGS = {
+    "current": {},
+    "haiku_cheap_stages": {stage: {"model": HAIKU} for stage in ("variations", "emotions", "score", "monologue")},
+    "haiku_everywhere": {stage: {"model": HAIKU} for stage in STAGES},
+}
+
+# List prices in USD per million (input, output) tokens, matched by model family
+PRICES = {"haiku": (0.8, 4.0), "sonnet": (3.0, 15.0), "opus": (15.0, 75.0)}
+
+# Fixed inputs, so every routing answers the same requests
+SAMPLE_SCENARIOS = [
+    {
+        "scenario": "A team lead has to tell a senior engineer that the project they championed is being cancelled.",
+        "conversation_needed": "Deliver the news while keeping the engineer motivated and on the team.",
+        "persona": "Jordan",
+    },
+    {
+        "scenario": "Two co-founders disagree in front of investors about whether to raise prices.",
+        "conversation_needed": "Repair trust between the co-founders after the meeting without taking sides.",
+        "persona": "Taylor",
+    },
+    {
+        "scenario": "A nurse has to calm an anxious family member who has been waiting for news for five hours.",
+        "conversation_needed": "Acknowledge the frustration and set realistic expectations about the wait.",
+        "persona": "Riley",
+    },
+]
+SAMPLE_VARIATION = {
+    "variation_id": 1,
+    "variation_description": "The other person is defensive and interrupts often",
+    "conversation_objective": "Reach a shared understanding of next steps",
+    "conversation_history": "A: I wanted to talk about the plan.\nB: I already know what you are going to say.",
+    "current_emotional_state": "Defensive and hurt, but still willing to listen",
+    "conversation_point": "Right after B interrupted for the second time",
+}
+SAMPLE_TRANSCRIPT = [
+    "Hello, I'm here for the interview.",
+    "I have eight years of experience in product management, mostly in B2B SaaS.",
+    "For market positioning, I typically analyze competitors and identify gaps in their offering.",
+]
+SAMPLE_EMOTIONS = "I'm getting more interested in this candidate, their answers are concrete and thoughtful."
+
+
+def price_per_call(model, input_tokens, output_tokens):
+    input_price, output_price = next(
+        (prices for family, prices in PRICES.items() if family in (model or "")), PRICES["sonnet"]
+    )
+    return (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+
+def sample_interviewer():
+    """An Interviewer part-way through a fixed interview"""
+    interviewer = Interviewer()
+    for i, reply in enumerate(SAMPLE_TRANSCRIPT):
+        if i:
+            interviewer.turns.current.reply = "Thank you. Could you tell me more?"
+        interviewer.turns.start(reply)
+    return interviewer
+
+
+def run_stage(stage, index):
+    """Make the stage's one API call for sample `index` through the pipeline code; returns whether the
+    result passed the pipeline's own validation (JSON keys, tool schema, non-fallback text)"""
+    sample = SAMPLE_SCENARIOS[index % len(SAMPLE_SCENARIOS)]
+    if stage == "scenario":
+        persona = generate_scenarios.personas[index % len(generate_scenarios.personas)]
+        # A single attempt, so invalid replies count as invalid instead of being retried
+        return generate_scenarios.generate_scenario(persona, attempt=3, max_attempts=3) is not None
+    if stage == "variations":
+        return generate_eq_training_data.generate_diverse_conversation_histories(
+            sample["scenario"], sample["conversation_needed"], num_variations=3
+        ) is not None
+    if stage == "optimal_response":
+        persona_desc = generate_eq_training_data.persona_map[sample["persona"]]
+        return generate_eq_training_data.generate_optimal_response(
+            sample["scenario"], SAMPLE_VARIATION, persona_desc
+        ) is not None
+
+    interviewer = sample_interviewer()
+    if stage == "score":
+        try:
+            return 0 <= interviewer.generate_llm_emotion_score(SAMPLE_EMOTIONS) <= 100
+        except Exception:
+            return False
+    if stage == "emotions":
+        text = interviewer.generate_internal_emotions()
+    elif stage == "monologue":
+        text = interviewer.generate_internal_monologue()
+    else:
+        text = interviewer.call_anthropic_api(interviewer.prompt_messages())
+    return bool(text.strip()) and text not in (API_ERROR_REPLY, EMPTY_RESPONSE_REPLY)
+
+
+def benchmark_routing(name, routing, samples, concurrency):
+    """Run every stage on the samples with one routing; returns a record per stage"""
+    api_client.router = api_client.Router(routing)
+    records = []
+    for stage in STAGES:
+        before = api_client.stage_usage.snapshot().get(stage, {})
+
+        def timed(index):
+            start = time.perf_counter()
+            valid = run_stage(stage, index)
+            return valid, time.perf_counter() - start
+
+        # The pipeline prints its progress; keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(timed, range(samples)))
+
+        after = api_client.stage_usage.snapshot().get(stage, {})
+        records.append({
+            "routing": name,
+            "stage": stage,
+            "model": after.get("model"),
+            "samples": samples,
+            "valid": sum(1 for valid, _ in results if valid),
+            "latencies": [seconds for _, seconds in results],
+            "calls": after.get("calls", 0) - before.get("calls", 0),
+            "input_tokens": after.get("input_tokens", 0) - before.get("input_tokens", 0),
+            "output_tokens": after.get("output_tokens", 0) - before.get("output_tokens", 0),
+        })
+        print(f"{name}: {stage} done")
+    return records
+
+
+def print_report(records):
+    print(f"\n{'routing':<20}{'stage':<18}{'model':<28}{'p50':>7}{'max':>7}{'in tok':>8}{'out tok':>8}"
+          f"{'valid':>7}{'$/call':>10}")
+    totals = {}
+    for r in records:
+        latencies = sorted(r["latencies"])
+        calls = max(1, r["calls"])
+        cost = price_per_call(r["model"], r["input_tokens"], r["output_tokens"]) / calls
+        valid_rate = r["valid"] / r["samples"] if r["samples"] else 0.0
+        print(f"{r['routing']:<20}{r['stage']:<18}{(r['model'] or '-'):<28}{latencies[len(latencies) // 2]:>6.2f}s"
+              f"{latencies[-1]:>6.2f}s{r['input_tokens'] // calls:>8}{r['output_tokens'] // calls:>8}"
+              f"{valid_rate:>7.0%}{cost:>10.5f}")
+        total = totals.setdefault(r["routing"], {"seconds": 0.0, "cost": 0.0, "valid": 0, "samples": 0})
+        total["seconds"] += sum(latencies) / len(latencies)
+        total["cost"] += cost
+        total["valid"] += r["valid"]
+        total["samples"] += r["samples"]
+
+    print("\nOne call per stage:")
+    for routing, total in totals.items():
+        print(f"  {routing:<20} {total['seconds']:>6.2f}s  ${total['cost']:.5f}  "
+              f"{total['valid'] / max(1, total['samples']):.0%} valid")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare per-stage model routings on latency, tokens, cost and schema validity')
+    parser.add_argument('--routings', type=str, default=None,
+                        help='JSON file of candidate routings {"name": {"stage": {"model": ...}}} (default: built-in candidates)')
+    parser.add_argument('--samples', type=int, default=6,
+                        help='Requests per stage and routing')
+    parser.add_argument('--concurrency', type=int, default=6,
+                        help='Requests in flight at once within a stage')
+    parser.add_argument('--live', action='store_true',
+                        help='Call the real API instead of the local mock API (costs money)')
+    parser.add_argument('--save', type=str, default=None,
+                        help='Save the per-stage records to this JSON file')
+    parser.add_argument('--replay', type=str, default=None,
+                        help='Report on records saved by an earlier run (e.g. a --live run) without making calls')
+
+    args = parser.parse_args()
+
+    if args.replay:
+        with open(args.replay, encoding="utf-8") as f:
+            records = json.load(f)
+    else:
+        if not args.live:
+            from mock_anthropic_server import start_mock_server
+            server, base_url = start_mock_server(latency=0.3, token_delay=0.002)
+            os.environ["ANTHROPIC_BASE_URL"] = base_url
+            os.environ["ANTHROPIC_API_KEY"] = "mock"
+            # The mock API has no quota to share
+            os.environ["EQ_QUOTA_DISABLED"] = "1"
+            print(f"Using mock API server at {base_url} (validity is only meaningful with --live)")
+
+        routings = CANDIDATE_ROUTINGS
+        if args.routings:
+            with open(args.routings, encoding="utf-8") as f:
+                routings = json.load(f)
+
+        # Create the API clients up front so the first stage is not charged for it
+        generate_scenarios.get_client()
+        generate_eq_training_data.get_client()
+        sample_interviewer().get_client()
+
+        records = []
+        for name, routing in routings.items():
+            records.extend(benchmark_routing(name, routing, args.samples, args.concurrency))
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(records, f, indent=2)
+            print(f"Saved records to {args.save}")
+
+    print_report(records)
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+
+from mock_anthropic_server import start_mock_server
+from benchmark_context import CANDIDATE_REPLIES
+
+
+def measure_session_memory(service):
+    """Python heap bytes per resident session, measured by rebuilding copies of them under tracemalloc."""
+    from emotional_interviewer import Interviewer
+
+    states = [json.dumps(s.interviewer.get_state()) for s in service.sessions.values() if s.interviewer is not None]
+    if not states:
+        return None
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    copies = [Interviewer.from_state(json.loads(state)) for state in states]
+    traced = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del copies
+    return traced // len(states)
+
+
+async def run_benchmark(num_sessions, turns_per_session, concurrency, max_resident, idle_timeout, fused):
+    """Drive many concurrent scripted sessions through an InterviewService and return its stats."""
+    from interview_service import InterviewService, warm_up
+
+    warm_up()
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        service = InterviewService(concurrency, idle_timeout, max_resident, snapshot_dir)
+
+        session_ids = [await service.start_session(options={"fused": fused}) for _ in range(num_sessions)]
+
+        async def run_session(session_id, offset):
+            for turn in range(turns_per_session):
+                await service.turn(session_id, CANDIDATE_REPLIES[(turn + offset) % len(CANDIDATE_REPLIES)])
+                # Evict sessions that went idle while others were talking
+                await service.evict_idle()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_session(sid, i) for i, sid in enumerate(session_ids)))
+        wall_time = time.perf_counter() - start
+
+        stats = service.stats()
+        memory_per_session = measure_session_memory(service)
+        snapshot_bytes = sum(os.path.getsize(os.path.join(snapshot_dir, f)) for f in os.listdir(snapshot_dir))
+        service.executor.shutdown()
+        service.snapshot_executor.shutdown()
+
+    stats.update(
+        wall_time=wall_time,
+        turns_per_second=stats["turns_completed"] / wall_time,
+        python_bytes_per_resident_session=memory_per_session,
+        snapshot_bytes_per_evicted_session=snapshot_bytes // stats["evicted_sessions"] if stats["evicted_sessions"] else None,
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the multi-session interview service against the mock API')
+    parser.add_argument('--sessions', type=int, default=200,
+                        help='Number of simultaneous interview sessions')
+    parser.add_argument('--turns', type=int, default=5,
+                        help='Candidate turns per session')
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help='Global limit on turns processed at once')
+    parser.add_argument('--max_resident', type=int, default=100,
+                        help='Maximum number of sessions kept in memory')
+    parser.add_argument('--idle_timeout', type=float, default=300,
+                        help='Seconds of inactivity before a session is evicted')
+    parser.add_argument('--fused', action='store_true',
+                        help='Use the fused single-call turn mode')
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help='Mock server base latency in seconds')
+
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, token_delay=0.001)
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "mock")
+    # The mock API has no quota to share
+    os.environ.setdefault("EQ_QUOTA_DISABLED", "1")
+
+    print(f"Running {args.sessions} sessions x {args.turns} turns (concurrency {args.concurrency}, "
+          f"max resident {args.max_resident}) against mock server at {base_url}\n")
+    stats = asyncio.run(run_benchmark(args.sessions, args.turns, args.concurrency,
+                                      args.max_resident, args.idle_timeout, args.fused))
+    for key, value in stats.items():
+        print(f"{key:>36}: {value:.2f}" if isinstance(value, float) else f"{key:>36}: {value}")
+    server.shutdown()
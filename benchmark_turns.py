@@ -0,0 +1,91 @@
+import json
+import time
+import argparse
+import tracemalloc
+
+from interviewer_turns import TurnLog
+
+# Synthetic turn texts of typical length, varied per turn so strings are not shared between turns
+CANDIDATE = "I have eight years of experience in product management, mostly in B2B SaaS, turn {}."
+EMOTIONS = "I'm getting more interested in this candidate, their answers are concrete and thoughtful ({})."
+THOUGHTS = "Solid on positioning, but I still need a concrete example of a TAM calculation from turn {}."
+REPLY = "Thank you. Could you walk me through how you sized the market for your last launch? ({})"
+
+
+def legacy_session(num_turns):
+    """The interview as the message list it used to be, copied into conversation_history every turn"""
+    messages = []
+    conversation_history = []
+    turn_seconds = []
+    for i in range(num_turns):
+        start = time.perf_counter()
+        messages.append({"role": "user", "content": CANDIDATE.format(i)})
+        messages.append({"role": "assistant", "content": f"[emotions]{EMOTIONS.format(i)}[/emotions]"})
+        messages.append({"role": "assistant", "content": f"[thoughts]{THOUGHTS.format(i)}[/thoughts]"})
+        messages.append({"role": "assistant", "content": REPLY.format(i)})
+        conversation_history = messages.copy()
+        turn_seconds.append(time.perf_counter() - start)
+    return {"messages": messages, "conversation_history": conversation_history}, turn_seconds, messages
+
+
+def turn_log_session(num_turns):
+    """The interview as a TurnLog, building the message list before each of a turn's four calls"""
+    turns = TurnLog()
+    turn_seconds = []
+    for i in range(num_turns):
+        start = time.perf_counter()
+        turn = turns.start(CANDIDATE.format(i))
+        turns.messages()
+        turn.emotions = EMOTIONS.format(i)
+        turn.score = 50
+        turns.messages()
+        turn.thoughts = THOUGHTS.format(i)
+        turns.messages()
+        turn.reply = REPLY.format(i)
+        turns.view()
+        turn_seconds.append(time.perf_counter() - start)
+    return turns, turn_seconds, turns.messages()
+
+
+def measure(session, num_turns):
+    """Time a session, then run it again under tracemalloc (which slows it down) for its memory"""
+    start = time.perf_counter()
+    kept, turn_seconds, messages = session(num_turns)
+    total_seconds = time.perf_counter() - start
+    del kept, messages
+    tracemalloc.start()
+    kept, _, messages = session(num_turns)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    state = kept.to_state() if isinstance(kept, TurnLog) else kept["messages"]
+    return {
+        "memory": current,
+        "peak": peak,
+        "seconds": total_seconds,
+        "last_turn": sum(turn_seconds[-10:]) / 10,
+        "snapshot": len(json.dumps(state)),
+        "messages": [dict(m) for m in messages],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare memory and per-turn cost of the interviewer turn log with the old message list')
+    parser.add_argument('--turns', type=int, default=1000,
+                        help='Turns per synthetic session')
+    parser.add_argument('--sessions', type=int, default=5,
+                        help='Sessions per variant (the best run is reported)')
+
+    args = parser.parse_args()
+
+    results = {}
+    for name, session in (("message list", legacy_session), ("turn log", turn_log_session)):
+        runs = [measure(session, args.turns) for _ in range(args.sessions)]
+        results[name] = min(runs, key=lambda r: r["seconds"])
+
+    assert results["message list"]["messages"] == results["turn log"]["messages"], "Message lists differ"
+
+    print(f"{args.turns}-turn session")
+    print(f"{'':<14}{'memory':>10}{'peak':>10}{'total':>10}{'last turns':>12}{'snapshot':>10}")
+    for name, r in results.items():
+        print(f"{name:<14}{r['memory'] / 1e6:>8.2f}MB{r['peak'] / 1e6:>8.2f}MB{r['seconds'] * 1e3:>8.1f}ms"
+              f"{r['last_turn'] * 1e6:>10.1f}us{r['snapshot'] / 1e6:>8.2f}MB")
@@ -0,0 +1,74 @@
+import sys
+import random
+import argparse
+
+from emotion_scorer import LocalEmotionScorer
+
+# Feelings of an interviewer about a candidate, with the score the LLM would give them
+FEELINGS = [
+    ("really excited", 90), ("impressed", 85), ("pleased", 75), ("curious", 65), ("neutral", 50),
+    ("a bit bored", 40), ("unsure", 45), ("disappointed", 25), ("frustrated", 20), ("annoyed", 15),
+]
+REASONS = [
+    "the candidate's answer about market sizing", "how the candidate explained their product experience",
+    "the way the candidate avoided my question", "the candidate's vague description of their last role",
+    "the clear structure of the candidate's reasoning", "the candidate's examples of working with engineers",
+]
+TEMPLATES = [
+    "I am feeling {feeling} about {reason}. I think it is going well for now, and I am {feeling} now.",
+    "Honestly I'm {feeling} because of {reason}, and I feel {feeling} overall. It is what it is.",
+    "Compared to before, I'm getting {feeling} with {reason}. I think that is the main thing. I am {feeling} now.",
+    "At this point I feel {feeling}. It was {reason} that did it for me, so I am {feeling} now.",
+    "I was not sure at first, but now I am {feeling} about {reason}. That is how I feel about this so far.",
+]
+
+# Texts from outside the interview domain, made mostly of common words that the scorer knows: it has not seen
+# what they are about, so it should defer them to the LLM
+OUT_OF_DOMAIN = [
+    "I think that it is going to rain for most of the day, so now I am not sure what to do about the trip.",
+    "At first the recipe was not clear to me, but now I think the oven was too hot for the bread this time.",
+    "I was at the station for an hour because the train was late, and that is how it is with this line now.",
+]
+
+
+def in_domain_texts(count, seed=0):
+    """Synthetic (emotion text, score) pairs in the style of the interviewer's emotion monologues"""
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        feeling, score = rng.choice(FEELINGS)
+        text = rng.choice(TEMPLATES).format(feeling=feeling, reason=rng.choice(REASONS))
+        pairs.append((text, score + rng.randint(-5, 5)))
+    return pairs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check that the local emotion scorer scores interview emotion texts '
+                                                 'locally and defers out-of-domain texts to the LLM')
+    parser.add_argument('--model', type=str, default=None,
+                        help='Saved scorer to check (default: train one on synthetic interview emotion texts)')
+    parser.add_argument('--pairs', type=int, default=400,
+                        help='Synthetic training pairs when no model is given')
+
+    args = parser.parse_args()
+
+    if args.model:
+        scorer = LocalEmotionScorer.load(args.model)
+    else:
+        pairs = in_domain_texts(args.pairs)
+        scorer = LocalEmotionScorer().fit([text for text, _ in pairs], [score for _, score in pairs])
+
+    failures = 0
+    for kind, texts, wants_local in (("in domain", [text for text, _ in in_domain_texts(5, seed=1)], True),
+                                     ("out of domain", OUT_OF_DOMAIN, False)):
+        for text in texts:
+            score, confidence = scorer.predict(text)
+            local = confidence >= scorer.min_confidence
+            ok = local == wants_local
+            failures += not ok
+            print(f"{kind:<14} confidence {confidence:.2f} -> {'local' if local else 'LLM':<5} "
+                  f"{'ok' if ok else 'WRONG'}  {text[:60]}")
+
+    if failures:
+        print(f"\n{failures} text(s) routed the wrong way (min_confidence {scorer.min_confidence})")
+        sys.exit(1)
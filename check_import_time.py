@@ -0,0 +1,58 @@
+import sys
+import argparse
+import subprocess
+
+# Cumulative import time budget per module in milliseconds
+IMPORT_BUDGETS_MS = {
+    "emotional_interviewer": 100,
+    "generate_scenarios": 100,
+    "generate_eq_training_data": 100,
+    "process_existing_scenarios": 100,
+    "interviewer_context": 50,
+    "quota_coordinator": 50,
+    "emotion_scorer": 50,
+}
+
+
+def measure_import_ms(module, runs=3):
+    """Best-of-runs cumulative import time of a module in a fresh interpreter, from python -X importtime"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+        # Lines look like "import time:  self [us] | cumulative | imported package"
+        for line in result.stderr.splitlines():
+            parts = [part.strip() for part in line.split("|")]
+            if len(parts) == 3 and parts[2] == module:
+                cumulative_ms = int(parts[1]) / 1000
+                best = cumulative_ms if best is None else min(best, cumulative_ms)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fail if importing the scripts takes longer than their startup budget')
+    parser.add_argument('modules', type=str, nargs='*',
+                        help='Modules to check (default: all modules with a budget)')
+    parser.add_argument('--budget_ms', type=float, default=None,
+                        help='Override the budget of every checked module in milliseconds')
+    parser.add_argument('--runs', type=int, default=3,
+                        help='Imports per module; the fastest is compared with the budget')
+
+    args = parser.parse_args()
+
+    failures = 0
+    for module in args.modules or IMPORT_BUDGETS_MS:
+        budget = args.budget_ms or IMPORT_BUDGETS_MS.get(module, 100)
+        elapsed = measure_import_ms(module, args.runs)
+        ok = elapsed <= budget
+        failures += not ok
+        print(f"{module:<30} {elapsed:>8.1f} ms (budget {budget:.0f} ms) {'ok' if ok else 'TOO SLOW'}")
+
+    if failures:
+        print(f"\n{failures} module(s) over their import time budget. Move heavy imports and client "
+              "creation into the functions that need them.")
+        sys.exit(1)
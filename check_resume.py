@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+
+from mock_anthropic_server import start_mock_server
+from benchmark_routing import SAMPLE_SCENARIOS
+
+# Runs process_scenarios_with_variations without pauses, so the check does not wait on them
+RUN_SCRIPT = """
+import sys
+import generate_eq_training_data as generator
+input_file, output_file, variations, resume_from = sys.argv[1:5]
+generator.process_scenarios_with_variations(input_file, output_file, variations_per_scenario=int(variations),
+                                            resume_from=resume_from or None, variation_pause=0, scenario_pause=0)
+"""
+
+
+def write_scenarios(path, count):
+    import pandas as pd
+
+    rows = [dict(SAMPLE_SCENARIOS[i % len(SAMPLE_SCENARIOS)]) for i in range(count)]
+    for i, row in enumerate(rows):
+        row["scenario"] = f"{row['scenario']} (case {i + 1})"
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def start_run(env, input_file, output_file, variations, resume_from=""):
+    return subprocess.Popen(
+        [sys.executable, "-c", RUN_SCRIPT, input_file, output_file, str(variations), resume_from],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+
+
+def finish(process, timeout=300):
+    _, stderr = process.communicate(timeout=timeout)
+    if process.returncode != 0:
+        raise RuntimeError(f"Generator run failed with exit code {process.returncode}:\n{stderr}")
+
+
+def saved_rows(path):
+    """Row count of a checkpoint or output CSV (0 while it is not written yet)"""
+    import pandas as pd
+
+    try:
+        return len(pd.read_csv(path))
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return 0
+
+
+def row_keys(path):
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    return sorted(zip(df["scenario_hash"], df["variation_id"]))
+
+
+def interrupted_run(env, workdir, input_file, variations, after_rows, tag):
+    """SIGINT a run once its checkpoint holds `after_rows` rows, resume it, and return the resumed output's rows"""
+    checkpoint = os.path.join(workdir, f"interrupted_{tag}.csv")
+    process = start_run(env, input_file, checkpoint, variations)
+    while saved_rows(checkpoint) < after_rows:
+        if process.poll() is not None:
+            raise RuntimeError(f"Run finished before it saved {after_rows} rows; use more scenarios or variations")
+        time.sleep(0.01)
+    process.send_signal(signal.SIGINT)
+    finish(process)
+    saved = saved_rows(checkpoint)
+    resumed = os.path.join(workdir, f"resumed_{tag}.csv")
+    finish(start_run(env, input_file, resumed, variations, resume_from=checkpoint))
+    return saved, resumed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check that a generation run interrupted with SIGINT and resumed '
+                                                 'produces the same rows as an uninterrupted run (mock API)')
+    parser.add_argument('--scenarios', type=int, default=3,
+                        help='Input scenarios')
+    parser.add_argument('--variations', type=int, default=4,
+                        help='Variations per scenario')
+    parser.add_argument('--interrupt_after', type=int, nargs='+', default=[1, 5],
+                        help='Interrupt once the checkpoint holds this many rows (one run each)')
+    parser.add_argument('--latency', type=float, default=0.15,
+                        help='Mock server time to first token in seconds')
+
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, token_delay=0.0)
+    env = dict(os.environ, ANTHROPIC_BASE_URL=base_url, ANTHROPIC_API_KEY=os.getenv("ANTHROPIC_API_KEY", "mock"),
+               EQ_QUOTA_DISABLED="1")
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        input_file = os.path.join(workdir, "scenarios.csv")
+        write_scenarios(input_file, args.scenarios)
+
+        reference = os.path.join(workdir, "uninterrupted.csv")
+        finish(start_run(env, input_file, reference, args.variations))
+        expected = row_keys(reference)
+        print(f"Uninterrupted run: {len(expected)} rows")
+
+        for after_rows in args.interrupt_after:
+            saved, resumed = interrupted_run(env, workdir, input_file, args.variations, after_rows, after_rows)
+            rows = row_keys(resumed)
+            ok = rows == expected
+            failures += not ok
+            print(f"SIGINT after {after_rows} rows: {saved} saved, {len(rows)} after resume "
+                  f"{'ok' if ok else 'MISMATCH'}")
+    server.shutdown()
+
+    if failures:
+        print(f"\n{failures} interrupted run(s) did not resume to the uninterrupted output.")
+        sys.exit(1)
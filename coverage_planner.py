@@ -0,0 +1,224 @@
+import os
+import re
+import json
+
+import event_log
+
+# Conversation stages, by how much history comes before the point where the user responds
+STAGES = {
+    "none": "no prior exchanges (the issue is raised for the first time)",
+    "brief": "a brief history (one to three previous exchanges)",
+    "extensive": "an extensive history (many previous attempts over weeks or months)",
+}
+
+# Emotional-state families of the other party: the label used in prompts and the word stems that place a state
+EMOTION_FAMILIES = {
+    "anger": ("anger or frustration",
+              ("anger", "angry", "frustrat", "irritat", "annoyed", "furious", "resent", "impatien", "exasperat",
+               "hostil", "outrag")),
+    "defensiveness": ("defensiveness or distrust",
+                      ("defensive", "guarded", "dismissive", "dismissing", "resistant", "resisting", "skeptic",
+                       "suspicio", "distrust", "denial", "stubborn", "closed off")),
+    "fear": ("fear or anxiety",
+             ("anxious", "anxiety", "worried", "worry", "nervous", "afraid", "fear", "scared", "insecur",
+              "overwhelm", "panic", "apprehensi")),
+    "sadness": ("sadness or disappointment",
+                ("sad", "hurt", "disappoint", "discourag", "grief", "griev", "hopeless", "resign", "depress",
+                 "lonely", "giving up", "dejected")),
+    "shame": ("shame or embarrassment",
+              ("shame", "ashamed", "embarrass", "guilt", "humiliat", "self-conscious")),
+    "openness": ("openness or hope",
+                 ("open", "receptive", "hopeful", "relieved", "calm", "willing", "curious", "optimis", "grateful",
+                  "relaxed")),
+}
+
+# States that match no family are counted here
+OTHER = "other"
+
+_FAMILY_PATTERNS = {family: re.compile(r"\b(" + "|".join(re.escape(stem) for stem in stems) + ")")
+                    for family, (_, stems) in EMOTION_FAMILIES.items()}
+_NO_HISTORY = re.compile(r"^none\b|\b(no (prior|previous|past|earlier)|first (time|approach|conversation|contact)|"
+                         r"never (been )?(discussed|raised|talked|addressed)|not (yet )?(been )?(discussed|raised))")
+_ATTEMPT_COUNT = re.compile(r"\b(one|two|three|four|five|six|seven|eight|nine|ten|\d+) (?:\w+ )?"
+                            r"(attempts?|conversations?|discussions?|meetings?|exchanges?|times)\b")
+_EXTENSIVE = re.compile(r"\b(extensive|multiple|several|many|numerous|repeated|pattern|months?|weeks|years?|"
+                        r"various|ongoing|countless)\b")
+_NUMBERS = {word: n for n, word in enumerate(
+    ("zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten"))}
+
+
+def classify_stage(history, description=None):
+    """Conversation stage ("none", "brief" or "extensive") of a generated history (the description if it is empty)"""
+    text = history if isinstance(history, str) and history.strip() else description
+    if not isinstance(text, str) or not text.strip():
+        return "none"
+    text = text.lower()
+    if _NO_HISTORY.search(text):
+        return "none"
+    count = _ATTEMPT_COUNT.search(text)
+    if count:
+        number = count.group(1)
+        return "extensive" if _NUMBERS.get(number, int(number) if number.isdigit() else 0) > 3 else "brief"
+    return "extensive" if _EXTENSIVE.search(text) else "brief"
+
+
+def classify_emotion(state):
+    """Emotional-state family of a described state: the family with the most matching words (earliest on a tie)"""
+    if not isinstance(state, str):
+        return OTHER
+    text = state.lower()
+    best, best_key = OTHER, None
+    for family, pattern in _FAMILY_PATTERNS.items():
+        matches = [m.start() for m in pattern.finditer(text)]
+        if matches:
+            key = (len(matches), -matches[0])
+            if best_key is None or key > best_key:
+                best, best_key = family, key
+    return best
+
+
+def load_quotas(spec):
+    """Quotas from a JSON file, or from inline JSON such as '{"persona": 5, "stage": 10, "emotion": 5}'"""
+    if not spec.lstrip().startswith("{") and os.path.exists(spec):
+        with open(spec, encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(spec)
+
+
+class CoveragePlanner:
+    """Row quotas per persona, conversation stage and emotional-state family, filled as rows arrive.
+
+    `quotas` maps a dimension ("persona", "stage", "emotion") to {value: rows wanted}; a number instead of a
+    dict asks for that many rows of every value (every persona in `personas`, every stage or family). A row
+    counts toward one bucket of each dimension. When steering, the planner picks which persona to work on next,
+    asks for the missing stages and families in the variation prompt and turns down variations that would only
+    add to filled buckets; with steer=False it only tracks coverage, as in untargeted generation.
+    """
+
+    DIMENSIONS = ("persona", "stage", "emotion")
+
+    def __init__(self, quotas, personas=(), steer=True):
+        values = {"persona": list(personas), "stage": list(STAGES), "emotion": list(EMOTION_FAMILIES)}
+        self.quotas = {}
+        for dimension, quota in quotas.items():
+            if dimension not in values:
+                raise ValueError(f"Unknown coverage dimension {dimension!r} (use {', '.join(self.DIMENSIONS)})")
+            self.quotas[dimension] = dict(quota) if isinstance(quota, dict) else dict.fromkeys(values[dimension], quota)
+        self.counts = {dimension: dict.fromkeys(quota, 0) for dimension, quota in self.quotas.items()}
+        self.steer = steer
+        self.rows = 0
+        self.useful_rows = 0
+        self.skipped = 0
+
+    def classify(self, persona, variation=None):
+        """Buckets of a row: its persona and, for a generated variation, its stage and emotional-state family"""
+        buckets = {"persona": persona}
+        if variation is not None:
+            buckets["stage"] = classify_stage(variation.get("conversation_history"),
+                                              variation.get("variation_description"))
+            buckets["emotion"] = classify_emotion(variation.get("current_emotional_state"))
+        return buckets
+
+    def remaining(self, dimension, value):
+        quota = self.quotas.get(dimension, {}).get(value, 0)
+        return max(0, quota - self.counts[dimension].get(value, 0)) if quota else 0
+
+    def missing(self, dimension):
+        """{value: rows still wanted} of a dimension, largest first"""
+        needed = {value: self.remaining(dimension, value) for value in self.quotas.get(dimension, {})}
+        return dict(sorted(((v, n) for v, n in needed.items() if n), key=lambda item: -item[1]))
+
+    def useful(self, buckets):
+        """Whether a row in these buckets fills at least one bucket that is not full yet"""
+        return any(self.remaining(dimension, value) for dimension, value in buckets.items())
+
+    def record(self, buckets):
+        self.rows += 1
+        if self.useful(buckets):
+            self.useful_rows += 1
+        for dimension, value in buckets.items():
+            if dimension in self.counts:
+                self.counts[dimension][value] = self.counts[dimension].get(value, 0) + 1
+
+    def complete(self):
+        return not any(self.missing(dimension) for dimension in self.quotas)
+
+    def can_use(self, persona):
+        """Whether rows of this persona can still fill anything (their persona, or a stage or family bucket)"""
+        return bool(self.remaining("persona", persona)
+                    or any(self.missing(dimension) for dimension in self.quotas if dimension != "persona"))
+
+    def schedule(self, items, persona_of):
+        """Yield items until the quotas are filled.
+
+        When steering, each next item is the first one of the persona that needs the most rows, and items whose
+        rows could no longer fill anything are passed over. Otherwise items come in their own order.
+        """
+        remaining = list(items)
+        while remaining and not self.complete():
+            if self.steer:
+                remaining = [item for item in remaining if self.can_use(persona_of(item))]
+                if not remaining:
+                    return
+                needs = {persona_of(item): self.remaining("persona", persona_of(item)) for item in remaining}
+                persona = max(needs, key=needs.get)
+                item = next(item for item in remaining if persona_of(item) == persona)
+            else:
+                item = remaining[0]
+            remaining.remove(item)
+            yield item
+
+    def variations_wanted(self, persona, limit):
+        """Variations worth asking for in one prompt for a scenario of this persona (at most `limit`)"""
+        if not self.steer:
+            return limit
+        wanted = max([self.remaining("persona", persona)]
+                     + [sum(self.missing(dimension).values()) for dimension in ("stage", "emotion")])
+        return max(1, min(limit, wanted))
+
+    def variation_hint(self, num_variations):
+        """Prompt text assigning the missing stages and emotional-state families to the variations ("" if none)"""
+        if not self.steer:
+            return ""
+        stages, families = self.missing("stage"), self.missing("emotion")
+        if not stages and not families:
+            return ""
+        lines = []
+        for index in range(1, num_variations + 1):
+            stage = max(stages, key=stages.get) if stages and max(stages.values()) > 0 else None
+            family = max(families, key=families.get) if families and max(families.values()) > 0 else None
+            if stage:
+                stages[stage] -= 1
+            if family:
+                families[family] -= 1
+            stage_text = STAGES[stage] if stage in STAGES else "any conversation stage"
+            family_text = (f"the other party mainly feels {EMOTION_FAMILIES[family][0]}" if family in EMOTION_FAMILIES
+                           else "any emotional state")
+            lines.append(f"Variation {index}: {stage_text}; {family_text}")
+        return ("\nCOVERAGE TARGETS (these take precedence over the diversity guidance above; the "
+                "current_emotional_state must clearly show the named feeling):\n" + "\n".join(lines) + "\n")
+
+    def filled(self):
+        return [(dimension, value) for dimension, quota in self.quotas.items() for value in quota
+                if quota[value] and not self.remaining(dimension, value)]
+
+    def report(self, calls=None, title="Coverage:"):
+        """Log the coverage of every bucket and, given the API calls spent, the calls per filled quota"""
+        lines = [title]
+        for dimension, quota in self.quotas.items():
+            cells = [f"{value} {self.counts[dimension].get(value, 0)}/{wanted}" for value, wanted in quota.items()]
+            extra = {v: n for v, n in self.counts[dimension].items() if v not in quota}
+            if extra:
+                cells += [f"{value} {n}/-" for value, n in extra.items()]
+            lines.append(f"  {dimension:<8} " + ", ".join(cells))
+        buckets = sum(len(quota) for quota in self.quotas.values())
+        filled = len(self.filled())
+        summary = f"{filled}/{buckets} quotas filled with {self.rows} rows ({self.useful_rows} filling a quota"
+        summary += f", {self.skipped} variations turned down)" if self.skipped else ")"
+        if calls is not None:
+            summary += f"; {calls} calls, {calls / max(1, filled):.1f} calls per filled quota"
+        lines.append(summary)
+        result = {"filled": filled, "buckets": buckets, "rows": self.rows, "useful_rows": self.useful_rows,
+                  "skipped": self.skipped, "calls": calls, "complete": self.complete()}
+        event_log.info("coverage", "\n".join(lines), **result)
+        return result
@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import argparse
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"[a-z']+")
+
+
+def text_features(text):
+    """Lowercased word unigrams and bigrams of a text."""
+    words = TOKEN_PATTERN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class LocalEmotionScorer:
+    """Ridge regression over word unigram/bigram counts mapping emotion text to a 0-100 score.
+
+    predict() returns (score, confidence), where confidence is the share of the text's information the
+    model has seen in training: each word counts with its inverse document frequency, so words found in
+    most training texts (stopwords, common words) count for little and words never seen count the most.
+    The Interviewer falls back to the LLM when confidence < min_confidence.
+    """
+
+    def __init__(self, vocabulary=None, weights=None, bias=50.0, min_confidence=0.6, idf=None, documents=0):
+        self.vocabulary = {term: i for i, term in enumerate(vocabulary or [])}
+        self.weights = list(weights or [])
+        self.bias = bias
+        self.min_confidence = min_confidence
+        # Inverse document frequency of each vocabulary term; models saved without it weigh every word as 1
+        self.idf = list(idf) if idf else None
+        self.documents = documents
+        self.unknown_idf = math.log(1 + documents) if idf else 1.0
+
+    def predict(self, text):
+        """Return (score, confidence) for an emotion text"""
+        words = TOKEN_PATTERN.findall(text.lower())
+        if not words or not self.vocabulary:
+            return int(round(self.bias)), 0.0
+        vocabulary = self.vocabulary
+        weights = self.weights
+        idf = self.idf
+        score = self.bias
+        known_weight = unknown_weight = 0.0
+        for word in words:
+            index = vocabulary.get(word)
+            if index is not None:
+                score += weights[index]
+                known_weight += idf[index] if idf else 1.0
+            else:
+                unknown_weight += self.unknown_idf
+        for a, b in zip(words, words[1:]):
+            index = vocabulary.get(f"{a} {b}")
+            if index is not None:
+                score += weights[index]
+        total = known_weight + unknown_weight
+        return int(round(min(100.0, max(0.0, score)))), known_weight / total if total else 1.0
+
+    def fit(self, texts, scores, max_features=3000, min_count=2, alpha=1.0):
+        """Train on (emotion text, LLM score) pairs"""
+        import numpy as np
+
+        features = [text_features(text) for text in texts]
+        counts = Counter(term for terms in features for term in set(terms))
+        terms = [term for term, count in counts.most_common(max_features) if count >= min_count]
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.documents = len(texts)
+        self.idf = [math.log((1 + len(texts)) / (1 + counts[term])) for term in terms]
+        self.unknown_idf = math.log(1 + len(texts))
+
+        X = np.zeros((len(texts), len(terms)))
+        for row, text_terms in enumerate(features):
+            for term in text_terms:
+                index = self.vocabulary.get(term)
+                if index is not None:
+                    X[row, index] += 1
+        y = np.asarray(scores, dtype=float)
+        self.bias = float(y.mean())
+        y = y - self.bias
+
+        # Ridge regression, solved in whichever of the primal or dual form is smaller
+        if len(terms) <= len(texts):
+            weights = np.linalg.solve(X.T @ X + alpha * np.eye(len(terms)), X.T @ y)
+        else:
+            weights = X.T @ np.linalg.solve(X @ X.T + alpha * np.eye(len(texts)), y)
+        self.weights = weights.tolist()
+        return self
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "vocabulary": sorted(self.vocabulary, key=self.vocabulary.get),
+                "weights": self.weights,
+                "bias": self.bias,
+                "min_confidence": self.min_confidence,
+                "idf": self.idf,
+                "documents": self.documents,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["vocabulary"], data["weights"], data["bias"], data.get("min_confidence", 0.6),
+                   data.get("idf"), data.get("documents", 0))
+
+
+def load_pairs(paths):
+    """Load (emotion text, LLM score, LLM latency) triples from score logs or evaluation results.
+
+    Accepts the JSONL log written by Interviewer(emotion_score_log=...) and the Parquet/CSV results of
+    evaluate_interviewer.py (emotions and emotion_score columns; no latency).
+    """
+    pairs = []
+    for path in paths:
+        if path.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        pairs.append((record["text"], record["score"], record.get("latency")))
+        else:
+            import pandas as pd
+            df = pd.read_csv(path) if path.endswith(".csv") else pd.read_parquet(path)
+            df = df.dropna(subset=["emotions", "emotion_score"])
+            pairs.extend((text, score, None) for text, score in zip(df["emotions"], df["emotion_score"]))
+    return pairs
+
+
+def evaluate(scorer, pairs):
+    """Agreement with the LLM scores and scoring speed on held-out pairs"""
+    import numpy as np
+
+    predictions, confidences = [], []
+    start = time.perf_counter()
+    for text, _, _ in pairs:
+        score, confidence = scorer.predict(text)
+        predictions.append(score)
+        confidences.append(confidence)
+    seconds_per_score = (time.perf_counter() - start) / max(1, len(pairs))
+
+    llm_scores = np.array([score for _, score, _ in pairs], dtype=float)
+    predictions = np.array(predictions, dtype=float)
+    local = np.array(confidences) >= scorer.min_confidence
+    errors = np.abs(predictions - llm_scores)
+    latencies = [latency for _, _, latency in pairs if latency is not None]
+    llm_latency = float(np.mean(latencies)) if latencies else None
+    return {
+        "pairs": len(pairs),
+        "mae": float(errors.mean()),
+        "within_10": float((errors <= 10).mean()),
+        "correlation": float(np.corrcoef(predictions, llm_scores)[0, 1]) if len(pairs) > 1 else None,
+        "local_share": float(local.mean()),
+        "mae_when_local": float(errors[local].mean()) if local.any() else None,
+        "microseconds_per_score": seconds_per_score * 1e6,
+        "llm_seconds_per_score": llm_latency,
+        # Latency saved per turn: the LLM call is skipped for the turns answered locally
+        "seconds_saved_per_turn": llm_latency * float(local.mean()) - seconds_per_score if llm_latency else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train and evaluate the local emotion scorer from logged LLM scores')
+    parser.add_argument('inputs', type=str, nargs='+',
+                        help='Score logs (.jsonl) or evaluate_interviewer.py results (.parquet/.csv)')
+    parser.add_argument('--model', type=str, default="data/emotion_scorer.json",
+                        help='Where to save the trained model')
+    parser.add_argument('--min_confidence', type=float, default=0.6,
+                        help='Share of the text (words weighted by inverse document frequency) the model must know '
+                             'to score locally instead of calling the LLM')
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help='Share of pairs held out to report agreement with the LLM')
+    parser.add_argument('--alpha', type=float, default=1.0,
+                        help='Ridge regularization strength')
+
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.inputs)
+    random.Random(42).shuffle(pairs)
+    num_holdout = int(len(pairs) * args.holdout)
+    train_pairs, holdout_pairs = pairs[num_holdout:], pairs[:num_holdout]
+    print(f"Loaded {len(pairs)} (emotion text, score) pairs: {len(train_pairs)} train, {len(holdout_pairs)} held out")
+
+    scorer = LocalEmotionScorer(min_confidence=args.min_confidence)
+    scorer.fit([p[0] for p in train_pairs], [p[1] for p in train_pairs], alpha=args.alpha)
+    if holdout_pairs:
+        for key, value in evaluate(scorer, holdout_pairs).items():
+            print(f"{key:>24}: {value:.3f}" if isinstance(value, float) else f"{key:>24}: {value}")
+
+    # Train the saved model on every pair
+    scorer.fit([p[0] for p in pairs], [p[1] for p in pairs], alpha=args.alpha)
+    scorer.save(args.model)
+    print(f"Saved model with {len(scorer.vocabulary)} features to {args.model}")
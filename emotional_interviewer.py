@@ -1,20 +1,94 @@
 import os
-import sys
 import json
-from anthropic import Anthropic
-from dotenv import load_dotenv
-from pydantic import BaseModel, Field
+import time
+import argparse
+import functools
+from interviewer_context import RollingContext, SUMMARY_PROMPT
+from interviewer_turns import TurnLog
+from interviewer_refresh import RefreshPolicy, REUSED_STATE
+from opening_pool import OPENING_POOL_PROMPT
+import api_client
+import tracing
 
-class EmotionScore(BaseModel):
-    emotion: int = Field(description="Overall emotion state at the moment: 0-100, where 0 is very negative and 100 is elated")
+
+@functools.lru_cache(maxsize=None)
+def pydantic_models():
+    """Build the pydantic models on first use, so importing this module does not pull in pydantic"""
+    from pydantic import BaseModel, Field
+
+    class EmotionScore(BaseModel):
+        emotion: int = Field(description="Overall emotion state at the moment: 0-100, where 0 is very negative and 100 is elated")
+
+    class InterviewerTurn(BaseModel):
+        emotions: str = Field(description="Your current emotional state and feelings about the candidate, authentic and raw, concluding with the final state")
+        emotion: int = Field(description=EmotionScore.model_fields["emotion"].description)
+        thoughts: str = Field(description="Your candid internal assessment of the candidate, as you would tell a good colleague")
+        response: str = Field(description="What you say to the candidate next, plain conversational text without formatting")
+
+    return {"EmotionScore": EmotionScore, "InterviewerTurn": InterviewerTurn}
+
+
+def __getattr__(name):
+    # Keeps `from emotional_interviewer import EmotionScore` working with the lazily built models
+    if name in ("EmotionScore", "InterviewerTurn"):
+        return pydantic_models()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Global debug flag
 DEBUG = False
 
+# Candidate line used to open the interview when no opening message is given
+OPENING_PROMPT = "Hello, I'm here for the interview."
+
+# Instructions for the fused single-call turn
+FUSED_TURN_PROMPT = (
+    "Based on the conversation so far, produce your whole next turn as the interviewer with the interviewer_turn tool: "
+    "first your current emotional state (consider your previous emotional state to gauge the change), "
+    "then the integer emotion score for that state (0-100, where 0 is very negative and 100 is elated), "
+    "then your internal thoughts about the candidate, which will never be heard by the candidate, "
+    "and finally the reply you say to the candidate, informed by your emotions and thoughts."
+)
+
+# Replies used in place of the model's when the API returns nothing or fails
+EMPTY_RESPONSE_REPLY = "I'm sorry, I'm having trouble formulating a response. Let's continue with the interview."
+API_ERROR_REPLY = "I apologize for the technical difficulties. Let's proceed with the interview."
+
+# API clients shared by all interviewers, keyed by API key (the client is thread-safe)
+_clients = {}
+
+# Prompt caching breakpoint marker
+EPHEMERAL_CACHE = {"type": "ephemeral"}
+
+
+def empty_turn_usage():
+    """Token counters for one interview turn (summed over all of its API calls)"""
+    return {"calls": 0, "input_tokens": 0, "output_tokens": 0,
+            "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+
 class Interviewer:
-    def __init__(self):
+    def __init__(self, context_turns=None, context_token_budget=6000, prompt_caching=True, fused=False,
+                 emotion_scorer=None, emotion_score_log=None, opening_pool=None, refresh_policy=None):
+        """
+        Args:
+            context_turns: If set, only the last N turns are sent verbatim and older turns are
+                           folded into a rolling summary (see interviewer_context.RollingContext)
+            context_token_budget: Maximum estimated prompt tokens when context_turns is set
+            prompt_caching: If True, every call shares the interviewer system prompt and conversation
+                            prefix (the per-call instructions go last) and marks it for prompt caching
+            fused: If True, each turn is one schema-enforced call returning emotions, emotion score,
+                   thoughts and the reply instead of four calls. Can be switched mid-session.
+            emotion_scorer: None to score emotions with the LLM, or a local scorer (an object with
+                            predict(text) -> (score, confidence) and min_confidence, or the path of a
+                            saved emotion_scorer.LocalEmotionScorer). The LLM is used when confidence is low.
+            emotion_score_log: Optional JSONL path where LLM emotion scores are logged to train a local scorer
+            opening_pool: Optional opening_pool.OpeningPool; an interview started without a candidate message
+                          then opens instantly with a pre-generated opening instead of an API call
+            refresh_policy: Optional interviewer_refresh.RefreshPolicy deciding when the monologue (and
+                            emotions) are regenerated; None regenerates them for every message
+        """
         # Load environment variables from .env file
+        from dotenv import load_dotenv
         load_dotenv()
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
         self.system_prompt = (
@@ -34,10 +108,128 @@ class Interviewer:
             "Also consider your emotional state changes and how they affect your assessment of the candidate."
             "They are marked as 'emotions' in assistant messages. You are allowed to be emotional and let it show."
         )
-        self.conversation_history = []
-        self.messages = []
+        # One record per turn; the API message list is built from it incrementally
+        self.turns = TurnLog()
+        # Timing of the last streamed turn (time to first token and total latency)
+        self.last_turn_metrics = {}
+        # Bounded context; None sends the full message history on every call
+        self.context = None
+        if context_turns:
+            self.context = RollingContext(self.summarize_context, context_turns, context_token_budget)
+        self.prompt_caching = prompt_caching
+        self.fused = fused
+        if isinstance(emotion_scorer, str):
+            from emotion_scorer import LocalEmotionScorer
+            emotion_scorer = LocalEmotionScorer.load(emotion_scorer)
+        self.emotion_scorer = emotion_scorer
+        self.emotion_score_log = emotion_score_log
+        self.opening_pool = opening_pool
+        self.refresh_policy = refresh_policy
+        # How many internal states were generated and how many reused under the refresh policy
+        self.refresh_stats = {"emotions_generated": 0, "emotions_reused": 0,
+                              "thoughts_generated": 0, "thoughts_reused": 0}
+        # How many emotion scores came from the local scorer and from the LLM
+        self.scorer_stats = {"local": 0, "llm": 0}
+        # Token usage per turn, including prompt cache reads and writes
+        self.usage_log = []
+
+    @property
+    def messages(self):
+        """Read-only view of the interview as a Messages API list, built incrementally from the turn log"""
+        return self.turns.view()
+
+    @property
+    def conversation_history(self):
+        """Read-only view of the interview messages (same as messages)"""
+        return self.turns.view()
+
+    def build_request(self, messages, system_prompt=None, cacheable=True):
+        """Return the (system, messages) to send for a call.
+
+        Without prompt caching the per-call prompt is sent as the system prompt. With prompt caching
+        the interviewer system prompt and conversation are sent as an unchanged prefix for every call,
+        the per-call prompt is appended as a final instruction, and cache breakpoints are placed on the
+        system prompt, the last message of the latest completed turn and the latest message.
+        """
+        # Use provided system prompt or default to self.system_prompt
+        prompt_to_use = system_prompt if system_prompt else self.system_prompt
+        if not (self.prompt_caching and cacheable and messages):
+            return prompt_to_use, messages
+
+        system = [{"type": "text", "text": self.system_prompt, "cache_control": EPHEMERAL_CACHE}]
+        request_messages = list(messages)
+        last_user = max(i for i, m in enumerate(messages) if m["role"] == "user")
+        breakpoints = {len(messages) - 1}
+        if last_user > 0:
+            breakpoints.add(last_user - 1)
+        for i in breakpoints:
+            message = messages[i]
+            request_messages[i] = {
+                "role": message["role"],
+                "content": [{"type": "text", "text": message["content"], "cache_control": EPHEMERAL_CACHE}],
+            }
+        if prompt_to_use != self.system_prompt:
+            request_messages.append({"role": "user", "content": f"[instructions]{prompt_to_use}[/instructions]"})
+        return system, request_messages
+
+    def record_usage(self, usage):
+        """Add the token usage of one API call to the current turn"""
+        if not self.usage_log:
+            self.usage_log.append(empty_turn_usage())
+        turn_usage = self.usage_log[-1]
+        turn_usage["calls"] += 1
+        for key in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+            turn_usage[key] += getattr(usage, key, 0) or 0
+
+    def get_client(self):
+        """Return the API client, created on first use and shared by interviewers with the same key"""
+        client = _clients.get(self.api_key)
+        if client is None:
+            from anthropic import Anthropic
+            client = _clients.setdefault(self.api_key, Anthropic(api_key=self.api_key))
+        return client
+
+    def get_state(self):
+        """Return the session state as a JSON-serializable dict (restore it with from_state)"""
+        state = {
+            "turns": self.turns.to_state(),
+            "usage_log": self.usage_log,
+            "prompt_caching": self.prompt_caching,
+            "fused": self.fused,
+            "refresh_policy": self.refresh_policy.to_dict() if self.refresh_policy else None,
+        }
+        if self.context is not None:
+            state["context"] = {
+                "keep_turns": self.context.keep_turns,
+                "max_prompt_tokens": self.context.max_prompt_tokens,
+                "summary": self.context.summary,
+                "folded_turns": self.context.folded_turns,
+            }
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """Create an Interviewer that continues a session saved with get_state"""
+        context = state.get("context")
+        interviewer = cls(
+            context_turns=context["keep_turns"] if context else None,
+            context_token_budget=context["max_prompt_tokens"] if context else 6000,
+            prompt_caching=state.get("prompt_caching", True),
+            fused=state.get("fused", False),
+            refresh_policy=RefreshPolicy(**state["refresh_policy"]) if state.get("refresh_policy") else None,
+        )
+        if "turns" in state:
+            interviewer.turns = TurnLog.from_state(state["turns"])
+        else:
+            # Snapshot saved before the turn log
+            interviewer.turns = TurnLog.from_messages(state["messages"])
+        interviewer.usage_log = list(state.get("usage_log", []))
+        if context:
+            interviewer.context.summary = context["summary"]
+            interviewer.context.folded_turns = context["folded_turns"]
+        return interviewer
 
-    def call_anthropic_api(self, messages, system_prompt=None):
+    def call_anthropic_api(self, messages, system_prompt=None, cacheable=True, stage="reply"):
         # Debug: Print accumulated context before API call
         if DEBUG:
             print("\n----- DEBUG: LATEST CONTEXT BEING SENT TO API -----")
@@ -46,17 +238,18 @@ class Interviewer:
                 print(f"  {msg['role']}: {msg['content']}")
             print("---------------------------------------------\n")
         
-        # Use provided system prompt or default to self.system_prompt
-        prompt_to_use = system_prompt if system_prompt else self.system_prompt
+        system, request_messages = self.build_request(messages, system_prompt, cacheable)
         
         try:
-            client = Anthropic(api_key=self.api_key)
-            message = client.messages.create(
+            message = api_client.create_message(
+                self.get_client(),
+                stage=stage,
                 model="claude-3-7-sonnet-20250219",
                 max_tokens=1024,
-                system=prompt_to_use,
-                messages=messages
+                system=system,
+                messages=request_messages
             )
+            self.record_usage(message.usage)
             
             # Check if content exists and has elements
             if message.content and len(message.content) > 0:
@@ -64,11 +257,59 @@ class Interviewer:
             else:
                 # Handle empty response
                 print("Warning: Received empty response from API")
-                return "I'm sorry, I'm having trouble formulating a response. Let's continue with the interview."
+                return EMPTY_RESPONSE_REPLY
         except Exception as e:
             # Handle any API errors
             print(f"Error calling Anthropic API: {str(e)}")
-            return "I apologize for the technical difficulties. Let's proceed with the interview."
+            return API_ERROR_REPLY
+
+    def call_anthropic_api_stream(self, messages, system_prompt=None, cacheable=True, stage="reply"):
+        """Stream a reply from the API, yielding text chunks as they arrive"""
+        if DEBUG:
+            print("\n----- DEBUG: LATEST CONTEXT BEING SENT TO API (STREAM) -----")
+            print("Messages:")
+            for msg in messages[-10:]:
+                print(f"  {msg['role']}: {msg['content']}")
+            print("---------------------------------------------\n")
+
+        system, request_messages = self.build_request(messages, system_prompt, cacheable)
+
+        received_text = False
+        try:
+            with api_client.stream_message(
+                self.get_client(),
+                stage=stage,
+                model="claude-3-7-sonnet-20250219",
+                max_tokens=1024,
+                system=system,
+                messages=request_messages
+            ) as stream:
+                for text in stream.text_stream:
+                    if text:
+                        received_text = True
+                        yield text
+                self.record_usage(stream.get_final_message().usage)
+
+            if not received_text:
+                # Handle empty response
+                print("Warning: Received empty response from API")
+                yield EMPTY_RESPONSE_REPLY
+        except Exception as e:
+            # Handle any API errors
+            print(f"Error calling Anthropic API: {str(e)}")
+            if not received_text:
+                yield API_ERROR_REPLY
+
+    def prompt_messages(self):
+        """Messages to send to the API: the full history, or the bounded context if enabled"""
+        if self.context is None:
+            return self.turns.messages()
+        return self.context.build(self.turns.messages())
+
+    def summarize_context(self, previous_summary, transcript):
+        """Fold part of the interview transcript into the running summary"""
+        content = f"Previous notes:\n{previous_summary or 'None yet.'}\n\nNext part of the interview:\n{transcript}"
+        return self.call_anthropic_api([{"role": "user", "content": content}], SUMMARY_PROMPT, cacheable=False, stage="summary")
 
     def generate_internal_emotions(self):
         """Generate interviewer's emotional state during the interview"""
@@ -83,10 +324,28 @@ class Interviewer:
         )
         
         # Call API with the conversation history and the emotions prompt
-        return self.call_anthropic_api(self.messages, emotions_prompt)
+        return self.call_anthropic_api(self.prompt_messages(), emotions_prompt, stage="emotions")
 
+    @tracing.traced("score")
     def generate_emotion_score(self, text):
-        """Generate an emotion score for a given text"""
+        """Generate an emotion score for a given text, locally if a confident local scorer is set"""
+        if self.emotion_scorer is not None:
+            score, confidence = self.emotion_scorer.predict(text)
+            if confidence >= self.emotion_scorer.min_confidence:
+                self.scorer_stats["local"] += 1
+                return score
+
+        start = time.perf_counter()
+        score = self.generate_llm_emotion_score(text)
+        self.scorer_stats["llm"] += 1
+        if self.emotion_score_log:
+            with open(self.emotion_score_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"text": text, "score": score, "latency": time.perf_counter() - start}) + "\n")
+        return score
+
+    def generate_llm_emotion_score(self, text):
+        """Generate an emotion score for a given text with the LLM"""
+        EmotionScore = pydantic_models()["EmotionScore"]
         emotion_score_schema = EmotionScore.model_json_schema()
  
         tools = [
@@ -96,107 +355,270 @@ class Interviewer:
                 "input_schema": emotion_score_schema
             }
         ]
-        client = Anthropic(api_key=self.api_key)
-        message = client.messages.create(
+        system = "You are calculating the integer emotion score for a given text (0-100)."
+        messages = [
+            {
+                "role": "user",
+                "content": f"{text}"
+            }
+        ]
+        message = api_client.create_message(
+            self.get_client(),
+            stage="score",
             model="claude-3-7-sonnet-20250219",
             max_tokens=1200,
             temperature=0.2,
-            system="You are calculating the integer emotion score for a given text (0-100).",
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"{text}"
-                }
-            ],
+            system=system,
+            messages=messages,
             tools=tools,
             tool_choice={"type": "tool", "name": "emotion_score_result"}
         )
+        self.record_usage(message.usage)
         function_call = message.content[0].input
         return EmotionScore(**function_call).emotion
 
+    @tracing.traced("turn")
     def get_response(self, user_input):
         """Function mode: Get a single response from the interviewer"""
-        # Initialize conversation if this is the first interaction
-        if not self.messages:
-            if user_input:
-                # If user provided an opening message, use it
-                self.messages.append({"role": "user", "content": user_input})
-                
-                # Generate internal emotions first
-                internal_emotions = self.generate_internal_emotions().strip()
-                if "[emotions]" in internal_emotions and "[/emotions]" in internal_emotions:
-                    internal_emotions = internal_emotions.split("[emotions]")[1].split("[/emotions]")[0]
-                # Add internal emotions to messages for the model to see
-                self.messages.append({"role": "assistant", "content": f"[emotions]{internal_emotions}[/emotions]"})
-                
-                emotion_score = self.generate_emotion_score(internal_emotions)
-                if DEBUG:
-                    print(f"Emotion score: {emotion_score}")
-                # Generate internal monologue
-                internal_thoughts = self.generate_internal_monologue().strip()
-                if "[thoughts]" in internal_thoughts and "[/thoughts]" in internal_thoughts:
-                    internal_thoughts = internal_thoughts.split("[thoughts]")[1].split("[/thoughts]")[0]
-                # Add internal thoughts to messages for the model to see
-                self.messages.append({"role": "assistant", "content": f"[thoughts]{internal_thoughts}[/thoughts]"})
-                
-                # Get response from API
-                interviewer_response = self.call_anthropic_api(self.messages).strip()
-                
-                # Add the actual response to messages for future context
-                self.messages.append({"role": "assistant", "content": interviewer_response})
-                
-                # Store the complete conversation history separately if needed
-                self.conversation_history = self.messages.copy()
-                
-                return (internal_emotions, internal_thoughts, interviewer_response, emotion_score)
-            else:
-                # Otherwise start with an assistant message
-                initial_message = self.call_anthropic_api([{"role": "user", "content": "Hello, I'm here for the interview."}])
-                
-                # No thoughts for the initial message since there's no context yet
-                self.messages.append({"role": "user", "content": "Hello, I'm here for the interview."})
-                self.messages.append({"role": "assistant", "content": initial_message})
-                
-                # Store the complete conversation history separately if needed
-                self.conversation_history = self.messages.copy()
-                
-                return (None, None, initial_message, None)
+        self.usage_log.append(empty_turn_usage())
+        # Without an opening message from the candidate, the interviewer opens the interview
+        if not self.turns and not user_input:
+            pooled = self.open_from_pool()
+            if pooled:
+                return pooled
+            turn = self.turns.start(OPENING_PROMPT)
+            # No internal state for the initial message since there's no context yet
+            turn.reply = self.call_anthropic_api(self.turns.messages(), stage="opening")
+            return (None, None, turn.reply, None)
+
+        turn = self.turns.start(user_input)
+        if self.fused:
+            internal_emotions, emotion_score, internal_thoughts, interviewer_response = self.generate_fused_turn()
         else:
-            # Add user input to messages
-            self.messages.append({"role": "user", "content": user_input})
-        
-            # Generate internal emotions first
-            internal_emotions = self.generate_internal_emotions().strip()
-            # Strip the answer and only return the content between [emotions]..[/emotions] or the whole string if there are no tags
-            if "[emotions]" in internal_emotions and "[/emotions]" in internal_emotions:
-                internal_emotions = internal_emotions.split("[emotions]")[1].split("[/emotions]")[0]
-
-            # Add internal emotions to messages for the model to see
-            self.messages.append({"role": "assistant", "content": f"[emotions]{internal_emotions}[/emotions]"})
-            
-            # Generate emotion score
-            emotion_score = self.generate_emotion_score(internal_emotions)
-            if DEBUG:
-                print(f"Emotion score: {emotion_score}")
-            # Generate internal monologue
-            internal_thoughts = self.generate_internal_monologue().strip()
-            # Strip the answer and only return the content between [thoughts]..[/thoughts] or the whole string if there are no tags
-            if "[thoughts]" in internal_thoughts and "[/thoughts]" in internal_thoughts:
-                internal_thoughts = internal_thoughts.split("[thoughts]")[1].split("[/thoughts]")[0]
-
-            # Add internal thoughts to messages for the model to see
-            self.messages.append({"role": "assistant", "content": f"[thoughts]{internal_thoughts}[/thoughts]"})
-            
+            internal_emotions, emotion_score, internal_thoughts = self.generate_internal_state()
+
             # Get response from API
-            interviewer_response = self.call_anthropic_api(self.messages)
-            
-            # Add the actual response to messages for future context
-            self.messages.append({"role": "assistant", "content": interviewer_response})
-            
-            # Store the complete conversation history separately if needed
-            self.conversation_history = self.messages.copy()
-            
-            return (internal_emotions, internal_thoughts, interviewer_response, emotion_score)
+            interviewer_response = self.call_anthropic_api(self.prompt_messages())
+            if len(self.turns) == 1:
+                interviewer_response = interviewer_response.strip()
+
+        # The reply becomes part of the context of future calls
+        turn.reply = interviewer_response
+        return (internal_emotions, internal_thoughts, interviewer_response, emotion_score)
+
+    def open_from_pool(self):
+        """Start the interview with a pooled opening; returns the turn tuple, or None if there is none"""
+        opening = self.opening_pool.take() if self.opening_pool is not None else None
+        if opening is None:
+            return None
+        turn = self.turns.start(OPENING_PROMPT)
+        turn.emotions = opening["emotions"]
+        turn.score = opening["score"]
+        turn.thoughts = opening["thoughts"]
+        turn.reply = opening["reply"]
+        return (opening["emotions"], opening["thoughts"], opening["reply"], opening["score"])
+
+    def opening_settings(self):
+        """Model settings of the pooled opening call, with the opening stage's route applied"""
+        return api_client.router.apply("opening", {"model": "claude-3-7-sonnet-20250219", "max_tokens": 1024,
+                                                   "temperature": 1.0})
+
+    def generate_opening(self, focus):
+        """Generate one opening for the opening pool in a single schema-enforced call, or None on failure"""
+        InterviewerTurn = pydantic_models()["InterviewerTurn"]
+        tools = [
+            {
+                "name": "interviewer_turn",
+                "description": "build the interviewer's turn",
+                "input_schema": InterviewerTurn.model_json_schema()
+            }
+        ]
+        instructions = OPENING_POOL_PROMPT.format(focus=focus)
+        try:
+            message = api_client.create_message(
+                self.get_client(),
+                stage="opening",
+                system=self.system_prompt,
+                messages=[{"role": "user", "content": f"{OPENING_PROMPT}\n\n[instructions]{instructions}[/instructions]"}],
+                tools=tools,
+                tool_choice={"type": "tool", "name": "interviewer_turn"},
+                **self.opening_settings()
+            )
+            turn = InterviewerTurn(**message.content[0].input)
+        except Exception as e:
+            print(f"Error generating opening: {str(e)}")
+            return None
+        return {"emotions": turn.emotions.strip(), "score": turn.emotion, "thoughts": turn.thoughts.strip(),
+                "reply": turn.response.strip(), "focus": focus}
+
+    def generate_internal_state(self):
+        """Generate emotions, emotion score and thoughts for the latest candidate message.
+
+        The emotions, score and thoughts are stored on the current turn, so the reply call can see them.
+        Under a refresh policy, state that is reused instead of regenerated is stored as REUSED_STATE,
+        and the reused values are returned.
+        """
+        turn = self.turns.current
+        policy = self.refresh_policy
+        if policy is not None:
+            emotions_age, emotions_turn = self.latest_generated("emotions")
+            thoughts_age, thoughts_turn = self.latest_generated("thoughts")
+            if policy.reuse_state(turn.candidate, emotions_age, thoughts_age):
+                turn.emotions = turn.thoughts = REUSED_STATE
+                turn.score = emotions_turn.score
+                self.refresh_stats["emotions_reused"] += 1
+                self.refresh_stats["thoughts_reused"] += 1
+                return emotions_turn.emotions, emotions_turn.score, thoughts_turn.thoughts
+
+        # Generate internal emotions first
+        internal_emotions = self.generate_internal_emotions().strip()
+        self.refresh_stats["emotions_generated"] += 1
+        # Strip the answer and only return the content between [emotions]..[/emotions] or the whole string if there are no tags
+        if "[emotions]" in internal_emotions and "[/emotions]" in internal_emotions:
+            internal_emotions = internal_emotions.split("[emotions]")[1].split("[/emotions]")[0]
+
+        # Add internal emotions to the turn for the model to see
+        turn.emotions = internal_emotions
+        
+        # Generate emotion score
+        emotion_score = self.generate_emotion_score(internal_emotions)
+        turn.score = emotion_score
+        if DEBUG:
+            print(f"Emotion score: {emotion_score}")
+        if policy is not None and policy.reuse_thoughts(turn.candidate, emotion_score, thoughts_age,
+                                                        thoughts_turn.score if thoughts_turn else None):
+            # Low-information message: keep the latest thoughts instead of a new monologue call
+            turn.thoughts = REUSED_STATE
+            self.refresh_stats["thoughts_reused"] += 1
+            return internal_emotions, emotion_score, thoughts_turn.thoughts
+
+        # Generate internal monologue
+        internal_thoughts = self.generate_internal_monologue().strip()
+        self.refresh_stats["thoughts_generated"] += 1
+        # Strip the answer and only return the content between [thoughts]..[/thoughts] or the whole string if there are no tags
+        if "[thoughts]" in internal_thoughts and "[/thoughts]" in internal_thoughts:
+            internal_thoughts = internal_thoughts.split("[thoughts]")[1].split("[/thoughts]")[0]
+
+        # Add internal thoughts to the turn for the model to see
+        turn.thoughts = internal_thoughts
+
+        return internal_emotions, emotion_score, internal_thoughts
+
+    def latest_generated(self, field):
+        """(turns ago, turn) of the latest earlier turn whose emotions or thoughts were generated, or (None, None)"""
+        turns = self.turns.turns
+        for index in range(len(turns) - 2, -1, -1):
+            value = getattr(turns[index], field)
+            if value is not None and value != REUSED_STATE:
+                return len(turns) - 1 - index, turns[index]
+        return None, None
+
+    def generate_fused_turn(self):
+        """Generate emotions, emotion score, thoughts and the reply in one schema-enforced call.
+
+        The emotions, score and thoughts are stored on the turn exactly as in the four-call mode, so
+        the two modes can be mixed in one session. Falls back to the four-call mode if the call fails.
+        """
+        InterviewerTurn = pydantic_models()["InterviewerTurn"]
+        tools = [
+            {
+                "name": "interviewer_turn",
+                "description": "build the interviewer's turn",
+                "input_schema": InterviewerTurn.model_json_schema()
+            }
+        ]
+        system, request_messages = self.build_request(self.prompt_messages(), FUSED_TURN_PROMPT)
+        try:
+            message = api_client.create_message(
+                self.get_client(),
+                stage="fused_turn",
+                model="claude-3-7-sonnet-20250219",
+                max_tokens=2048,
+                system=system,
+                messages=request_messages,
+                tools=tools,
+                tool_choice={"type": "tool", "name": "interviewer_turn"}
+            )
+            self.record_usage(message.usage)
+            turn = InterviewerTurn(**message.content[0].input)
+        except Exception as e:
+            print(f"Error generating fused turn, falling back to separate calls: {str(e)}")
+            internal_emotions, emotion_score, internal_thoughts = self.generate_internal_state()
+            interviewer_response = self.call_anthropic_api(self.prompt_messages()).strip()
+            return internal_emotions, emotion_score, internal_thoughts, interviewer_response
+
+        internal_emotions = turn.emotions.strip()
+        internal_thoughts = turn.thoughts.strip()
+        current = self.turns.current
+        current.emotions = internal_emotions
+        current.score = turn.emotion
+        if DEBUG:
+            print(f"Emotion score: {turn.emotion}")
+        current.thoughts = internal_thoughts
+        return internal_emotions, turn.emotion, internal_thoughts, turn.response.strip()
+
+    def stream_response(self, user_input):
+        """Streaming function mode: yield reply text chunks as they arrive, then the final
+        (emotions, thoughts, response, emotion_score) tuple.
+
+        Timing for the turn is stored in self.last_turn_metrics.
+        """
+        self.usage_log.append(empty_turn_usage())
+        turn_start = time.perf_counter()
+        first_token_time = None
+        chunks = []
+
+        opening = not self.turns and not user_input
+        pooled = self.open_from_pool() if opening else None
+        if pooled:
+            # A pooled opening is complete already, so it is served as a single chunk
+            elapsed = time.perf_counter() - turn_start
+            self.last_turn_metrics = {"time_to_first_token": elapsed, "reply_time_to_first_token": elapsed,
+                                      "total_latency": elapsed}
+            yield pooled[2]
+            yield pooled
+            return
+        if opening:
+            # Opening line - no internal state since there's no context yet
+            internal_emotions, emotion_score, internal_thoughts = None, None, None
+            turn = self.turns.start(OPENING_PROMPT)
+        else:
+            turn = self.turns.start(user_input)
+
+        if self.fused and not opening:
+            # The fused call returns the reply inside the tool input, so it arrives as one chunk
+            reply_start = time.perf_counter()
+            internal_emotions, emotion_score, internal_thoughts, reply = self.generate_fused_turn()
+            first_token_time = time.perf_counter()
+            chunks.append(reply)
+            yield reply
+        else:
+            if not opening:
+                internal_emotions, emotion_score, internal_thoughts = self.generate_internal_state()
+            reply_start = time.perf_counter()
+            for chunk in self.call_anthropic_api_stream(self.prompt_messages(),
+                                                        stage="opening" if opening else "reply"):
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                chunks.append(chunk)
+                yield chunk
+        turn_end = time.perf_counter()
+
+        interviewer_response = "".join(chunks).strip()
+
+        # The reply becomes part of the context of future calls
+        turn.reply = interviewer_response
+
+        first_token_time = first_token_time or turn_end
+        self.last_turn_metrics = {
+            "time_to_first_token": first_token_time - turn_start,
+            "reply_time_to_first_token": first_token_time - reply_start,
+            "total_latency": turn_end - turn_start,
+        }
+        if DEBUG:
+            print(f"Turn metrics: {self.last_turn_metrics}")
+
+        yield (internal_emotions, internal_thoughts, interviewer_response, emotion_score)
 
     def generate_internal_monologue(self):
         """Generate interviewer's internal thoughts about the candidate"""
@@ -212,7 +634,7 @@ class Interviewer:
         )
         
         # Call API with the conversation history and the internal monologue prompt
-        return self.call_anthropic_api(self.messages, internal_monologue_prompt)
+        return self.call_anthropic_api(self.prompt_messages(), internal_monologue_prompt, stage="monologue")
 
     def conduct_interview(self, opening_message=None, function_mode=False):
         """
@@ -238,11 +660,7 @@ class Interviewer:
         # Process the opening message
         print("Candidate:", opening_message)
         print("\n")
-        emotions, thoughts, interviewer_response, emotion_score = self.get_response(opening_message)
-        print(f"Interviewer emotions: {emotions}\n")
-        print(f"Emotion score: {emotion_score}\n")
-        print(f"Interviewer thoughts: {thoughts}\n")
-        print(f"Interviewer response: {interviewer_response}\n")
+        self.print_streamed_turn(opening_message)
         
         # Continue with interactive loop
         while user_input.lower() != "exit":
@@ -250,20 +668,28 @@ class Interviewer:
             if user_input.lower() == "exit":
                 break
                 
-            emotions, thoughts, interviewer_response, emotion_score = self.get_response(user_input)
-            print(f"Interviewer emotions: {emotions}\n")
-            print(f"Emotion score: {emotion_score}\n")
-            print(f"Interviewer thoughts: {thoughts}\n")
-            print(f"Interviewer response: {interviewer_response}\n")
+            self.print_streamed_turn(user_input)
+
+    def print_streamed_turn(self, user_input):
+        """CLI mode: print the interviewer reply token by token, then the internal state and timing"""
+        print("Interviewer response: ", end="", flush=True)
+        for item in self.stream_response(user_input):
+            if isinstance(item, tuple):
+                emotions, thoughts, interviewer_response, emotion_score = item
+            else:
+                print(item, end="", flush=True)
+        print("\n")
+        print(f"Interviewer emotions: {emotions}\n")
+        print(f"Emotion score: {emotion_score}\n")
+        print(f"Interviewer thoughts: {thoughts}\n")
+        metrics = self.last_turn_metrics
+        print(f"(first token after {metrics['time_to_first_token']:.2f}s, "
+              f"reply started streaming {metrics['reply_time_to_first_token']:.2f}s after its call, "
+              f"total {metrics['total_latency']:.2f}s)\n")
 
-    def main(self):
+    def main(self, opening_message=None):
         print("Welcome to the Product Management Interview! Type responses, or print 'exit' to end it.")
         
-        # Regular CLI mode
-        opening_message = None
-        if len(sys.argv) > 1:
-            opening_message = " ".join(sys.argv[1:])
-        
         print("Opening message:", opening_message)
         self.conduct_interview(opening_message)
 
@@ -273,6 +699,14 @@ if __name__ == "__main__":
         DEBUG = True
         print("Debug mode enabled")
     
+    parser = argparse.ArgumentParser(description='Run the interactive interviewer')
+    parser.add_argument('opening', type=str, nargs='*',
+                        help='Opening message from the candidate (default: the interviewer opens)')
+    api_client.add_routing_arguments(parser)
+    
+    args = parser.parse_args()
+    api_client.apply_routing_arguments(args)
+    
     interviewer = Interviewer()
-    interviewer.main()
+    interviewer.main(" ".join(args.opening) or None)
 
@@ -0,0 +1,226 @@
+import os
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+import api_client
+import tracing
+from emotional_interviewer import Interviewer
+
+
+def load_scripts(path):
+    """Load candidate scripts as a list of {"script_id", "replies"} dicts.
+
+    `path` is either a JSONL file with one {"script_id": ..., "replies": [...]} object per line, or a
+    directory of scripts: *.json files (an object like the JSONL lines, or a plain list of replies) and
+    *.txt files (one reply per line). Directory scripts default to the file name as their id.
+    """
+    scripts = []
+    if os.path.isdir(path):
+        for file_path in sorted(glob.glob(os.path.join(path, "*.json")) + glob.glob(os.path.join(path, "*.txt"))):
+            script_id = os.path.splitext(os.path.basename(file_path))[0]
+            with open(file_path, encoding="utf-8") as f:
+                if file_path.endswith(".txt"):
+                    replies = [line.strip() for line in f if line.strip()]
+                    scripts.append({"script_id": script_id, "replies": replies})
+                else:
+                    data = json.load(f)
+                    if isinstance(data, list):
+                        data = {"replies": data}
+                    scripts.append({"script_id": data.get("script_id", script_id), "replies": data["replies"]})
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    data = json.loads(line)
+                    scripts.append({"script_id": data.get("script_id", str(line_number)), "replies": data["replies"]})
+    return scripts
+
+
+def run_script(script, interviewer_options):
+    """Replay one candidate script in its own Interviewer session and return per-turn rows.
+
+    If a turn fails, the script stops there: the rows of the turns already completed (and paid for) are
+    kept, followed by a row for the failed turn with its `error`.
+    """
+    rows = []
+    turn = 1
+    try:
+        interviewer = Interviewer(**interviewer_options)
+        for turn, reply in enumerate(script["replies"], 1):
+            start = time.perf_counter()
+            emotions, thoughts, response, emotion_score = interviewer.get_response(reply)
+            rows.append({
+                "script_id": script["script_id"],
+                "turn": turn,
+                "candidate": reply,
+                "emotions": emotions,
+                "thoughts": thoughts,
+                "response": response,
+                "emotion_score": emotion_score,
+                "latency": time.perf_counter() - start,
+                "error": None,
+            })
+    except Exception as e:
+        rows.append({
+            "script_id": script["script_id"],
+            "turn": turn,
+            "candidate": script["replies"][turn - 1] if script["replies"] else None,
+            "emotions": None,
+            "thoughts": None,
+            "response": None,
+            "emotion_score": None,
+            "latency": None,
+            "error": f"{type(e).__name__}: {e}",
+        })
+    return rows
+
+
+def run_scripts(scripts, concurrency=8, interviewer_options=None):
+    """Run the scripts as independent sessions in parallel and return all per-turn rows."""
+    rows = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(run_script, script, interviewer_options or {}): script for script in scripts}
+        for future in as_completed(futures):
+            script = futures[future]
+            script_rows = future.result()
+            rows.extend(script_rows)
+            error = script_rows[-1]["error"] if script_rows else None
+            if error:
+                print(f"Error running script {script['script_id']} at turn {script_rows[-1]['turn']} "
+                      f"({len(script_rows) - 1} turns kept): {error}")
+            else:
+                print(f"Finished script {script['script_id']} ({len(script['replies'])} turns)")
+    return rows
+
+
+def emotion_trajectories(results_df):
+    """Aggregate the emotion score trajectory of each script."""
+    trajectories = {}
+    for script_id, group in results_df.sort_values("turn").groupby("script_id", sort=True):
+        scores = group["emotion_score"].dropna().astype(float).tolist()
+        errors = group["error"].dropna() if "error" in group else []
+        # Set when the script stopped at a failed turn: the scores cover the turns before it
+        error = errors.iloc[-1] if len(errors) else None
+        if not scores:
+            if error:
+                trajectories[str(script_id)] = {"error": error, "scores": []}
+            continue
+        turns = group.loc[group["emotion_score"].notna(), "turn"].astype(float)
+        # Least-squares slope of score per turn (0 for single-turn scripts)
+        slope = float(pd.Series(scores).cov(pd.Series(turns.tolist())) / turns.var()) if len(scores) > 1 else 0.0
+        trajectories[str(script_id)] = {
+            "error": error,
+            "scores": scores,
+            "start": scores[0],
+            "end": scores[-1],
+            "min": min(scores),
+            "max": max(scores),
+            "mean": sum(scores) / len(scores),
+            "change": scores[-1] - scores[0],
+            "slope_per_turn": slope,
+        }
+    return trajectories
+
+
+def save_results(results_df, output_file):
+    """Save the per-turn results in a columnar file (Parquet), or CSV if the name ends in .csv."""
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    if output_file.endswith(".csv"):
+        results_df.to_csv(output_file, index=False)
+    else:
+        results_df.to_parquet(output_file, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay scripted candidate transcripts through the Interviewer in parallel')
+    parser.add_argument('scripts', type=str,
+                        help='JSONL file or directory of candidate scripts')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Results file (.parquet, or .csv) (default: auto-generated filename)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Number of scripts run at once')
+    parser.add_argument('--fused', action='store_true',
+                        help='Use the fused single-call turn mode')
+    parser.add_argument('--context_turns', type=int, default=None,
+                        help='Bound the interviewer context to this many verbatim turns')
+    parser.add_argument('--lazy_refresh', action='store_true',
+                        help='Reuse the latest thoughts and emotions for short acknowledgements (four-call mode only)')
+    parser.add_argument('--emotion_scorer', type=str, default=None,
+                        help='Saved local emotion scorer model to use instead of the LLM when confident')
+    parser.add_argument('--hedge', action='store_true',
+                        help='Send a duplicate request when a call is slower than usual for its stage')
+    api_client.add_routing_arguments(parser)
+    parser.add_argument('--trace', type=str, default=None,
+                        help='Write a trace of API calls and pipeline steps to this JSON file (also EQ_TRACE=path)')
+    parser.add_argument('--mock', action='store_true',
+                        help='Run fully offline against a local mock API server')
+    parser.add_argument('--mock_latency', type=float, default=0.2,
+                        help='Base latency of the mock API server in seconds')
+
+    args = parser.parse_args()
+
+    if args.mock:
+        from mock_anthropic_server import start_mock_server
+        server, base_url = start_mock_server(latency=args.mock_latency, token_delay=0.001)
+        os.environ["ANTHROPIC_BASE_URL"] = base_url
+        os.environ.setdefault("ANTHROPIC_API_KEY", "mock")
+        # The mock API has no quota to share
+        os.environ.setdefault("EQ_QUOTA_DISABLED", "1")
+        print(f"Using mock API server at {base_url}")
+
+    output_file = args.output or f"data/eval_results_{time.strftime('%Y%m%d-%H%M%S')}.parquet"
+    if not output_file.endswith(".csv"):
+        # Fail before any paid calls if the Parquet engine is missing
+        import pyarrow  # noqa: F401
+
+    scripts = load_scripts(args.scripts)
+    total_turns = sum(len(s["replies"]) for s in scripts)
+    print(f"Loaded {len(scripts)} scripts ({total_turns} turns) from {args.scripts}")
+
+    if args.hedge:
+        api_client.hedging.configure(enabled=True)
+    api_client.apply_routing_arguments(args)
+    if args.trace:
+        tracing.start(args.trace)
+
+    interviewer_options = {"fused": args.fused, "context_turns": args.context_turns}
+    if args.emotion_scorer:
+        from emotion_scorer import LocalEmotionScorer
+        # Load the model once and share it between sessions
+        interviewer_options["emotion_scorer"] = LocalEmotionScorer.load(args.emotion_scorer)
+    if args.lazy_refresh:
+        from interviewer_refresh import RefreshPolicy
+        interviewer_options["refresh_policy"] = RefreshPolicy(reuse_emotions=True)
+    start = time.perf_counter()
+    rows = run_scripts(scripts, args.concurrency, interviewer_options)
+    wall_time = time.perf_counter() - start
+
+    completed = sum(1 for row in rows if not row["error"])
+    failed_scripts = sum(1 for row in rows if row["error"])
+    if not completed:
+        print("No turns were completed successfully.")
+    if rows:
+        results_df = pd.DataFrame(rows)
+        save_results(results_df, output_file)
+        trajectories = emotion_trajectories(results_df)
+        trajectories_file = os.path.splitext(output_file)[0] + "_trajectories.json"
+        with open(trajectories_file, "w", encoding="utf-8") as f:
+            json.dump(trajectories, f, indent=2)
+
+        mean_by_turn = results_df.groupby("turn")["emotion_score"].mean()
+        print(f"\nSaved {len(rows)} rows to {output_file} and trajectories to {trajectories_file}")
+        print("Mean emotion score by turn: " + ", ".join(f"{t}: {s:.1f}" for t, s in mean_by_turn.items()))
+        print(f"Wall time: {wall_time:.1f}s, {completed / wall_time:.2f} turns/s "
+              f"({completed}/{total_turns} turns completed)")
+        if failed_scripts:
+            print(f"{failed_scripts} scripts stopped at a failed turn (see the error column)")
+        if args.hedge:
+            hedge_stats = api_client.hedging.stats()
+            print(f"Hedged {hedge_stats['hedged']}/{hedge_stats['calls']} calls, "
+                  f"{hedge_stats['hedge_wins']} hedges answered first")
+        print(api_client.breaker.report())
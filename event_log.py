@@ -0,0 +1,234 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+# Correlation ids (scenario, variation, call) of the work the current thread is doing, added to every event
+_ids = contextvars.ContextVar("event_log_ids", default={})
+_call_ids = itertools.count(1)
+
+# Events are put on the queue by the callers and formatted and written by one background thread
+_queue = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _every(sample_rate):
+    return max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+
+
+_path = None
+_console_level = LEVELS.get(os.getenv("EQ_LOG_LEVEL", "info").lower(), INFO)
+_sample_every = _every(float(os.getenv("EQ_LOG_SAMPLE", 0.05)))
+_max_bytes = 50_000_000
+_backups = 5
+
+
+def configure(path=None, console_level=None, sample_rate=None, max_bytes=None, backups=None):
+    """Write events to `path` as JSON lines, besides the console.
+
+    The file receives every level; the console only `console_level` and above. Verbose preview events
+    (prompt and response excerpts) are kept for a `sample_rate` fraction of API calls, whole calls at a time.
+    The file is rotated at `max_bytes`, keeping `backups` gzip-compressed older files. "{pid}" in the path
+    is replaced by the process id, so several processes can log at once.
+    """
+    global _path, _console_level, _sample_every, _max_bytes, _backups
+    if path:
+        _path = path.replace("{pid}", str(os.getpid()))
+    if console_level is not None:
+        _console_level = LEVELS[console_level] if isinstance(console_level, str) else console_level
+    if sample_rate is not None:
+        _sample_every = _every(sample_rate)
+    if max_bytes is not None:
+        _max_bytes = max_bytes
+    if backups is not None:
+        _backups = backups
+
+
+def add_arguments(parser):
+    """Add the --log, --log_level and --log_sample command line options"""
+    parser.add_argument('--log', type=str, default=os.getenv("EQ_LOG"),
+                        help='Write structured JSON-lines events to this file, rotated and gzipped (also EQ_LOG=path)')
+    parser.add_argument('--log_level', type=str, default=None, choices=list(LEVELS),
+                        help='Lowest level shown on the console (default: info, or EQ_LOG_LEVEL)')
+    parser.add_argument('--log_sample', type=float, default=None,
+                        help='Fraction of API calls whose prompt and response previews are logged to the file '
+                             '(default: 0.05, or EQ_LOG_SAMPLE)')
+
+
+def apply_arguments(args):
+    configure(args.log, args.log_level, args.log_sample)
+
+
+@contextmanager
+def context(**ids):
+    """Add correlation ids (e.g. scenario=..., variation=...) to the events logged inside the block"""
+    token = _ids.set({**_ids.get(), **ids})
+    try:
+        yield
+    finally:
+        _ids.reset(token)
+
+
+def call_context(**ids):
+    """context() with a new call id, for one API call attempt"""
+    return context(call=next(_call_ids), **ids)
+
+
+def log(level, event, message=None, **fields):
+    """Queue an event; the caller never waits for the console or the file.
+
+    `message` is the console line; the file gets the event name, level, time, correlation ids and fields.
+    """
+    if level < _console_level and _path is None:
+        return
+    record = {"ts": round(time.time(), 6), "level": level, "event": event, **_ids.get(), **fields}
+    if message is not None:
+        record["message"] = message
+    if _writer is None:
+        _start_writer()
+    _queue.put(record)
+
+
+def debug(event, message=None, **fields):
+    log(DEBUG, event, message, **fields)
+
+
+def info(event, message=None, **fields):
+    log(INFO, event, message, **fields)
+
+
+def warning(event, message=None, **fields):
+    log(WARNING, event, message, **fields)
+
+
+def error(event, message=None, **fields):
+    log(ERROR, event, message, **fields)
+
+
+def sampled():
+    """Whether the current API call's verbose events are kept (the first call, then one in every 1/sample_rate)"""
+    if _path is None or not _sample_every:
+        return False
+    call = _ids.get().get("call")
+    return call is None or (call - 1) % _sample_every == 0
+
+
+def preview(event, text, limit=200, **fields):
+    """Log the first `limit` characters of a prompt or response, for sampled calls only (file only)"""
+    if sampled():
+        log(DEBUG, event, None, text=text[:limit], chars=len(text), **fields)
+
+
+def flush(timeout=10):
+    """Wait until the events queued so far are written"""
+    if _writer is None:
+        return
+    done = threading.Event()
+    _queue.put(done)
+    done.wait(timeout)
+
+
+def close():
+    if _writer is not None:
+        _queue.put(None)
+        _writer.join(timeout=10)
+
+
+class _RotatingFile:
+    """Append-only file rotated at max_bytes into path.1.gz, path.2.gz, ... (oldest dropped)"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+        self.size = self.file.tell()
+
+    def write(self, line):
+        if self.size and self.size + len(line) > _max_bytes:
+            self.rotate()
+        self.file.write(line)
+        self.size += len(line)
+
+    def rotate(self):
+        import gzip
+        import shutil
+
+        self.file.close()
+        for i in range(_backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}.gz"):
+                os.replace(f"{self.path}.{i}.gz", f"{self.path}.{i + 1}.gz")
+        if _backups:
+            with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.size = 0
+
+
+def _console_line(record):
+    message = record.get("message")
+    if message is None:
+        skip = ("ts", "level", "event", "message")
+        message = record["event"] + " " + " ".join(f"{k}={v}" for k, v in record.items() if k not in skip)
+    if record["level"] >= WARNING:
+        message = f"[{LEVEL_NAMES[record['level']]}] {message}"
+    return message
+
+
+def _write_console(line):
+    # Print above the progress bars instead of through them
+    tqdm = sys.modules.get("tqdm")
+    if tqdm is not None:
+        tqdm.tqdm.write(line)
+    else:
+        print(line)
+
+
+def _run_writer():
+    log_file = None
+    while True:
+        record = _queue.get()
+        if record is None or isinstance(record, threading.Event):
+            if log_file:
+                log_file.file.flush()
+            if record is None:
+                return
+            record.set()
+            continue
+        try:
+            if record["level"] >= _console_level:
+                _write_console(_console_line(record))
+            if _path is not None:
+                if log_file is None or log_file.path != _path:
+                    log_file = _RotatingFile(_path)
+                record["level"] = LEVEL_NAMES[record["level"]]
+                log_file.write(json.dumps(record, default=str) + "\n")
+                # Flush whenever the writer catches up, so lines are written in batches under load
+                if _queue.empty():
+                    log_file.file.flush()
+        except Exception as e:
+            print(f"Event log writer error: {e}", file=sys.stderr)
+
+
+def _start_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run_writer, name="event-log-writer", daemon=True)
+            _writer.start()
+            atexit.register(close)
+
+
+# EQ_LOG=path turns the event file on for any script
+if os.getenv("EQ_LOG"):
+    configure(os.getenv("EQ_LOG"))
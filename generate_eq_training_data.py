@@ -1,20 +1,28 @@
 import os
+import sys
 import time
 import json
-import pandas as pd
+import hashlib
 import argparse
-from tqdm import tqdm
-from dotenv import load_dotenv
-from anthropic import Anthropic, APIError, APIStatusError, RateLimitError
 
-# Load environment variables
-load_dotenv()
+import api_client
+import event_log
+import graceful_shutdown
+import tracing
 
-# Initialize Anthropic client
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+# Anthropic client, created on first use by get_client()
+client = None
 
-# Create data directory if it doesn't exist
-os.makedirs("data", exist_ok=True)
+
+def get_client():
+    """Load environment variables and create the Anthropic client on first use."""
+    global client
+    if client is None:
+        from anthropic import Anthropic
+        from dotenv import load_dotenv
+        load_dotenv()
+        client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    return client
 
 # Define personas with varying levels of EQ
 personas = [
@@ -29,7 +37,21 @@ personas = [
 # Map persona names to their full descriptions
 persona_map = {p.split(':')[0]: p for p in personas}
 
-def generate_diverse_conversation_histories_prompt(scenario, conversation_needed, num_variations=10):
+# Model settings of every generation call (a stage's route may override them)
+GENERATION_SETTINGS = {
+    "model": "claude-3-5-sonnet-20240620",
+    "max_tokens": 4000,  # Increased for multiple variations
+    "temperature": 0.8,  # Slightly increased for diversity
+}
+
+VARIATIONS_SYSTEM_MESSAGE = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate diverse and realistic conversation histories and emotional states for challenging scenarios. Each variation should be truly different in terms of emotional dynamics and conversation progress. IMPORTANT: Your response must be valid JSON that can be parsed directly."
+
+OPTIMAL_RESPONSE_SYSTEM_MESSAGE = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate optimal responses that demonstrate emotional intelligence and help achieve conversation objectives. IMPORTANT: Your response must be valid JSON that can be parsed directly."
+
+# Fields of a generated variation that the optimal response prompt uses
+VARIATION_KEYS = ["conversation_objective", "conversation_history", "current_emotional_state", "conversation_point"]
+
+def generate_diverse_conversation_histories_prompt(scenario, conversation_needed, num_variations=10, coverage_hint=""):
     return f"""Based on the following scenario and conversation requirements, generate {num_variations} DIVERSE conversation history variations:
 
 SCENARIO:
@@ -73,7 +95,7 @@ Example variations:
 2. Brief history: "Two previous attempts to discuss, both met with deflection"
 3. Multiple attempts: "Five previous conversations, tried direct approach, then sympathetic, then involving HR"
 4. Extensive history: "Month-long pattern of discussions, tried various strategies including..."
-"""
+{coverage_hint}"""
 
 def generate_optimal_response_prompt(scenario, conversation_data, persona):
     return f"""Given the following scenario, conversation history, and emotional intelligence profile, generate the optimal next response to achieve the objective:
@@ -103,13 +125,9 @@ Generate a JSON response with:
 IMPORTANT: Your entire response must be valid JSON that can be parsed. Do not include any text before or after the JSON.
 """
 
+@tracing.traced("json_extraction")
 def extract_json_from_response(response_text):
     """Extract JSON from the response text, handling potential formatting issues."""
-    # Print the first 200 characters of the response for debugging
-    print(f"\n--- Response Preview (first 200 chars) ---")
-    print(response_text[:200] + "..." if len(response_text) > 200 else response_text)
-    print("--- End Preview ---\n")
-    
     try:
         # First try direct JSON parsing
         try:
@@ -128,128 +146,202 @@ def extract_json_from_response(response_text):
             
             if start_idx >= 0 and end_idx > start_idx:
                 json_str = response_text[start_idx:end_idx]
-                print(f"Extracted JSON substring: {json_str[:100]}...")
+                event_log.preview("json_extracted", json_str, limit=100)
                 return json.loads(json_str)
             else:
-                print(f"No JSON found in response")
+                event_log.warning("json_missing", "No JSON found in response")
                 return None
     except json.JSONDecodeError as e:
-        print(f"Failed to parse JSON from response: {e}")
+        event_log.warning("json_invalid", f"Failed to parse JSON from response: {e}")
         return None
 
-def api_call(prompt, system_message, attempt=1, max_attempts=3):
+def api_call(prompt, system_message, attempt=1, max_attempts=3, stage="default"):
     """Make an API call with retry logic."""
-    print(f"\n--- Prompt Preview (first 200 chars) ---")
-    print(prompt[:200] + "..." if len(prompt) > 200 else prompt)
-    print("--- End Prompt ---\n")
+    if not graceful_shutdown.admitting_calls():
+        event_log.info("call_skipped", "Shutting down: not starting a new API call")
+        return None
     
-    print(f"Making API call (attempt {attempt}/{max_attempts})")
+    event_log.preview("prompt_preview", prompt, attempt=attempt)
+    event_log.debug("call_start", f"Making API call (attempt {attempt}/{max_attempts})", attempt=attempt)
     
+    from anthropic import APIStatusError, RateLimitError
+
     try:
-        response = client.messages.create(
-            model="claude-3-5-sonnet-20240620",
-            max_tokens=4000,  # Increased for multiple variations
-            temperature=0.8,  # Slightly increased for diversity
+        messages = [{"role": "user", "content": prompt}]
+        response = api_client.create_message(
+            get_client(),
+            stage=stage,
             system=system_message,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+            messages=messages,
+            **GENERATION_SETTINGS
         )
         
+        event_log.preview("response_preview", response.content[0].text, attempt=attempt)
         return response.content[0].text
         
     except RateLimitError as e:
-        print(f"Rate limit error: {e}")
+        event_log.warning("rate_limited", f"Rate limit error: {e}", attempt=attempt)
         if attempt < max_attempts:
             wait_time = min(2 ** attempt * 5, 60)  # Exponential backoff
-            print(f"Waiting {wait_time} seconds before retry...")
-            time.sleep(wait_time)
-            return api_call(prompt, system_message, attempt+1, max_attempts)
+            event_log.info("retry_wait", f"Waiting {wait_time} seconds before retry...", seconds=wait_time)
+            with tracing.span("retry_sleep", seconds=wait_time):
+                graceful_shutdown.sleep(wait_time)
+            return api_call(prompt, system_message, attempt+1, max_attempts, stage)
         return None
         
     except APIStatusError as e:
-        if e.status_code == 529:  # Overloaded
-            print(f"API overloaded. Waiting before retry...")
-            if attempt < max_attempts:
-                wait_time = min(2 ** attempt * 10, 120)  # Longer exponential backoff
-                print(f"Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
-                return api_call(prompt, system_message, attempt+1, max_attempts)
-        else:
-            print(f"API error: {e}")
+        # Overload errors (529) never get here: the shared circuit breaker requeues those calls
+        event_log.error("api_error", f"API error: {e}", attempt=attempt)
         return None
         
     except Exception as e:
-        print(f"Error making API call: {e}")
+        event_log.error("call_failed", f"Error making API call: {e}", attempt=attempt)
         return None
 
-def generate_diverse_conversation_histories(scenario, conversation_needed, num_variations=10):
-    """Generate multiple diverse conversation histories for a scenario."""
-    prompt = generate_diverse_conversation_histories_prompt(scenario, conversation_needed, num_variations)
-    
-    system_message = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate diverse and realistic conversation histories and emotional states for challenging scenarios. Each variation should be truly different in terms of emotional dynamics and conversation progress. IMPORTANT: Your response must be valid JSON that can be parsed directly."
-    
-    response_text = api_call(prompt, system_message)
-    if not response_text:
-        return None
-    
-    data = extract_json_from_response(response_text)
+def generate_diverse_conversation_histories(scenario, conversation_needed, num_variations=10, coverage_hint=""):
+    """Generate multiple diverse conversation histories for a scenario (coverage_hint: see CoveragePlanner)."""
+    prompt = generate_diverse_conversation_histories_prompt(scenario, conversation_needed, num_variations,
+                                                            coverage_hint)
     
-    if isinstance(data, list) and len(data) > 0:
-        required_keys = ["conversation_objective", "conversation_history", "current_emotional_state", "conversation_point", "variation_description"]
-        valid_variations = [v for v in data if all(k in v for k in required_keys)]
+    with event_log.call_context(stage="variations"):
+        response_text = api_call(prompt, VARIATIONS_SYSTEM_MESSAGE, stage="variations")
+        if not response_text:
+            return None
         
-        if valid_variations:
-            print(f"Successfully generated {len(valid_variations)} conversation history variations")
-            return valid_variations
-    
-    print("Failed to extract valid conversation history variations")
-    return None
+        data = extract_json_from_response(response_text)
+        
+        if isinstance(data, list) and len(data) > 0:
+            required_keys = VARIATION_KEYS + ["variation_description"]
+            valid_variations = [v for v in data if all(k in v for k in required_keys)]
+            
+            if valid_variations:
+                event_log.info("variations_generated",
+                               f"Successfully generated {len(valid_variations)} conversation history variations",
+                               count=len(valid_variations))
+                return valid_variations
+        
+        event_log.warning("variations_invalid", "Failed to extract valid conversation history variations")
+        return None
 
 def generate_optimal_response(scenario, conversation_data, persona_desc):
     """Generate the optimal next response based on scenario, conversation history, and persona."""
     prompt = generate_optimal_response_prompt(scenario, conversation_data, persona_desc)
     
-    system_message = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate optimal responses that demonstrate emotional intelligence and help achieve conversation objectives. IMPORTANT: Your response must be valid JSON that can be parsed directly."
-    
-    response_text = api_call(prompt, system_message)
-    if not response_text:
-        return None
-    
-    data = extract_json_from_response(response_text)
-    
-    if data and all(k in data for k in ["optimal_response", "reasoning"]):
-        print("Successfully generated optimal response")
-        return data
-    else:
-        print("Failed to extract valid optimal response data")
-        return None
+    with event_log.call_context(stage="optimal_response"):
+        response_text = api_call(prompt, OPTIMAL_RESPONSE_SYSTEM_MESSAGE, stage="optimal_response")
+        if not response_text:
+            return None
+        
+        data = extract_json_from_response(response_text)
+        
+        if data and all(k in data for k in ["optimal_response", "reasoning"]):
+            event_log.info("response_generated", "Successfully generated optimal response")
+            return data
+        else:
+            event_log.warning("response_invalid", "Failed to extract valid optimal response data")
+            return None
+
+def scenario_hash(scenario, conversation_needed):
+    """Stable id of a scenario's inputs, stored with every row generated from it"""
+    return hashlib.sha256(f"{scenario}\n{conversation_needed}".encode("utf-8")).hexdigest()[:16]
+
+def prompt_version(stage, template, system_message):
+    """Version of a stage's outputs: a hash of its prompt template, system message and model settings"""
+    settings = api_client.router.apply(stage, dict(GENERATION_SETTINGS))
+    text = json.dumps({"template": template, "system": system_message, "settings": settings}, sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+def prompt_versions():
+    """Current versions of the variations and optimal response stages (routing must be applied first)"""
+    placeholders = {key: "{" + key + "}" for key in VARIATION_KEYS}
+    return {
+        "variations_version": prompt_version(
+            "variations",
+            generate_diverse_conversation_histories_prompt("{scenario}", "{conversation_needed}", "{num_variations}"),
+            VARIATIONS_SYSTEM_MESSAGE,
+        ),
+        "response_version": prompt_version(
+            "optimal_response",
+            generate_optimal_response_prompt("{scenario}", placeholders, "{persona}"),
+            OPTIMAL_RESPONSE_SYSTEM_MESSAGE,
+        ),
+    }
+
+def training_row(scenario, conversation_needed, variation, response_data, lineage, persona=None):
+    """One output row, with the persona and the lineage (scenario_hash, variations_version, response_version) it
+    was built from"""
+    return {
+        "scenario": scenario,
+        "conversation_needed": conversation_needed,
+        "persona": persona,
+        "variation_id": variation.get("variation_id", 0),
+        "variation_description": variation.get("variation_description", "Unknown variation"),
+        "conversation_objective": variation["conversation_objective"],
+        "conversation_history": variation["conversation_history"],
+        "current_emotional_state": variation["current_emotional_state"],
+        "conversation_point": variation["conversation_point"],
+        "optimal_response": response_data["optimal_response"],
+        "reasoning": response_data["reasoning"],
+        **lineage,
+    }
+
+def resume_state_path(checkpoint_file):
+    """Resume state saved next to the progress checkpoint of an interrupted run"""
+    return os.path.splitext(checkpoint_file)[0] + "_resume.json"
+
+def process_scenarios_with_variations(input_file, output_file=None, persona_to_process=None, max_scenarios=None, variations_per_scenario=10, resume_from=None,
+                                      planner=None, variation_pause=3, scenario_pause=10):
+    """Process existing scenarios to generate multiple conversation variations and optimal responses.
+
+    With a coverage_planner.CoveragePlanner, every row is classified into its coverage buckets as it arrives
+    and the run stops once the quotas are filled; a steering planner also chooses the scenarios, asks for the
+    missing stages and emotional states and skips variations that would only add to filled buckets.
+    """
+    import pandas as pd
+    from tqdm import tqdm
 
-def process_scenarios_with_variations(input_file, output_file=None, persona_to_process=None, max_scenarios=None, variations_per_scenario=10, resume_from=None):
-    """Process existing scenarios to generate multiple conversation variations and optimal responses."""
     # Read the existing scenarios
     df = pd.read_csv(input_file)
-    print(f"Loaded {len(df)} scenarios from {input_file}")
+    event_log.info("scenarios_loaded", f"Loaded {len(df)} scenarios from {input_file}", scenarios=len(df))
+    if planner and "persona" in planner.quotas and "persona" not in df.columns:
+        raise ValueError(f"The coverage quotas set persona targets, but {input_file} has no persona column")
+    # Persona of each scenario, for resumed rows written without a persona column
+    scenario_personas = dict(zip(df["scenario"], df["persona"])) if "persona" in df.columns else {}
     
     # If a specific persona is requested, filter for it
     if persona_to_process:
         df = df[df["persona"] == persona_to_process]
-        print(f"Filtered to {len(df)} scenarios for persona {persona_to_process}")
+        event_log.info("scenarios_filtered", f"Filtered to {len(df)} scenarios for persona {persona_to_process}",
+                       scenarios=len(df))
     
     # If max_scenarios is specified, limit the number of scenarios
     if max_scenarios and max_scenarios < len(df):
         df = df.sample(max_scenarios, random_state=42)
-        print(f"Sampled {len(df)} scenarios")
+        event_log.info("scenarios_sampled", f"Sampled {len(df)} scenarios", scenarios=len(df))
     
     # Create a list to store the processed data
     processed_data = []
     
+    # Scenarios finished in earlier runs, and generated variations still waiting for their optimal response
+    resume_state = {}
+    
+    # If resuming from an interrupted run, load its checkpoint and resume state
+    if resume_from and os.path.exists(resume_state_path(resume_from)):
+        with open(resume_state_path(resume_from), encoding="utf-8") as f:
+            resume_state = json.load(f)
+        if os.path.exists(resume_from):
+            processed_data = pd.read_csv(resume_from).to_dict('records')
+        event_log.info("resumed", f"Loaded {len(processed_data)} existing samples from {resume_from}, "
+                       f"{len(resume_state['completed_scenarios'])} scenarios already completed",
+                       samples=len(processed_data), completed_scenarios=len(resume_state['completed_scenarios']))
+    
     # If resuming from a previous run, load existing data
-    if resume_from and os.path.exists(resume_from):
+    elif resume_from and os.path.exists(resume_from):
         try:
             existing_df = pd.read_csv(resume_from)
             processed_data = existing_df.to_dict('records')
-            print(f"Loaded {len(processed_data)} existing samples from {resume_from}")
+            event_log.info("resumed", f"Loaded {len(processed_data)} existing samples from {resume_from}",
+                           samples=len(processed_data))
             
             # Get the scenarios we've already processed
             processed_scenarios = set()
@@ -266,71 +358,174 @@ def process_scenarios_with_variations(input_file, output_file=None, persona_to_p
             
             if df_filtered:
                 df = pd.DataFrame(df_filtered)
-                print(f"Filtered to {len(df)} unprocessed scenarios")
+                event_log.info("scenarios_filtered", f"Filtered to {len(df)} unprocessed scenarios", scenarios=len(df))
             else:
-                print("All scenarios have been processed already")
+                event_log.info("resume_complete", "All scenarios have been processed already")
                 return processed_data
                 
         except Exception as e:
-            print(f"Error loading existing data: {e}")
-            print("Starting from scratch")
+            event_log.error("resume_failed", f"Error loading existing data: {e}. Starting from scratch")
+    
+    completed_scenarios = set(resume_state.get("completed_scenarios", []))
+    # Every row records the prompt versions it was generated with, so rebuild_training_data.py can find stale rows
+    versions = prompt_versions()
+    pending_variations = resume_state.get("pending_variations", {})
     
     # Create a temporary file to save progress
     temp_output_file = output_file or f"data/eq_training_data_diverse_temp_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+    os.makedirs(os.path.dirname(temp_output_file) or ".", exist_ok=True)
     
-    # Process each scenario
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Processing scenarios"):
-        scenario = row["scenario"]
-        conversation_needed = row["conversation_needed"]
-        persona = row.get("persona", "Unknown")  # Use "Unknown" if persona is not in the data
-        
-        print(f"\nProcessing scenario {idx+1}/{len(df)} for persona {persona}")
-        
-        # Get the full persona description
-        persona_desc = persona_map.get(persona, persona)
-        
-        # Generate diverse conversation histories
-        conversation_variations = generate_diverse_conversation_histories(
-            scenario, 
-            conversation_needed,
-            num_variations=variations_per_scenario
-        )
-        
-        if conversation_variations:
-            # Process each variation
-            for variation in tqdm(conversation_variations, desc="Processing variations"):
-                # Generate optimal response for this variation
-                response_data = generate_optimal_response(scenario, variation, persona_desc)
+    if planner:
+        # Rows restored from the interrupted run count toward the quotas
+        for item in processed_data:
+            persona = item.get("persona")
+            if not isinstance(persona, str):
+                persona = scenario_personas.get(item["scenario"], "Unknown")
+            planner.record(planner.classify(persona, item))
+        if processed_data:
+            event_log.info("coverage_resumed", f"Counted {len(processed_data)} resumed samples toward the coverage quotas",
+                           samples=len(processed_data))
+        if "persona" in planner.quotas:
+            unavailable = [persona for persona, wanted in planner.quotas["persona"].items()
+                           if wanted and persona not in set(df["persona"])]
+            if unavailable:
+                event_log.warning("coverage_unavailable", f"No input scenarios for {', '.join(unavailable)}; "
+                                  "their persona quotas cannot be filled", personas=unavailable)
+    
+    # Scenarios in input order, or as the coverage planner schedules them
+    scenario_rows = df.iterrows()
+    if planner:
+        scenario_rows = planner.schedule(list(scenario_rows), persona_of=lambda item: item[1].get("persona", "Unknown"))
+    usage_before = api_client.stage_usage.snapshot()
+    
+    # On Ctrl-C/SIGTERM, finish the call in flight, then save the checkpoint and resume state
+    shutdown = graceful_shutdown.install()
+    interrupted = False
+    
+    try:
+        # Process each scenario
+        for idx, row in tqdm(scenario_rows, total=len(df), desc="Processing scenarios"):
+            if shutdown.requested:
+                break
+            
+            scenario = row["scenario"]
+            conversation_needed = row["conversation_needed"]
+            persona = row.get("persona", "Unknown")  # Use "Unknown" if persona is not in the data
+            scenario_key = f"{persona}_{scenario[:50]}"
+            if scenario_key in completed_scenarios:
+                continue
+            
+            lineage = {"scenario_hash": scenario_hash(scenario, conversation_needed), **versions}
+            with tracing.span("scenario", index=idx, persona=persona), \
+                    event_log.context(scenario=lineage["scenario_hash"]):
+                event_log.info("scenario_start", f"Processing scenario {idx+1}/{len(df)} for persona {persona}",
+                               index=idx, persona=persona)
+            
+                # Get the full persona description
+                persona_desc = persona_map.get(persona, persona)
+            
+                # Generate diverse conversation histories (unless an interrupted run already paid for them)
+                conversation_variations = pending_variations.get(scenario_key)
+                if conversation_variations:
+                    event_log.info("variations_resumed",
+                                   f"Resuming {len(conversation_variations)} variations generated by the interrupted run",
+                                   count=len(conversation_variations))
+                else:
+                    num_variations = planner.variations_wanted(persona, variations_per_scenario) if planner else variations_per_scenario
+                    conversation_variations = generate_diverse_conversation_histories(
+                        scenario, 
+                        conversation_needed,
+                        num_variations=num_variations,
+                        coverage_hint=planner.variation_hint(num_variations) if planner else ""
+                    )
+            
+                if conversation_variations:
+                    pending_variations[scenario_key] = conversation_variations
                 
-                if response_data:
-                    # Combine all data - REMOVED persona and eq_skills_demonstrated
-                    combined_data = {
-                        "scenario": scenario,
-                        "conversation_needed": conversation_needed,
-                        "variation_id": variation.get("variation_id", 0),
-                        "variation_description": variation.get("variation_description", "Unknown variation"),
-                        "conversation_objective": variation["conversation_objective"],
-                        "conversation_history": variation["conversation_history"],
-                        "current_emotional_state": variation["current_emotional_state"],
-                        "conversation_point": variation["conversation_point"],
-                        "optimal_response": response_data["optimal_response"],
-                        "reasoning": response_data["reasoning"]
-                    }
+                    # Process each variation
+                    for i, variation in enumerate(tqdm(conversation_variations, desc="Processing variations")):
+                        if shutdown.requested or (planner and planner.complete()):
+                            break
+                        
+                        buckets = planner.classify(persona, variation) if planner else None
+                        if planner and planner.steer and not planner.useful(buckets):
+                            # Every bucket of this variation is full: not worth an optimal response call
+                            planner.skipped += 1
+                            event_log.debug("variation_skipped", "Variation only adds to filled coverage quotas",
+                                            variation=variation.get("variation_id", i + 1), **buckets)
+                            pending_variations[scenario_key] = conversation_variations[i + 1:]
+                            continue
                     
-                    processed_data.append(combined_data)
+                        # Generate optimal response for this variation
+                        with event_log.context(variation=variation.get("variation_id", i + 1)):
+                            response_data = generate_optimal_response(scenario, variation, persona_desc)
                     
-                    # Save progress after each variation
-                    temp_df = pd.DataFrame(processed_data)
-                    temp_df.to_csv(temp_output_file, index=False)
-                    print(f"Progress saved to {temp_output_file} ({len(processed_data)} samples)")
+                            if response_data:
+                                # Combine all data - REMOVED eq_skills_demonstrated
+                                combined_data = training_row(scenario, conversation_needed, variation, response_data,
+                                                             lineage, persona)
+                            
+                                processed_data.append(combined_data)
+                                if planner:
+                                    planner.record(buckets)
+                            
+                                # Save progress after each variation
+                                temp_df = pd.DataFrame(processed_data)
+                                with tracing.span("checkpoint_write", rows=len(processed_data)):
+                                    temp_df.to_csv(temp_output_file, index=False)
+                                event_log.debug("checkpoint_saved",
+                                                f"Progress saved to {temp_output_file} ({len(processed_data)} samples)",
+                                                rows=len(processed_data))
+                            elif shutdown.requested:
+                                # Shutdown came before the call was sent: the variation stays pending for --resume
+                                break
+                    
+                        pending_variations[scenario_key] = conversation_variations[i + 1:]
+                    
+                        # Small pause between variations to be nice to the API
+                        with tracing.span("pause", seconds=variation_pause):
+                            shutdown.sleep(variation_pause)
                 
-                # Small pause between variations to be nice to the API
-                time.sleep(3)
-            
-            # Longer pause between scenarios
-            wait_time = 10
-            print(f"Waiting {wait_time} seconds before next scenario...")
-            time.sleep(wait_time)
+                    if pending_variations[scenario_key]:
+                        break
+                    del pending_variations[scenario_key]
+                    completed_scenarios.add(scenario_key)
+                
+                    # Longer pause between scenarios
+                    wait_time = scenario_pause
+                    event_log.debug("pause", f"Waiting {wait_time} seconds before next scenario...", seconds=wait_time)
+                    with tracing.span("pause", seconds=wait_time):
+                        shutdown.sleep(wait_time)
+    
+    except KeyboardInterrupt as e:
+        interrupted = True
+        event_log.warning("interrupted", f"Interrupted: {e}")
+    
+    finally:
+        graceful_shutdown.uninstall()
+    
+    if planner:
+        usage_after = api_client.stage_usage.snapshot()
+        calls = sum(totals["calls"] - usage_before.get(stage, {}).get("calls", 0) for stage, totals in usage_after.items())
+        planner.report(calls, f"Coverage ({'targeted' if planner.steer else 'untargeted'}):")
+    
+    if shutdown.requested or interrupted:
+        # Flush everything already paid for and record where to pick up
+        if processed_data:
+            with tracing.span("checkpoint_write", rows=len(processed_data)):
+                pd.DataFrame(processed_data).to_csv(temp_output_file, index=False)
+        with open(resume_state_path(temp_output_file), "w", encoding="utf-8") as f:
+            json.dump({
+                "input_file": input_file,
+                "completed_scenarios": sorted(completed_scenarios),
+                "pending_variations": pending_variations,
+            }, f)
+        event_log.info("checkpoint_saved", f"Saved {len(processed_data)} samples to {temp_output_file} and the resume "
+                       f"state to {resume_state_path(temp_output_file)}. Resume with: --input {input_file} "
+                       f"--resume {temp_output_file}", rows=len(processed_data))
+        if interrupted:
+            sys.exit(130)
+        return processed_data
     
     # Generate final output filename if not provided
     if not output_file:
@@ -340,10 +535,17 @@ def process_scenarios_with_variations(input_file, output_file=None, persona_to_p
     # Save to CSV
     if processed_data:
         final_df = pd.DataFrame(processed_data)
-        final_df.to_csv(output_file, index=False)
-        print(f"\nProcessed {len(processed_data)} total samples across {len(df)} scenarios and saved to {output_file}")
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        with tracing.span("output_write", rows=len(processed_data)):
+            final_df.to_csv(output_file, index=False)
+        event_log.info("output_saved", f"Processed {len(processed_data)} total samples across {len(df)} scenarios "
+                       f"and saved to {output_file}", rows=len(processed_data), scenarios=len(df))
     else:
-        print("No data was processed successfully.")
+        event_log.warning("no_output", "No data was processed successfully.")
+    
+    # The resumed run is complete
+    if resume_from and os.path.exists(resume_state_path(resume_from)):
+        os.remove(resume_state_path(resume_from))
     
     return processed_data
 
@@ -364,17 +566,41 @@ if __name__ == "__main__":
                         help='Run in test mode (1 scenario, 3 variations)')
     parser.add_argument('--resume', type=str, default=None,
                         help='Resume from a previous run by loading this CSV file')
+    parser.add_argument('--hedge', action='store_true',
+                        help='Send a duplicate request when a call is slower than usual (also EQ_HEDGE=1)')
+    api_client.add_routing_arguments(parser)
+    parser.add_argument('--trace', type=str, default=None,
+                        help='Write a trace of API calls and pipeline steps to this JSON file (also EQ_TRACE=path)')
+    parser.add_argument('--coverage', type=str, default=None,
+                        help='Coverage quotas (JSON file or inline JSON, e.g. \'{"persona": 5, "stage": 10, "emotion": 5}\'): '
+                             'steer generation toward unfilled buckets and stop when all are filled')
+    parser.add_argument('--coverage_untargeted', action='store_true',
+                        help='With --coverage, only track coverage (and stop when filled) without steering')
+    event_log.add_arguments(parser)
     
     args = parser.parse_args()
     
     # If test mode is enabled, override other settings
     if args.test:
-        print("Running in TEST mode - processing 1 scenario with 3 variations")
+        event_log.info("test_mode", "Running in TEST mode - processing 1 scenario with 3 variations")
         args.max_scenarios = 1
         args.variations = 3
         if not args.output:
             args.output = f"data/eq_training_data_TEST_{time.strftime('%Y%m%d-%H%M%S')}.csv"
     
+    if args.hedge:
+        api_client.hedging.configure(enabled=True)
+    api_client.apply_routing_arguments(args)
+    if args.trace:
+        tracing.start(args.trace)
+    event_log.apply_arguments(args)
+    
+    planner = None
+    if args.coverage:
+        from coverage_planner import CoveragePlanner, load_quotas
+        planner = CoveragePlanner(load_quotas(args.coverage), personas=list(persona_map),
+                                  steer=not args.coverage_untargeted)
+    
     # Process scenarios with variations
     process_scenarios_with_variations(
         input_file=args.input,
@@ -382,5 +608,7 @@ if __name__ == "__main__":
         persona_to_process=args.persona,
         max_scenarios=args.max_scenarios,
         variations_per_scenario=args.variations,
-        resume_from=args.resume
-    ) 
\ No newline at end of file
+        resume_from=args.resume,
+        planner=planner
+    )
+    event_log.info("breaker_summary", api_client.breaker.report())
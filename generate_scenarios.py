@@ -1,19 +1,26 @@
 import os
 import time
 import json
-import pandas as pd
-from tqdm import tqdm
-from dotenv import load_dotenv
-from anthropic import Anthropic, APIError, APIStatusError, RateLimitError
+import argparse
 
-# Load environment variables
-load_dotenv()
+import api_client
+import event_log
+import graceful_shutdown
+import tracing
 
-# Initialize Anthropic client
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+# Anthropic client, created on first use by get_client()
+client = None
 
-# Create data directory if it doesn't exist
-os.makedirs("data", exist_ok=True)
+
+def get_client():
+    """Load environment variables and create the Anthropic client on first use."""
+    global client
+    if client is None:
+        from anthropic import Anthropic
+        from dotenv import load_dotenv
+        load_dotenv()
+        client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    return client
 
 # Define personas with varying levels of EQ
 personas = [
@@ -53,12 +60,10 @@ Example format:
 }}
 """
 
+@tracing.traced("json_extraction")
 def extract_json_from_response(response_text, persona_name, attempt_number):
     """Extract JSON from the response text, handling potential formatting issues."""
-    # Print the first 200 characters of the response for debugging
-    print(f"\n--- Response Preview (first 200 chars) ---")
-    print(response_text[:200] + "..." if len(response_text) > 200 else response_text)
-    print("--- End Preview ---\n")
+    event_log.preview("response_preview", response_text, attempt=attempt_number)
     
     try:
         # First try direct JSON parsing
@@ -71,128 +76,199 @@ def extract_json_from_response(response_text, persona_name, attempt_number):
             
             if start_idx >= 0 and end_idx > start_idx:
                 json_str = response_text[start_idx:end_idx]
-                print(f"Extracted JSON substring: {json_str[:100]}...")
+                event_log.preview("json_extracted", json_str, limit=100)
                 return json.loads(json_str)
             else:
-                print(f"No JSON found in response for {persona_name}")
+                event_log.warning("json_missing", f"No JSON found in response for {persona_name}")
                 return None
     except json.JSONDecodeError as e:
-        print(f"Failed to parse JSON from response for {persona_name}: {e}")
+        event_log.warning("json_invalid", f"Failed to parse JSON from response for {persona_name}: {e}")
         return None
 
+@tracing.traced("generate_scenario")
 def generate_scenario(persona, attempt=1, max_attempts=3):
     """Generate a scenario and required conversation for a given persona."""
     persona_name = persona.split(':')[0]
+    if not graceful_shutdown.admitting_calls():
+        event_log.info("call_skipped", f"Shutting down: not generating a scenario for {persona_name}")
+        return None
     prompt = generate_scenario_prompt(persona)
     
-    # Print prompt for debugging
-    print(f"\n--- Prompt for {persona_name} ---")
-    print(prompt[:200] + "..." if len(prompt) > 200 else prompt)
-    print("--- End Prompt ---\n")
+    event_log.preview("prompt_preview", prompt, attempt=attempt)
+    event_log.debug("call_start", f"Generating scenario for {persona_name} (attempt {attempt}/{max_attempts})",
+                    attempt=attempt)
     
-    print(f"\nGenerating scenario for {persona_name} (attempt {attempt}/{max_attempts})")
+    from anthropic import APIStatusError, RateLimitError
+
+    system_message = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate realistic, challenging scenarios that test emotional intelligence. Each scenario must have a clear objective that requires specific EQ skills to achieve. The conversation needed should outline the goal, challenges, and required skills. IMPORTANT: Your response must be valid JSON that can be parsed directly."
     
     try:
-        response = client.messages.create(
+        messages = [{"role": "user", "content": prompt}]
+        response = api_client.create_message(
+            get_client(),
+            stage="scenario",
             model="claude-3-5-sonnet-20240620",
             max_tokens=1000,
             temperature=0.7,
-            system="You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate realistic, challenging scenarios that test emotional intelligence. Each scenario must have a clear objective that requires specific EQ skills to achieve. The conversation needed should outline the goal, challenges, and required skills. IMPORTANT: Your response must be valid JSON that can be parsed directly.",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+            system=system_message,
+            messages=messages
         )
         
         # Extract JSON from the response
         data = extract_json_from_response(response.content[0].text, persona_name, attempt)
         
         if data and "scenario" in data and "conversation_needed" in data:
-            print(f"Successfully generated scenario for {persona_name}")
-            # Print a preview of the extracted data
-            print(f"Scenario preview: {data['scenario'][:100]}...")
-            print(f"Conversation needed preview: {data['conversation_needed'][:100]}...")
+            event_log.info("scenario_generated", f"Successfully generated scenario for {persona_name}")
+            event_log.preview("scenario_preview", data["scenario"], limit=100)
+            event_log.preview("conversation_needed_preview", data["conversation_needed"], limit=100)
             return data
         else:
-            print(f"Failed to extract valid data for persona: {persona_name}")
+            event_log.warning("scenario_invalid", f"Failed to extract valid data for persona: {persona_name}",
+                              attempt=attempt)
             if attempt < max_attempts:
-                print(f"Retrying ({attempt+1}/{max_attempts})...")
-                time.sleep(5)  # Wait longer between retries
+                event_log.info("retry", f"Retrying ({attempt+1}/{max_attempts})...")
+                with tracing.span("retry_sleep", seconds=5):
+                    graceful_shutdown.sleep(5)  # Wait longer between retries
                 return generate_scenario(persona, attempt+1, max_attempts)
             return None
             
     except RateLimitError as e:
-        print(f"Rate limit error: {e}")
+        event_log.warning("rate_limited", f"Rate limit error: {e}", attempt=attempt)
         if attempt < max_attempts:
             wait_time = min(2 ** attempt * 5, 60)  # Exponential backoff
-            print(f"Waiting {wait_time} seconds before retry...")
-            time.sleep(wait_time)
+            event_log.info("retry_wait", f"Waiting {wait_time} seconds before retry...", seconds=wait_time)
+            with tracing.span("retry_sleep", seconds=wait_time):
+                graceful_shutdown.sleep(wait_time)
             return generate_scenario(persona, attempt+1, max_attempts)
         return None
         
     except APIStatusError as e:
-        if e.status_code == 529:  # Overloaded
-            print(f"API overloaded. Waiting before retry...")
-            if attempt < max_attempts:
-                wait_time = min(2 ** attempt * 10, 120)  # Longer exponential backoff
-                print(f"Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
-                return generate_scenario(persona, attempt+1, max_attempts)
-        else:
-            print(f"API error: {e}")
+        # Overload errors (529) never get here: the shared circuit breaker requeues those calls
+        event_log.error("api_error", f"API error: {e}", attempt=attempt)
         return None
         
     except Exception as e:
-        print(f"Error generating scenario: {e}")
+        event_log.error("call_failed", f"Error generating scenario: {e}", attempt=attempt)
         return None
 
-def main():
-    """Main function to generate scenarios for all personas and save to CSV."""
+def main(planner=None):
+    """Main function to generate scenarios for all personas and save to CSV.
+
+    Two scenarios are generated per persona. With a coverage_planner.CoveragePlanner holding persona quotas,
+    each scenario is classified as it arrives, the persona furthest from its quota goes next and generation
+    stops once every quota is filled; the output then keeps the persona column.
+    """
+    import pandas as pd
+    from tqdm import tqdm
+
     all_scenarios = []
     
-    print(f"Generating scenarios for {len(personas)} personas...")
+    event_log.info("run_start", f"Generating scenarios for {len(personas)} personas...", personas=len(personas))
+    
+    # Generate 2 scenarios per persona (reduced from 3), or what the coverage planner schedules
+    if planner is None:
+        slots = [(persona, i) for persona in personas for i in range(2)]
+    else:
+        # Room for two failed generations per persona
+        per_persona = max(planner.quotas.get("persona", {}).values(), default=0) + 2
+        slots = planner.schedule([(persona, i) for i in range(per_persona) for persona in personas],
+                                 persona_of=lambda slot: slot[0].split(':')[0])
+    scenarios_per_persona = {persona.split(':')[0]: 0 for persona in personas}
+    usage_before = api_client.stage_usage.snapshot()
     
     # Save any successful scenarios as we go
     temp_df_path = "data/temp_scenarios.csv"
+    os.makedirs("data", exist_ok=True)
     
-    for persona in tqdm(personas, desc="Personas"):
-        persona_scenarios = []
-        
-        # Generate 2 scenarios per persona (reduced from 3)
-        for i in range(2):
-            print(f"\nGenerating scenario {i+1}/2 for {persona.split(':')[0]}")
-            data = generate_scenario(persona)
+    # On Ctrl-C/SIGTERM, finish the call in flight and write what was generated
+    shutdown = graceful_shutdown.install()
+    
+    try:
+        for persona, i in tqdm(slots, desc="Scenarios"):
+            if shutdown.requested:
+                event_log.info("stopped", f"Stopped early: {len(all_scenarios)} scenarios generated")
+                break
+            persona_name = persona.split(':')[0]
+            with event_log.context(scenario=f"{persona_name}-{i+1}"), event_log.call_context(stage="scenario"):
+                event_log.info("scenario_start", f"Generating scenario {i+1} for {persona_name}")
+                data = generate_scenario(persona)
             
             if data:
                 # Add persona information to the data
-                data["persona"] = persona.split(':')[0]
+                data["persona"] = persona_name
                 all_scenarios.append(data)
-                persona_scenarios.append(data)
+                scenarios_per_persona[persona_name] += 1
+                if planner:
+                    planner.record(planner.classify(persona_name))
                 
                 # Save progress after each successful generation
                 temp_df = pd.DataFrame(all_scenarios)
-                temp_df.to_csv(temp_df_path, index=False)
-                print(f"Progress saved to {temp_df_path}")
+                with tracing.span("checkpoint_write", rows=len(all_scenarios)):
+                    temp_df.to_csv(temp_df_path, index=False)
+                event_log.debug("checkpoint_saved", f"Progress saved to {temp_df_path}", rows=len(all_scenarios))
                 
             # Rate limiting - be nice to the API
             wait_time = 10  # Increased wait time between requests
-            print(f"Waiting {wait_time} seconds before next request...")
-            time.sleep(wait_time)
-        
-        print(f"Completed {len(persona_scenarios)} scenarios for {persona.split(':')[0]}")
+            event_log.debug("pause", f"Waiting {wait_time} seconds before next request...", seconds=wait_time)
+            with tracing.span("pause", seconds=wait_time):
+                shutdown.sleep(wait_time)
+    
+    except KeyboardInterrupt as e:
+        event_log.warning("interrupted", f"Interrupted: {e}")
+    
+    finally:
+        graceful_shutdown.uninstall()
+    
+    event_log.info("scenarios_per_persona",
+                   "Scenarios per persona: " + ", ".join(f"{name} {count}" for name, count in scenarios_per_persona.items()),
+                   counts=scenarios_per_persona)
+    if planner:
+        usage_after = api_client.stage_usage.snapshot()
+        calls = usage_after.get("scenario", {}).get("calls", 0) - usage_before.get("scenario", {}).get("calls", 0)
+        planner.report(calls)
+    
+    if not all_scenarios:
+        event_log.warning("no_output", "No scenarios were generated.")
+        return
     
     # Convert to DataFrame
     df = pd.DataFrame(all_scenarios)
     
-    # Save only the required columns
-    output_df = df[["scenario", "conversation_needed"]]
+    # Save only the required columns (and the persona, which coverage quotas downstream need)
+    output_df = df[["scenario", "conversation_needed"] + (["persona"] if planner else [])]
     
     # Generate timestamp for filename
     timestamp = time.strftime("%Y%m%d-%H%M%S")
     filename = f"data/eq_scenarios_{timestamp}.csv"
     
     # Save to CSV
-    output_df.to_csv(filename, index=False)
-    print(f"\nGenerated {len(all_scenarios)} scenarios and saved to {filename}")
+    with tracing.span("output_write", rows=len(output_df)):
+        output_df.to_csv(filename, index=False)
+    event_log.info("output_saved", f"Generated {len(all_scenarios)} scenarios and saved to {filename}",
+                   rows=len(all_scenarios))
+    event_log.info("breaker_summary", api_client.breaker.report())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Generate EQ scenarios for every persona')
+    parser.add_argument('--coverage', type=str, default=None,
+                        help='Coverage quotas (JSON file or inline JSON, e.g. \'{"persona": 5}\'); only the persona '
+                             'quotas apply to scenarios')
+    api_client.add_routing_arguments(parser)
+    parser.add_argument('--trace', type=str, default=None,
+                        help='Write a trace of API calls and pipeline steps to this JSON file (also EQ_TRACE=path)')
+    event_log.add_arguments(parser)
+    
+    args = parser.parse_args()
+    api_client.apply_routing_arguments(args)
+    if args.trace:
+        tracing.start(args.trace)
+    event_log.apply_arguments(args)
+    
+    planner = None
+    if args.coverage:
+        from coverage_planner import CoveragePlanner, load_quotas
+        quotas = load_quotas(args.coverage)
+        if "persona" not in quotas:
+            parser.error("--coverage needs persona quotas for scenario generation")
+        planner = CoveragePlanner({"persona": quotas["persona"]}, personas=[p.split(':')[0] for p in personas])
+    main(planner) 
\ No newline at end of file
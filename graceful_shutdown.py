@@ -0,0 +1,96 @@
+import time
+import signal
+import threading
+
+import event_log
+
+
+class GracefulShutdown:
+    """SIGINT/SIGTERM handling for long generation runs.
+
+    The first signal only sets a flag: the run stops starting new API calls, lets the call in flight finish
+    (it is already paid for) and saves its progress. If the call has not finished after `deadline` seconds,
+    or a second signal arrives, KeyboardInterrupt is raised so the run saves what it has and exits at once.
+    """
+
+    def __init__(self, deadline=120):
+        self.deadline = deadline
+        self.event = threading.Event()
+        self.signals_received = 0
+        self.previous_handlers = {}
+
+    def install(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.previous_handlers[signum] = signal.signal(signum, self.handle)
+        return self
+
+    def uninstall(self):
+        if hasattr(signal, "SIGALRM"):
+            signal.alarm(0)
+        for signum, handler in self.previous_handlers.items():
+            signal.signal(signum, handler)
+        self.previous_handlers = {}
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    def handle(self, signum, frame):
+        self.signals_received += 1
+        if self.signals_received > 1:
+            raise KeyboardInterrupt("Second signal: exiting without waiting for calls in flight")
+        self.event.set()
+        event_log.warning("shutdown_requested", f"Received {signal.Signals(signum).name}: no new API calls will be "
+                          f"started. Waiting up to {self.deadline}s for the call in flight, then saving progress "
+                          "(signal again to exit now).", signal=signal.Signals(signum).name)
+        if hasattr(signal, "SIGALRM"):
+            signal.signal(signal.SIGALRM, self.handle_deadline)
+            signal.alarm(max(1, int(self.deadline)))
+
+    def handle_deadline(self, signum, frame):
+        raise KeyboardInterrupt(f"Calls in flight did not finish within {self.deadline}s")
+
+    @property
+    def requested(self):
+        return self.event.is_set()
+
+    def sleep(self, seconds):
+        """Sleep between calls, waking early on shutdown; returns True if shutdown was requested"""
+        return self.event.wait(seconds)
+
+
+# Shared by the generators' API call helpers, so retries stop once shutdown was requested
+_active = None
+
+
+def active():
+    """The installed GracefulShutdown of this process, or None"""
+    return _active
+
+
+def install(deadline=120):
+    global _active
+    _active = GracefulShutdown(deadline).install()
+    return _active
+
+
+def uninstall():
+    global _active
+    if _active is not None:
+        _active.uninstall()
+        _active = None
+
+
+def admitting_calls():
+    """False once shutdown was requested: API call helpers check this before starting a call"""
+    return _active is None or not _active.requested
+
+
+def sleep(seconds):
+    """time.sleep that wakes early when shutdown is requested"""
+    if _active is None:
+        time.sleep(seconds)
+    else:
+        _active.sleep(seconds)
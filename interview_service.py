@@ -0,0 +1,351 @@
+import os
+import sys
+import json
+import gzip
+import time
+import uuid
+import asyncio
+import argparse
+import functools
+import resource
+from concurrent.futures import ThreadPoolExecutor
+
+import api_client
+import tracing
+from emotional_interviewer import Interviewer
+
+# Interviewer options a client may set when starting a session
+SESSION_OPTIONS = ("context_turns", "context_token_budget", "prompt_caching", "fused")
+
+
+class Session:
+    """An interviewer session held in memory, or evicted to a snapshot on disk when interviewer is None."""
+
+    def __init__(self, session_id, interviewer):
+        self.session_id = session_id
+        self.interviewer = interviewer
+        self.last_used = time.monotonic()
+        # Turns of one session run one at a time
+        self.lock = asyncio.Lock()
+
+
+class InterviewService:
+    """Holds many Interviewer sessions by id and runs their turns concurrently.
+
+    Turns run in a thread pool under a global concurrency limit. Sessions idle for longer than
+    idle_timeout (or beyond max_resident, least recently used first) are written to compact gzipped
+    JSON snapshots in snapshot_dir and restored transparently on their next turn. Snapshot writes and
+    reads have a small pool of their own (snapshot_workers), so evictions never take a turn's slot.
+    """
+
+    def __init__(self, max_concurrency=32, idle_timeout=300, max_resident=1000, snapshot_dir="data/sessions",
+                 opening_pool=None, snapshot_workers=4):
+        self.max_concurrency = max_concurrency
+        self.idle_timeout = idle_timeout
+        self.max_resident = max_resident
+        self.snapshot_dir = snapshot_dir
+        # Shared by all sessions: a session started without text opens with a pre-generated opening
+        self.opening_pool = opening_pool
+        self.sessions = {}
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.snapshot_executor = ThreadPoolExecutor(max_workers=snapshot_workers)
+        self.started = time.monotonic()
+        # Process memory before any session: interpreter, imports and (after warm_up) the API client
+        self.baseline_rss = current_rss()
+        self.turns_completed = 0
+        self.turn_seconds = 0.0
+        self.evictions = 0
+        self.restores = 0
+
+    def snapshot_path(self, session_id):
+        return os.path.join(self.snapshot_dir, f"{session_id}.json.gz")
+
+    async def start_session(self, session_id=None, options=None):
+        """Create a new session and return its id"""
+        session_id = session_id or uuid.uuid4().hex
+        if session_id in self.sessions:
+            raise ValueError(f"Session {session_id} already exists")
+        options = {k: v for k, v in (options or {}).items() if k in SESSION_OPTIONS}
+        # Constructing an interviewer loads the environment and sets up its client: keep it off the event loop
+        loop = asyncio.get_running_loop()
+        interviewer = await loop.run_in_executor(
+            self.executor, functools.partial(Interviewer, opening_pool=self.opening_pool, **options)
+        )
+        if session_id in self.sessions:
+            raise ValueError(f"Session {session_id} already exists")
+        self.sessions[session_id] = Session(session_id, interviewer)
+        await self.enforce_max_resident()
+        return session_id
+
+    async def get_interviewer(self, session):
+        """Return the session's interviewer, restoring it from its snapshot if it was evicted"""
+        if session.interviewer is None:
+            loop = asyncio.get_running_loop()
+            session.interviewer = await loop.run_in_executor(
+                self.snapshot_executor, restore_snapshot, self.snapshot_path(session.session_id), self.opening_pool
+            )
+            self.restores += 1
+        return session.interviewer
+
+    async def turn(self, session_id, text):
+        """Run one candidate turn and return the interviewer's (emotions, thoughts, response, emotion_score)"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"Unknown session {session_id}")
+        async with session.lock:
+            interviewer = await self.get_interviewer(session)
+            async with self.semaphore:
+                loop = asyncio.get_running_loop()
+                start = time.perf_counter()
+                result = await loop.run_in_executor(self.executor, interviewer.get_response, text)
+                self.turn_seconds += time.perf_counter() - start
+            self.turns_completed += 1
+            session.last_used = time.monotonic()
+        await self.enforce_max_resident()
+        return result
+
+    async def end_session(self, session_id):
+        """Drop a session and its snapshot"""
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            raise KeyError(f"Unknown session {session_id}")
+        if session.interviewer is None and os.path.exists(self.snapshot_path(session_id)):
+            os.remove(self.snapshot_path(session_id))
+
+    async def evict(self, session):
+        """Write an idle session to its snapshot and release its memory"""
+        async with session.lock:
+            if session.interviewer is None:
+                return
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.snapshot_executor, save_snapshot, self.snapshot_path(session.session_id), session.interviewer
+            )
+            session.interviewer = None
+            self.evictions += 1
+
+    async def evict_idle(self):
+        """Evict every resident session that has been idle longer than idle_timeout"""
+        now = time.monotonic()
+        for session in list(self.sessions.values()):
+            if session.interviewer is not None and not session.lock.locked() and now - session.last_used > self.idle_timeout:
+                await self.evict(session)
+
+    async def enforce_max_resident(self):
+        """Evict least recently used sessions while more than max_resident are in memory"""
+        resident = [s for s in self.sessions.values() if s.interviewer is not None and not s.lock.locked()]
+        excess = sum(1 for s in self.sessions.values() if s.interviewer is not None) - self.max_resident
+        for session in sorted(resident, key=lambda s: s.last_used)[:max(0, excess)]:
+            await self.evict(session)
+
+    async def eviction_loop(self, interval=10):
+        while True:
+            await asyncio.sleep(interval)
+            await self.evict_idle()
+
+    def stats(self):
+        """Sessions per process, turn throughput and memory per resident session"""
+        resident = sum(1 for s in self.sessions.values() if s.interviewer is not None)
+        elapsed = time.monotonic() - self.started
+        # ru_maxrss is in kilobytes on Linux
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        rss = current_rss()
+        return {
+            "sessions": len(self.sessions),
+            "resident_sessions": resident,
+            "evicted_sessions": len(self.sessions) - resident,
+            "evictions": self.evictions,
+            "restores": self.restores,
+            "turns_completed": self.turns_completed,
+            "turns_per_second": self.turns_completed / elapsed if elapsed else 0.0,
+            "mean_turn_seconds": self.turn_seconds / self.turns_completed if self.turns_completed else 0.0,
+            "max_rss_bytes": max_rss,
+            "rss_bytes": rss,
+            "baseline_rss_bytes": self.baseline_rss,
+            # Growth of the process since the service started, shared out over the sessions in memory
+            "rss_growth_bytes_per_resident_session": (rss - self.baseline_rss) // resident if resident else None,
+            "circuit_breaker": api_client.breaker.stats(),
+            "opening_pool": self.opening_pool.stats() if self.opening_pool is not None else None,
+        }
+
+    async def handle(self, request):
+        """Handle one JSON request and return the JSON response"""
+        op = request.get("op")
+        response = {"id": request.get("id"), "ok": True}
+        try:
+            if op == "start":
+                response["session"] = await self.start_session(request.get("session"), request.get("options"))
+            elif op == "turn":
+                emotions, thoughts, reply, emotion_score = await self.turn(request["session"], request.get("text"))
+                response.update(session=request["session"], emotions=emotions, thoughts=thoughts,
+                                response=reply, emotion_score=emotion_score)
+            elif op == "end":
+                await self.end_session(request["session"])
+                response["session"] = request["session"]
+            elif op == "stats":
+                response["stats"] = self.stats()
+            else:
+                raise ValueError(f"Unknown op {op!r}")
+        except Exception as e:
+            response = {"id": request.get("id"), "ok": False, "error": f"{type(e).__name__}: {e}"}
+        return response
+
+
+def current_rss():
+    """Resident set size of this process in bytes (the peak, where /proc is not available)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def warm_up():
+    """Import the SDK and build the shared API client, so the service's RSS baseline includes them"""
+    Interviewer().get_client()
+
+
+def write_snapshot(path, state):
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+
+
+def read_snapshot(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_snapshot(path, interviewer):
+    """Write an interviewer's state to its snapshot (runs on the snapshot pool)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    write_snapshot(path, interviewer.get_state())
+
+
+def restore_snapshot(path, opening_pool):
+    """Rebuild an interviewer from its snapshot and remove the snapshot (runs on the snapshot pool)"""
+    interviewer = Interviewer.from_state(read_snapshot(path))
+    interviewer.opening_pool = opening_pool
+    os.remove(path)
+    return interviewer
+
+
+async def serve_lines(service, reader, write_line):
+    """Read newline-delimited JSON requests and answer each one as soon as it completes"""
+    pending = set()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            await write_line({"ok": False, "error": f"Invalid JSON: {e}"})
+            continue
+
+        async def answer(request):
+            await write_line(await service.handle(request))
+
+        task = asyncio.create_task(answer(request))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+
+
+async def serve_tcp(service, host, port):
+    async def on_connect(reader, writer):
+        write_lock = asyncio.Lock()
+
+        async def write_line(response):
+            async with write_lock:
+                writer.write((json.dumps(response) + "\n").encode("utf-8"))
+                await writer.drain()
+
+        try:
+            await serve_lines(service, reader, write_line)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(on_connect, host, port)
+    print(f"Interview service listening on {host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+async def serve_stdio(service):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    # Keep stdout for the protocol; progress and error prints go to stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    async def write_line(response):
+        protocol_out.write(json.dumps(response) + "\n")
+        protocol_out.flush()
+
+    await serve_lines(service, reader, write_line)
+
+
+async def main(args):
+    opening_pool = None
+    if args.opening_pool:
+        from opening_pool import load_pool
+        opening_pool = load_pool(args.opening_pool, args.opening_pool_size, args.opening_refill_per_minute)
+        # Fill the pool in the background while the service starts taking requests
+        opening_pool.start_refill()
+    warm_up()
+    service = InterviewService(args.concurrency, args.idle_timeout, args.max_resident, args.snapshot_dir,
+                               opening_pool, args.snapshot_workers)
+    eviction_task = asyncio.create_task(service.eviction_loop())
+    try:
+        if args.stdio:
+            await serve_stdio(service)
+        else:
+            await serve_tcp(service, args.host, args.port)
+    finally:
+        eviction_task.cancel()
+        service.executor.shutdown(wait=False)
+        service.snapshot_executor.shutdown(wait=False)
+        if opening_pool is not None:
+            # Openings served since the refill last wrote the pool file
+            opening_pool.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run many interviewer sessions over newline-delimited JSON')
+    parser.add_argument('--stdio', action='store_true',
+                        help='Serve requests on stdin/stdout instead of TCP')
+    parser.add_argument('--host', type=str, default="127.0.0.1",
+                        help='TCP host to listen on')
+    parser.add_argument('--port', type=int, default=8770,
+                        help='TCP port to listen on')
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help='Maximum number of turns processed at once across all sessions')
+    parser.add_argument('--idle_timeout', type=float, default=300,
+                        help='Seconds of inactivity before a session is evicted to disk')
+    parser.add_argument('--max_resident', type=int, default=1000,
+                        help='Maximum number of sessions kept in memory')
+    parser.add_argument('--snapshot_dir', type=str, default="data/sessions",
+                        help='Directory for evicted session snapshots')
+    parser.add_argument('--snapshot_workers', type=int, default=4,
+                        help='Threads writing and reading session snapshots, separate from the turn threads')
+    parser.add_argument('--opening_pool', type=str, default=None,
+                        help='Opening pool file (e.g. data/opening_pool.json): sessions started without text open instantly')
+    parser.add_argument('--opening_pool_size', type=int, default=20,
+                        help='Number of pre-generated openings to keep')
+    parser.add_argument('--opening_refill_per_minute', type=float, default=30,
+                        help='Maximum openings generated per minute to refill the pool')
+    api_client.add_routing_arguments(parser)
+    parser.add_argument('--trace', type=str, default=None,
+                        help='Write a trace of API calls and pipeline steps to this JSON file (also EQ_TRACE=path)')
+
+    args = parser.parse_args()
+    api_client.apply_routing_arguments(args)
+    if args.trace:
+        tracing.start(args.trace)
+    asyncio.run(main(args))
@@ -0,0 +1,80 @@
+def estimate_tokens(text):
+    """Rough token estimate (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def messages_tokens(messages):
+    """Estimate the prompt tokens of a list of messages."""
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+
+def split_turns(messages):
+    """Split a message list into turns; each turn starts with a user message."""
+    turns = []
+    for message in messages:
+        if message["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+SUMMARY_PROMPT = (
+    "You are keeping the running notes of an interviewer during a job assessment interview. "
+    "You will get the previous notes and the next part of the interview, where the interviewer's private "
+    "emotions are marked [emotions] and private thoughts are marked [thoughts]. "
+    "Update the notes so they cover: which topics were asked and how the candidate answered, "
+    "how the interviewer's emotional state developed, and the interviewer's current assessment of the candidate. "
+    "Keep the notes short (under 200 words). Only print the updated notes and nothing else."
+)
+
+
+class RollingContext:
+    """Bounded interviewer context: the last K turns verbatim plus a rolling summary of older turns.
+
+    Older turns are folded into the summary incrementally, once each, as they leave the window.
+    If the prompt is still over the token budget, more turns are folded (down to the current turn).
+    """
+
+    def __init__(self, summarize, keep_turns=4, max_prompt_tokens=6000):
+        # summarize(previous_summary, turn_messages) -> updated summary text
+        self.summarize = summarize
+        self.keep_turns = max(1, keep_turns)
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summary = ""
+        self.folded_turns = 0
+
+    def fold(self, turns):
+        """Fold the given turns into the running summary."""
+        transcript = []
+        for turn in turns:
+            for message in turn:
+                speaker = "Candidate" if message["role"] == "user" else "Interviewer"
+                transcript.append(f"{speaker}: {message['content']}")
+        self.summary = self.summarize(self.summary, "\n".join(transcript)).strip()
+        self.folded_turns += len(turns)
+
+    def render(self, turns):
+        """Build the message list from the summary and the given verbatim turns."""
+        messages = [dict(m) for turn in turns for m in turn]
+        if self.summary and messages:
+            # The API needs the first message to be from the user, so the summary rides along with it
+            messages[0]["content"] = (
+                f"[summary of the interview so far]{self.summary}[/summary]\n\n{messages[0]['content']}"
+            )
+        return messages
+
+    def build(self, messages):
+        """Return the bounded message list to send for the full interview `messages`."""
+        turns = split_turns(messages)
+
+        # Fold turns that have left the verbatim window
+        window_start = max(self.folded_turns, len(turns) - self.keep_turns)
+        if window_start > self.folded_turns:
+            self.fold(turns[self.folded_turns:window_start])
+
+        # Stay under the token budget by folding more of the oldest verbatim turns
+        prompt = self.render(turns[self.folded_turns:])
+        while messages_tokens(prompt) > self.max_prompt_tokens and self.folded_turns < len(turns) - 1:
+            self.fold(turns[self.folded_turns:self.folded_turns + 1])
+            prompt = self.render(turns[self.folded_turns:])
+        return prompt
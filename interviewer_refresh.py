@@ -0,0 +1,50 @@
+import string
+
+# Replies that carry no new information about the candidate, whatever their length
+ACKNOWLEDGEMENTS = {
+    "ok", "okay", "ok sure", "sure", "yes", "yeah", "yep", "no", "nope", "right", "alright", "all right",
+    "got it", "i see", "thanks", "thank you", "sounds good", "makes sense", "mm", "mhm", "hmm", "uh huh",
+    "go ahead", "please continue", "cool", "great", "perfect", "fine",
+}
+
+# Stored in place of emotions or thoughts that were not regenerated for a message
+REUSED_STATE = "(unchanged: not regenerated for this message)"
+
+
+class RefreshPolicy:
+    """When the interviewer regenerates its internal monologue (and optionally its emotions).
+
+    The monologue call is skipped and the latest thoughts are reused when the candidate's message is
+    low-information (fewer than min_words words, or a plain acknowledgement), unless the thoughts are
+    refresh_every turns old or the emotion score moved more than score_threshold since they were
+    generated. With reuse_emotions, low-information messages also reuse the emotions and score, so only
+    the reply is generated (still at least every refresh_every turns).
+    """
+
+    def __init__(self, min_words=4, refresh_every=3, score_threshold=15, reuse_emotions=False):
+        self.min_words = min_words
+        self.refresh_every = max(1, refresh_every)
+        self.score_threshold = score_threshold
+        self.reuse_emotions = reuse_emotions
+
+    def low_information(self, text):
+        words = text.lower().translate(str.maketrans("", "", string.punctuation)).split()
+        return len(words) < self.min_words or " ".join(words) in ACKNOWLEDGEMENTS
+
+    def reuse_thoughts(self, text, score, thoughts_age, thoughts_score):
+        """Whether the thoughts generated thoughts_age turns ago (at emotion score thoughts_score) still hold"""
+        if thoughts_age is None or thoughts_age >= self.refresh_every:
+            return False
+        if score is not None and thoughts_score is not None and abs(score - thoughts_score) > self.score_threshold:
+            return False
+        return self.low_information(text)
+
+    def reuse_state(self, text, emotions_age, thoughts_age):
+        """Whether the latest emotions, score and thoughts can all be reused (only with reuse_emotions)"""
+        ages = (emotions_age, thoughts_age)
+        return (self.reuse_emotions and all(age is not None and age < self.refresh_every for age in ages)
+                and self.low_information(text))
+
+    def to_dict(self):
+        return {"min_words": self.min_words, "refresh_every": self.refresh_every,
+                "score_threshold": self.score_threshold, "reuse_emotions": self.reuse_emotions}
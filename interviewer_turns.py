@@ -0,0 +1,160 @@
+from types import MappingProxyType
+from collections.abc import Sequence
+
+from interviewer_context import split_turns
+
+EMOTIONS_TAGS = ("[emotions]", "[/emotions]")
+THOUGHTS_TAGS = ("[thoughts]", "[/thoughts]")
+
+
+def tagged(text, tags):
+    return f"{tags[0]}{text}{tags[1]}"
+
+
+def untagged(text, tags):
+    if text is None:
+        return None
+    return text[len(tags[0]):len(text) - len(tags[1])]
+
+
+class Turn:
+    """One interview turn: the candidate's message and the interviewer's emotions, score, thoughts and reply.
+
+    Emotions and thoughts are kept in their tagged form, the exact text sent to the API, so the message
+    list built from the turn shares every string with it instead of holding copies.
+    """
+
+    __slots__ = ("candidate", "tagged_emotions", "score", "tagged_thoughts", "reply")
+
+    def __init__(self, candidate, emotions=None, score=None, thoughts=None, reply=None):
+        self.candidate = candidate
+        self.tagged_emotions = None if emotions is None else tagged(emotions, EMOTIONS_TAGS)
+        self.score = score
+        self.tagged_thoughts = None if thoughts is None else tagged(thoughts, THOUGHTS_TAGS)
+        self.reply = reply
+
+    @property
+    def emotions(self):
+        return untagged(self.tagged_emotions, EMOTIONS_TAGS)
+
+    @emotions.setter
+    def emotions(self, text):
+        self.tagged_emotions = tagged(text, EMOTIONS_TAGS)
+
+    @property
+    def thoughts(self):
+        return untagged(self.tagged_thoughts, THOUGHTS_TAGS)
+
+    @thoughts.setter
+    def thoughts(self, text):
+        self.tagged_thoughts = tagged(text, THOUGHTS_TAGS)
+
+    def contents(self):
+        """The (role, content) pairs of the turn so far, in the order they are sent to the API"""
+        pairs = [("user", self.candidate)]
+        for text in (self.tagged_emotions, self.tagged_thoughts, self.reply):
+            if text is not None:
+                pairs.append(("assistant", text))
+        return pairs
+
+    def to_list(self):
+        return [self.candidate, self.emotions, self.score, self.thoughts, self.reply]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+
+class MessagesView(Sequence):
+    """Read-only view of the interview messages: each message is returned as a read-only mapping, so the
+    list the API calls are built from cannot be changed through it. copy() returns plain dicts."""
+
+    def __init__(self, messages):
+        self._messages = messages
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [MappingProxyType(m) for m in self._messages[index]]
+        return MappingProxyType(self._messages[index])
+
+    def __len__(self):
+        return len(self._messages)
+
+    def copy(self):
+        return [dict(m) for m in self._messages]
+
+
+class TurnLog:
+    """Interview transcript as one Turn record per candidate message.
+
+    The Messages API list is built from the turns lazily and incrementally: each call only appends the
+    messages added since the previous call, so a turn costs O(1) however long the interview is. Fields
+    of a turn are filled in order (emotions, thoughts, reply) and are not changed once sent.
+    """
+
+    def __init__(self, turns=None):
+        self.turns = list(turns or [])
+        self._messages = []
+        # Turn index and number of its messages already in self._messages
+        self._built_turn = 0
+        self._built_count = 0
+
+    def __len__(self):
+        return len(self.turns)
+
+    def __iter__(self):
+        return iter(self.turns)
+
+    def __getitem__(self, index):
+        return self.turns[index]
+
+    @property
+    def current(self):
+        return self.turns[-1] if self.turns else None
+
+    def start(self, candidate):
+        """Start a turn with the candidate's message and return it"""
+        turn = Turn(candidate)
+        self.turns.append(turn)
+        return turn
+
+    def messages(self):
+        """The message list for the API calls, shared and updated in place (use view() to hand it out)"""
+        while self._built_turn < len(self.turns):
+            contents = self.turns[self._built_turn].contents()
+            for role, content in contents[self._built_count:]:
+                self._messages.append({"role": role, "content": content})
+            if self._built_turn == len(self.turns) - 1:
+                # The latest turn may still receive thoughts or a reply
+                self._built_count = len(contents)
+                break
+            self._built_turn += 1
+            self._built_count = 0
+        return self._messages
+
+    def view(self):
+        return MessagesView(self.messages())
+
+    def to_state(self):
+        return [turn.to_list() for turn in self.turns]
+
+    @classmethod
+    def from_state(cls, rows):
+        return cls(Turn.from_list(row) for row in rows)
+
+    @classmethod
+    def from_messages(cls, messages):
+        """Rebuild the turns from a message list (sessions saved before the turn log)"""
+        turns = []
+        for turn_messages in split_turns(messages):
+            turn = Turn(turn_messages[0]["content"])
+            for message in turn_messages[1:]:
+                content = message["content"]
+                if content.startswith(EMOTIONS_TAGS[0]) and content.endswith(EMOTIONS_TAGS[1]):
+                    turn.tagged_emotions = content
+                elif content.startswith(THOUGHTS_TAGS[0]) and content.endswith(THOUGHTS_TAGS[1]):
+                    turn.tagged_thoughts = content
+                else:
+                    turn.reply = content
+            turns.append(turn)
+        return cls(turns)
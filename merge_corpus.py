@@ -0,0 +1,170 @@
+import os
+import glob
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Output files of the generators and test runs
+DEFAULT_PATTERNS = [
+    "data/eq_training_data_*.csv",
+    "data/eq_training_data_diverse_*.csv",
+    "data/TEST_*.csv",
+]
+# Earlier outputs of this tool, which the default patterns also match; merging them again would re-ingest them
+MERGED_PREFIX = "eq_training_data_merged"
+# Rows with the same scenario and variation are the same sample, regenerated by a resume or retry
+NEAR_DUPLICATE_COLUMNS = ["scenario", "variation_id"]
+
+
+def find_inputs(patterns, exclude=(), include_merged=False):
+    """Expand the glob patterns into input files: finished outputs first, then temp/progress files.
+
+    Files in `exclude` (the output being written) and, unless include_merged, earlier merged outputs are
+    left out.
+    """
+    files = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    exclude = {os.path.abspath(path) for path in exclude}
+    files = [path for path in files if os.path.abspath(path) not in exclude
+             and (include_merged or not os.path.basename(path).startswith(MERGED_PREFIX))]
+    # A temp file is a copy of its run's progress, so the finished output should win when both exist
+    return sorted(files, key=lambda path: "_temp_" in os.path.basename(path))
+
+
+def read_columns(path):
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def normalize(frame):
+    """Lowercase and collapse whitespace in every cell so formatting differences do not hide duplicates"""
+    return pd.DataFrame({
+        name: [" ".join(value.lower().split()) for value in column.fillna("").astype(str)]
+        for name, column in frame.items()
+    }, index=frame.index)
+
+
+def row_hashes(normalized, columns):
+    """64-bit hash of each row over the given columns (vectorized)"""
+    return pd.util.hash_pandas_object(normalized.reindex(columns=columns, fill_value=""), index=False).to_numpy()
+
+
+class HashIndex:
+    """Sorted runs of the 64-bit hashes seen so far: 8 bytes per unique row, however long the rows are.
+
+    Each chunk's new hashes become a run, and a run is merged into the one before it once that is at most
+    twice its size. A hash is copied O(log n) times in total and a lookup searches O(log n) runs.
+    """
+
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, hashes):
+        """Which of the hashes are in the index (searching is fastest with the hashes sorted)"""
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            positions = np.searchsorted(run, hashes)
+            positions[positions == len(run)] = 0
+            found |= run[positions] == hashes
+        return found
+
+    def new_mask(self, hashes):
+        """True for hashes not seen before (and first within the batch); adds them to the index"""
+        uniques, first = np.unique(hashes, return_index=True)
+        new = ~self.contains(uniques)
+        mask = np.zeros(len(hashes), dtype=bool)
+        mask[first[new]] = True
+        if new.any():
+            self.runs.append(uniques[new])
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            # Stable sort of two sorted runs is a linear merge
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]), kind="stable")
+        return mask
+
+
+def merge_corpus(input_files, output_file, chunk_size=5000, near_duplicates=True):
+    """Stream the input files in chunks and write the rows not seen before to output_file.
+
+    Only one chunk of rows is in memory at a time; duplicates are detected with HashIndex over
+    normalized rows (exact duplicates) and over normalized scenario + variation (near duplicates).
+    """
+    # Union of the input columns, in order of first appearance, so every chunk has the same header
+    columns = []
+    readable = []
+    for path in input_files:
+        try:
+            file_columns = read_columns(path)
+        except (pd.errors.EmptyDataError, pd.errors.ParserError) as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        columns.extend(c for c in file_columns if c not in columns)
+        readable.append(path)
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    temp_file = output_file + ".partial"
+    exact_index = HashIndex()
+    near_index = HashIndex()
+    stats = {"files": len(readable), "rows_read": 0, "rows_written": 0, "exact_duplicates": 0, "near_duplicates": 0}
+    start = time.perf_counter()
+
+    with open(temp_file, "w", encoding="utf-8", newline="") as out:
+        header = True
+        for path in readable:
+            file_rows = 0
+            try:
+                for chunk in pd.read_csv(path, chunksize=chunk_size):
+                    file_rows += len(chunk)
+                    stats["rows_read"] += len(chunk)
+                    normalized = normalize(chunk)
+
+                    keep = exact_index.new_mask(row_hashes(normalized, columns))
+                    stats["exact_duplicates"] += int((~keep).sum())
+                    if near_duplicates and "scenario" in chunk.columns:
+                        near_new = near_index.new_mask(row_hashes(normalized[keep], NEAR_DUPLICATE_COLUMNS))
+                        keep_positions = np.flatnonzero(keep)
+                        keep[keep_positions[~near_new]] = False
+                        stats["near_duplicates"] += int((~near_new).sum())
+
+                    rows = chunk[keep].reindex(columns=columns)
+                    rows.to_csv(out, index=False, header=header)
+                    header = False
+                    stats["rows_written"] += len(rows)
+            except pd.errors.ParserError as e:
+                # A temp file cut off mid-write: keep the rows read before the damage
+                print(f"Stopped reading {path} after {file_rows} rows: {e}")
+            print(f"{path}: {file_rows} rows")
+
+    os.replace(temp_file, output_file)
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_second"] = stats["rows_read"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Merge generator output files into one deduplicated dataset')
+    parser.add_argument('inputs', type=str, nargs='*',
+                        help=f'Files or glob patterns to merge (default: {" ".join(DEFAULT_PATTERNS)})')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Merged CSV file (default: auto-generated filename)')
+    parser.add_argument('--chunk_size', type=int, default=5000,
+                        help='Rows read at a time; bounds the memory used for row data')
+    parser.add_argument('--keep_near_duplicates', action='store_true',
+                        help='Only remove exact duplicates, keeping rows that repeat a scenario and variation')
+
+    args = parser.parse_args()
+
+    output_file = args.output or f"data/{MERGED_PREFIX}_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+    # Merged files named on the command line are merged; the default patterns skip them
+    input_files = find_inputs(args.inputs or DEFAULT_PATTERNS, exclude=[output_file], include_merged=bool(args.inputs))
+    if not input_files:
+        print("No input files found.")
+    else:
+        print(f"Merging {len(input_files)} files into {output_file}")
+        stats = merge_corpus(input_files, output_file, args.chunk_size, not args.keep_near_duplicates)
+        print(f"\nRead {stats['rows_read']} rows from {stats['files']} files, wrote {stats['rows_written']} "
+              f"({stats['exact_duplicates']} exact and {stats['near_duplicates']} near duplicates removed)")
+        print(f"{stats['seconds']:.1f}s, {stats['rows_per_second']:.0f} rows/s")
@@ -0,0 +1,417 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Relative latency of model families (time to first token and per token), matched by name
+MODEL_SPEED = {"haiku": 0.4, "opus": 2.0}
+
+# Filler used to build replies of a realistic length
+FILLER_WORDS = (
+    "that is a really interesting point about the product and I would like to hear "
+    "more about how you handled the launch with your engineering team and the market"
+).split()
+
+
+# Conversation histories by stage and emotional states by family, with how often each comes up unprompted
+# (most variations are frustrated or defensive, few are open), for the generator fields that describe them
+MOCK_HISTORIES = {
+    "none": (0.2, ["No previous discussions about this issue.", "This is the first time the topic is raised."]),
+    "brief": (0.5, ["Two previous attempts to discuss, both met with deflection.",
+                    "One short conversation last week that ended without agreement."]),
+    "extensive": (0.3, ["Month-long pattern of discussions; tried a direct approach, then a sympathetic one, "
+                        "then involving HR.", "Several previous conversations over many weeks, none of them stuck."]),
+}
+MOCK_EMOTIONAL_STATES = {
+    "anger": (0.30, ["Frustrated and irritated, feeling ignored.", "Angry and impatient after being let down again."]),
+    "defensiveness": (0.30, ["Defensive and guarded, dismissing the concerns.",
+                             "Skeptical and resistant, suspicious of the motives."]),
+    "fear": (0.15, ["Anxious and worried about what this means for their job.",
+                    "Nervous and insecure, afraid of being judged."]),
+    "sadness": (0.12, ["Disappointed and hurt, close to giving up.", "Sad and discouraged after the last setback."]),
+    "shame": (0.08, ["Embarrassed and ashamed about the mistake.", "Guilty and humiliated, avoiding eye contact."]),
+    "openness": (0.05, ["Calm and receptive, willing to talk it through.",
+                        "Hopeful and relieved that the issue is finally raised."]),
+}
+
+
+def estimate_tokens(text):
+    """Rough token estimate (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def content_to_text(content):
+    """Flatten a message content field (string or list of blocks) to text."""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content or []:
+        if isinstance(block, dict):
+            parts.append(block.get("text") or json.dumps(block.get("input", "")))
+    return "".join(parts)
+
+
+def filler_text(num_words, rng):
+    """Build a sentence of filler words."""
+    words = [rng.choice(FILLER_WORDS) for _ in range(max(1, num_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def value_for_schema(schema, rng, words=(8, 20)):
+    """Generate a value that satisfies a (simple) JSON schema."""
+    schema_type = schema.get("type")
+    if schema_type == "integer":
+        return rng.randint(schema.get("minimum", 0), schema.get("maximum", 100))
+    if schema_type == "number":
+        return round(rng.uniform(0, 100), 2)
+    if schema_type == "boolean":
+        return rng.random() < 0.5
+    if schema_type == "array":
+        return [value_for_schema(schema.get("items", {"type": "string"}), rng, words) for _ in range(3)]
+    if schema_type == "object" or "properties" in schema:
+        return {
+            key: value_for_schema(prop, rng, words)
+            for key, prop in schema.get("properties", {}).items()
+        }
+    return filler_text(rng.randint(*words), rng)
+
+
+def pick_described(table, key, rng):
+    """A description from MOCK_HISTORIES or MOCK_EMOTIONAL_STATES: for `key`, or drawn by frequency"""
+    if key not in table:
+        key = rng.choices(list(table), weights=[weight for weight, _ in table.values()])[0]
+    return rng.choice(table[key][1])
+
+
+def variation_targets(prompt):
+    """Per-variation coverage targets in a prompt ("Variation 2: no prior exchanges; ... mainly feels fear ...")"""
+    targets = {}
+    for index, line in re.findall(r"^Variation (\d+): (.*)$", prompt, flags=re.MULTILINE):
+        stage = next((key for key, words in (("none", "no prior"), ("brief", "brief history"),
+                                             ("extensive", "extensive history")) if words in line), None)
+        family = re.search(r"mainly feels (\w+)", line)
+        targets[int(index)] = (stage, family.group(1) if family else None)
+    return targets
+
+
+def json_reply_for_prompt(prompt, rng, hint_compliance=0.85):
+    """Build a JSON reply for the generator prompts, which list their fields as '- name: ...'.
+
+    Conversation histories and emotional states are drawn from MOCK_HISTORIES and MOCK_EMOTIONAL_STATES;
+    a variation with coverage targets in the prompt meets them with probability hint_compliance.
+    """
+    fields = []
+    for name in re.findall(r"^- (\w+):", prompt, flags=re.MULTILINE):
+        if name not in fields:
+            fields.append(name)
+    if not fields:
+        return None
+    targets = variation_targets(prompt)
+
+    def make_object(index):
+        stage, family = targets.get(index, (None, None)) if rng.random() < hint_compliance else (None, None)
+        obj = {}
+        for name in fields:
+            if name.endswith("_id"):
+                obj[name] = index
+            elif name == "conversation_history":
+                obj[name] = pick_described(MOCK_HISTORIES, stage, rng)
+            elif name == "current_emotional_state":
+                obj[name] = pick_described(MOCK_EMOTIONAL_STATES, family, rng)
+            else:
+                obj[name] = filler_text(rng.randint(10, 30), rng)
+        return obj
+
+    array_match = re.search(r"JSON array with (\d+) objects", prompt)
+    if array_match:
+        return json.dumps([make_object(i + 1) for i in range(int(array_match.group(1)))], indent=2)
+    return json.dumps(make_object(1), indent=2)
+
+
+def request_blocks(request):
+    """Flatten system and message content into (text, has_cache_control) blocks in prompt order."""
+    blocks = []
+    system = request.get("system") or ""
+    for block in ([{"type": "text", "text": system}] if isinstance(system, str) else system):
+        blocks.append((block.get("text", ""), "cache_control" in block))
+    for message in request.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            blocks.append((message["role"] + content, False))
+        else:
+            for block in content or []:
+                blocks.append((message["role"] + content_to_text([block]), "cache_control" in block))
+    return blocks
+
+
+def simulate_prompt_cache(server, request):
+    """Return (cache_read_tokens, cache_creation_tokens) for a request and update the server's cache.
+
+    Like the real API, a cache entry is written at each breakpoint and a read looks for the longest
+    cached prefix at a breakpoint or up to 20 blocks before it.
+    """
+    blocks = request_blocks(request)
+    prefix_hash = hashlib.sha256()
+    prefixes = []  # (hash, cumulative tokens, is_breakpoint) per block
+    tokens = 0
+    for text, is_breakpoint in blocks:
+        prefix_hash.update(text.encode("utf-8"))
+        tokens += estimate_tokens(text)
+        prefixes.append((prefix_hash.hexdigest(), tokens, is_breakpoint))
+
+    breakpoints = [i for i, p in enumerate(prefixes) if p[2]]
+    if not breakpoints:
+        return 0, 0
+    min_tokens = server.options["min_cache_tokens"]
+    with server.lock:
+        read_tokens = 0
+        for bp in breakpoints:
+            for i in range(bp, max(-1, bp - 20), -1):
+                if prefixes[i][0] in server.prompt_cache:
+                    read_tokens = max(read_tokens, prefixes[i][1])
+                    break
+        written_tokens = read_tokens
+        for bp in breakpoints:
+            if prefixes[bp][1] >= min_tokens:
+                server.prompt_cache.add(prefixes[bp][0])
+                written_tokens = max(written_tokens, prefixes[bp][1])
+    return read_tokens, written_tokens - read_tokens
+
+
+class MockAnthropicHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Anthropic Messages API (POST /v1/messages)."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep the console quiet; the scripts print their own progress
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/v1/messages"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) or b"{}"
+        request = json.loads(body)
+        options = self.server.options
+        # With a seed, replies and tail delays depend only on the seed and the request, not on arrival order
+        seed = options["seed"]
+        rng = random.Random() if seed is None else random.Random(f"{seed}:{hashlib.sha256(body).hexdigest()}")
+
+        with self.server.lock:
+            self.server.request_count += 1
+
+        # Overload windows: the first overload_seconds of every overload_period are rejected with 529
+        period = options["overload_period"]
+        if period and time.time() % period < options["overload_seconds"]:
+            with self.server.lock:
+                self.server.overloaded_count += 1
+            self._send_json(529, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}})
+            return
+
+        system = request.get("system") or ""
+        if isinstance(system, list):
+            system = content_to_text(system)
+        messages = request.get("messages", [])
+        prompt_text = system + "".join(content_to_text(m.get("content")) for m in messages)
+        input_tokens = estimate_tokens(prompt_text)
+
+        # Build the reply content
+        content = []
+        tool_choice = request.get("tool_choice") or {}
+        tools = {tool["name"]: tool for tool in request.get("tools", [])}
+        if tool_choice.get("type") == "tool" and tool_choice.get("name") in tools:
+            tool = tools[tool_choice["name"]]
+            content.append({
+                "type": "tool_use",
+                "id": f"toolu_mock_{rng.randrange(10 ** 8)}",
+                "name": tool["name"],
+                "input": value_for_schema(tool.get("input_schema", {}), rng,
+                                          (options["min_words"], options["max_words"])),
+            })
+            output_tokens = estimate_tokens(json.dumps(content[0]["input"]))
+        else:
+            last_user = content_to_text(messages[-1].get("content")) if messages else ""
+            text = json_reply_for_prompt(last_user, rng, options["hint_compliance"])
+            if text is None:
+                text = filler_text(rng.randint(options["min_words"], options["max_words"]), rng)
+            content.append({"type": "text", "text": text})
+            output_tokens = estimate_tokens(text)
+        output_tokens = min(output_tokens, request.get("max_tokens", output_tokens))
+
+        cache_read_tokens, cache_creation_tokens = simulate_prompt_cache(self.server, request)
+        input_tokens = max(0, input_tokens - cache_read_tokens - cache_creation_tokens)
+
+        response = {
+            "id": f"msg_mock_{rng.randrange(10 ** 8)}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "mock"),
+            "content": content,
+            "stop_reason": "tool_use" if content[0]["type"] == "tool_use" else "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cache_creation_input_tokens": cache_creation_tokens,
+                "cache_read_input_tokens": cache_read_tokens,
+            },
+        }
+
+        usage = dict(response["usage"])
+        with self.server.lock:
+            self.server.request_log.append(usage)
+
+        # Time to first token is the base latency plus prompt processing (cached tokens are nearly free)
+        processed_tokens = input_tokens + cache_creation_tokens + cache_read_tokens * 0.1
+        first_token_delay = options["latency"] + processed_tokens * options["input_token_delay"]
+        # Smaller models answer faster
+        speed = next((factor for name, factor in MODEL_SPEED.items() if name in response["model"]), 1.0)
+        first_token_delay *= speed
+        self.token_delay = options["token_delay"] * speed
+        # Occasional slow outliers
+        if rng.random() < options["tail_share"]:
+            first_token_delay += options["tail_latency"]
+        time.sleep(first_token_delay)
+
+        if request.get("stream"):
+            try:
+                self._send_stream(response, output_tokens)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client dropped the stream: only the tokens sent so far were generated
+                usage["output_tokens"] = self.sent_tokens
+                usage["cancelled"] = True
+                self.close_connection = True
+        else:
+            time.sleep(output_tokens * self.token_delay)
+            self._send_json(200, response)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, event, data):
+        payload = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _send_stream(self, response, output_tokens):
+        """Send the response as server-sent events, one text delta per word."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        start = dict(response, content=[], stop_reason=None)
+        start["usage"] = dict(response["usage"], output_tokens=1)
+        self.sent_tokens = 1
+        self._send_event("message_start", {"type": "message_start", "message": start})
+        for index, block in enumerate(response["content"]):
+            if block["type"] == "text":
+                self._send_event("content_block_start", {
+                    "type": "content_block_start", "index": index, "content_block": {"type": "text", "text": ""}
+                })
+                words = block["text"].split(" ")
+                delay = output_tokens * self.token_delay / max(1, len(words))
+                for i, word in enumerate(words):
+                    chunk = word if i == 0 else " " + word
+                    self._send_event("content_block_delta", {
+                        "type": "content_block_delta", "index": index, "delta": {"type": "text_delta", "text": chunk}
+                    })
+                    self.sent_tokens = max(self.sent_tokens, output_tokens * (i + 1) // len(words))
+                    time.sleep(delay)
+            else:
+                self._send_event("content_block_start", {
+                    "type": "content_block_start", "index": index, "content_block": dict(block, input={})
+                })
+                self._send_event("content_block_delta", {
+                    "type": "content_block_delta", "index": index,
+                    "delta": {"type": "input_json_delta", "partial_json": json.dumps(block["input"])}
+                })
+                self.sent_tokens = output_tokens
+            self._send_event("content_block_stop", {"type": "content_block_stop", "index": index})
+        self._send_event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": response["stop_reason"], "stop_sequence": None},
+            "usage": {"output_tokens": output_tokens},
+        })
+        self._send_event("message_stop", {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_mock_server(port=0, latency=0.2, token_delay=0.005, input_token_delay=0.0, min_words=30, max_words=80,
+                      min_cache_tokens=1024, tail_share=0.0, tail_latency=0.0, overload_period=0.0,
+                      overload_seconds=0.0, hint_compliance=0.85, seed=None):
+    """Start the mock server in a background thread and return (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockAnthropicHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.overloaded_count = 0
+    server.request_log = []
+    server.prompt_cache = set()
+    server.options = {
+        "latency": latency,
+        "token_delay": token_delay,
+        "input_token_delay": input_token_delay,
+        "min_words": min_words,
+        "max_words": max_words,
+        "min_cache_tokens": min_cache_tokens,
+        "tail_share": tail_share,
+        "tail_latency": tail_latency,
+        "overload_period": overload_period,
+        "overload_seconds": overload_seconds,
+        "hint_compliance": hint_compliance,
+        "seed": seed,
+    }
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a local stand-in for the Anthropic Messages API')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.5,
+                        help='Base latency in seconds before the first token')
+    parser.add_argument('--token_delay', type=float, default=0.01,
+                        help='Extra seconds per output token')
+    parser.add_argument('--input_token_delay', type=float, default=0.0,
+                        help='Extra seconds per input token before the first token')
+    parser.add_argument('--tail_share', type=float, default=0.0,
+                        help='Share of requests that get --tail_latency extra seconds before the first token')
+    parser.add_argument('--tail_latency', type=float, default=0.0,
+                        help='Extra delay of the slow outlier requests')
+    parser.add_argument('--overload_period', type=float, default=0.0,
+                        help='Start an overload window every this many seconds (0: never)')
+    parser.add_argument('--overload_seconds', type=float, default=0.0,
+                        help='Length of each overload window, in which requests get HTTP 529')
+    parser.add_argument('--hint_compliance', type=float, default=0.85,
+                        help='Share of generated variations that meet the coverage targets in their prompt')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Make replies reproducible: the same request always gets the same reply')
+
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args.port, args.latency, args.token_delay, args.input_token_delay,
+                                         tail_share=args.tail_share, tail_latency=args.tail_latency,
+                                         overload_period=args.overload_period, overload_seconds=args.overload_seconds,
+                                         hint_compliance=args.hint_compliance, seed=args.seed)
+    print(f"Mock Anthropic API listening on {base_url}")
+    print(f"Point the scripts at it with: ANTHROPIC_BASE_URL={base_url} ANTHROPIC_API_KEY=mock")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
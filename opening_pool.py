@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+
+import event_log
+
+# What a pooled opening leads with, so the openings in a pool differ from each other
+OPENING_FOCUS = [
+    "a warm welcome and a question about the candidate's background",
+    "a short overview of the interview and a question about a product they launched",
+    "small talk about their day, then a question about how they position a new product",
+    "a question about the product they are proudest of",
+    "a question about how they decide what to build next",
+    "a direct start with a question about competitive analysis",
+    "a question about working with engineering on a recent release",
+    "a question about a product they had to sunset",
+]
+
+# Instructions for generating one pooled opening
+OPENING_POOL_PROMPT = (
+    "The candidate has just arrived and the interview is starting. Produce your opening turn with the "
+    "interviewer_turn tool: your emotional state before getting to know the candidate, the integer emotion score "
+    "for that state (0-100, where 0 is very negative and 100 is elated), your internal thoughts and expectations, "
+    "and the opening line you say to the candidate. Open with {focus}."
+)
+
+
+def fingerprint(system_prompt, settings):
+    """Hash of everything a pooled opening depends on; the pool is discarded when it changes"""
+    text = json.dumps({"system": system_prompt, "prompt": OPENING_POOL_PROMPT, "focus": OPENING_FOCUS,
+                       "settings": settings}, sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class OpeningPool:
+    """Pre-generated interview openings (reply, initial emotions, score and thoughts), stored on disk.
+
+    take() serves a stored opening at once and starts a background thread that refills the pool up to
+    `size`, generating at most `refill_per_minute` openings a minute. take() does no disk IO: the refill
+    thread writes the file, and flush() writes openings served since at shutdown. A pool saved for a
+    different system prompt, opening prompt or model (see fingerprint) is discarded on load. One process
+    per pool file.
+    """
+
+    def __init__(self, generate, fingerprint, path="data/opening_pool.json", size=20, refill_per_minute=30):
+        # generate(focus) -> {"emotions", "score", "thoughts", "reply"} or None
+        self.generate = generate
+        self.fingerprint = fingerprint
+        self.path = path
+        self.size = size
+        self.refill_per_minute = refill_per_minute
+        self.lock = threading.Lock()
+        # Serializes file writes, which happen outside self.lock so take() never waits on the disk
+        self.save_lock = threading.Lock()
+        # Openings were served or added since the file was last written
+        self.dirty = False
+        self.refill_thread = None
+        self.served = 0
+        self.misses = 0
+        self.generated = 0
+        self.openings = self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("fingerprint") != self.fingerprint:
+            event_log.warning("opening_pool_discarded", f"Opening pool {self.path} was generated for another prompt "
+                              f"or model: discarding {len(data.get('openings', []))} openings",
+                              path=self.path, openings=len(data.get("openings", [])))
+            return []
+        return data["openings"]
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                openings = list(self.openings)
+                self.dirty = False
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            partial_path = self.path + ".partial"
+            with open(partial_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": self.fingerprint, "openings": openings}, f)
+            os.replace(partial_path, self.path)
+
+    def flush(self):
+        """Write the pool if openings were served or added since the last write"""
+        if self.dirty:
+            self.save()
+
+    def take(self):
+        """Remove and return a stored opening, or None if the pool is empty; starts a refill either way"""
+        with self.lock:
+            opening = self.openings.pop(0) if self.openings else None
+            if opening is None:
+                self.misses += 1
+            else:
+                self.served += 1
+                self.dirty = True
+        self.start_refill()
+        return opening
+
+    def start_refill(self):
+        with self.lock:
+            if len(self.openings) >= self.size or (self.refill_thread and self.refill_thread.is_alive()):
+                return
+            self.refill_thread = threading.Thread(target=self.fill, name="opening-pool-refill", daemon=True)
+            self.refill_thread.start()
+
+    def fill(self, max_failures=3):
+        """Generate openings until the pool is full, at the refill rate; returns the number generated"""
+        generated = failures = 0
+        while len(self.openings) < self.size and failures < max_failures:
+            start = time.monotonic()
+            opening = self.generate(random.choice(OPENING_FOCUS))
+            if opening:
+                opening["created"] = time.time()
+                with self.lock:
+                    self.openings.append(opening)
+                    self.generated += 1
+                    self.dirty = True
+                # Also records the openings served since the last write
+                self.save()
+                generated += 1
+                failures = 0
+            else:
+                failures += 1
+            time.sleep(max(0.0, 60 / self.refill_per_minute - (time.monotonic() - start)))
+        self.flush()
+        return generated
+
+    def stats(self):
+        return {"size": self.size, "available": len(self.openings), "served": self.served,
+                "misses": self.misses, "generated": self.generated}
+
+
+def load_pool(path="data/opening_pool.json", size=20, refill_per_minute=30):
+    """The opening pool for the default Interviewer, generating with a dedicated Interviewer"""
+    from emotional_interviewer import Interviewer
+
+    generator = Interviewer()
+    return OpeningPool(generator.generate_opening, fingerprint(generator.system_prompt, generator.opening_settings()),
+                       path, size, refill_per_minute)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pre-generate interview openings so new sessions start without waiting')
+    parser.add_argument('--path', type=str, default="data/opening_pool.json",
+                        help='Pool file')
+    parser.add_argument('--size', type=int, default=20,
+                        help='Number of openings to keep in the pool')
+    parser.add_argument('--refill_per_minute', type=float, default=30,
+                        help='Maximum openings generated per minute')
+    parser.add_argument('--status', action='store_true',
+                        help='Only print the pool status')
+
+    args = parser.parse_args()
+
+    pool = load_pool(args.path, args.size, args.refill_per_minute)
+    if not args.status:
+        print(f"Generated {pool.fill()} openings")
+    print(json.dumps(pool.stats()))
@@ -1,19 +1,27 @@
 import os
 import time
 import json
-import pandas as pd
-from tqdm import tqdm
-from dotenv import load_dotenv
-from anthropic import Anthropic, APIError, APIStatusError, RateLimitError
+import argparse
+import functools
+import threading
 
-# Load environment variables
-load_dotenv()
+import api_client
+import event_log
+import tracing
 
-# Initialize Anthropic client
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+# Anthropic client, created on first use by get_client()
+client = None
 
-# Create data directory if it doesn't exist
-os.makedirs("data", exist_ok=True)
+
+def get_client():
+    """Load environment variables and create the Anthropic client on first use."""
+    global client
+    if client is None:
+        from anthropic import Anthropic
+        from dotenv import load_dotenv
+        load_dotenv()
+        client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    return client
 
 # Define personas with varying levels of EQ
 personas = [
@@ -28,6 +36,38 @@ personas = [
 # Map persona names to their full descriptions
 persona_map = {p.split(':')[0]: p for p in personas}
 
+@functools.lru_cache(maxsize=None)
+def training_example_model():
+    """Build the pydantic model of a combined-mode row on first use, so importing this module stays fast"""
+    from pydantic import BaseModel, Field
+
+    class TrainingExample(BaseModel):
+        conversation_objective: str = Field(description="The specific goal to achieve through this conversation")
+        conversation_history: str = Field(description="A summary of what has happened in the conversation so far (3-4 exchanges)")
+        current_emotional_state: str = Field(description="A description of the current emotional state of the other party")
+        conversation_point: str = Field(description="The current point in the conversation where the user needs to respond")
+        optimal_response: str = Field(description="The best next thing to say to achieve the objective while demonstrating emotional intelligence")
+        reasoning: str = Field(description="Why this response is effective given the scenario, history, and emotional state")
+        eq_skills_demonstrated: str = Field(description="The specific emotional intelligence skills being demonstrated in this response")
+
+    return TrainingExample
+
+def generate_training_example_prompt(scenario, conversation_needed, persona):
+    return f"""Based on the following scenario, conversation requirements and emotional intelligence profile, create one training example with the training_example tool:
+
+PERSONA:
+{persona}
+
+SCENARIO:
+{scenario}
+
+CONVERSATION NEEDED:
+{conversation_needed}
+
+First set up the conversation: the conversation objective, a summary of what has happened in the conversation so far (3-4 exchanges), the current emotional state of the other party, and the current point in the conversation where the user needs to respond.
+Then, for that conversation and persona, give the optimal next response to achieve the objective, why it is effective given the scenario, history and emotional state, and the emotional intelligence skills it demonstrates.
+"""
+
 def generate_conversation_history_prompt(scenario, conversation_needed):
     return f"""Based on the following scenario and conversation requirements, generate a conversation history summary and current emotional state:
 
@@ -81,13 +121,9 @@ Generate a JSON response with:
 IMPORTANT: Your entire response must be valid JSON that can be parsed. Do not include any text before or after the JSON.
 """
 
+@tracing.traced("json_extraction")
 def extract_json_from_response(response_text):
     """Extract JSON from the response text, handling potential formatting issues."""
-    # Print the first 200 characters of the response for debugging
-    print(f"\n--- Response Preview (first 200 chars) ---")
-    print(response_text[:200] + "..." if len(response_text) > 200 else response_text)
-    print("--- End Preview ---\n")
-    
     try:
         # First try direct JSON parsing
         try:
@@ -99,59 +135,63 @@ def extract_json_from_response(response_text):
             
             if start_idx >= 0 and end_idx > start_idx:
                 json_str = response_text[start_idx:end_idx]
-                print(f"Extracted JSON substring: {json_str[:100]}...")
+                event_log.preview("json_extracted", json_str, limit=100)
                 return json.loads(json_str)
             else:
-                print(f"No JSON found in response")
+                event_log.warning("json_missing", "No JSON found in response")
                 return None
     except json.JSONDecodeError as e:
-        print(f"Failed to parse JSON from response: {e}")
+        event_log.warning("json_invalid", f"Failed to parse JSON from response: {e}")
         return None
 
-def api_call(prompt, system_message, attempt=1, max_attempts=3):
-    """Make an API call with retry logic."""
-    print(f"\n--- Prompt Preview (first 200 chars) ---")
-    print(prompt[:200] + "..." if len(prompt) > 200 else prompt)
-    print("--- End Prompt ---\n")
-    
-    print(f"Making API call (attempt {attempt}/{max_attempts})")
+def api_call(prompt, system_message, attempt=1, max_attempts=3, stage="default", max_tokens=1000, tool=None):
+    """Make an API call with retry logic.
+
+    Returns the response text, or with `tool` (a tool definition) the input of the forced tool call.
+    """
+    event_log.preview("prompt_preview", prompt, attempt=attempt)
+    event_log.debug("call_start", f"Making API call (attempt {attempt}/{max_attempts})", attempt=attempt)
     
+    from anthropic import APIStatusError, RateLimitError
+
     try:
-        response = client.messages.create(
+        messages = [{"role": "user", "content": prompt}]
+        tool_options = {}
+        if tool:
+            tool_options = {"tools": [tool], "tool_choice": {"type": "tool", "name": tool["name"]}}
+        response = api_client.create_message(
+            get_client(),
+            stage=stage,
             model="claude-3-5-sonnet-20240620",
-            max_tokens=1000,
+            max_tokens=max_tokens,
             temperature=0.7,
             system=system_message,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+            messages=messages,
+            **tool_options
         )
         
-        return response.content[0].text
+        result = response.content[0].input if tool else response.content[0].text
+        if event_log.sampled():
+            event_log.preview("response_preview", json.dumps(result) if tool else result, attempt=attempt)
+        return result
         
     except RateLimitError as e:
-        print(f"Rate limit error: {e}")
+        event_log.warning("rate_limited", f"Rate limit error: {e}", attempt=attempt)
         if attempt < max_attempts:
             wait_time = min(2 ** attempt * 5, 60)  # Exponential backoff
-            print(f"Waiting {wait_time} seconds before retry...")
-            time.sleep(wait_time)
-            return api_call(prompt, system_message, attempt+1, max_attempts)
+            event_log.info("retry_wait", f"Waiting {wait_time} seconds before retry...", seconds=wait_time)
+            with tracing.span("retry_sleep", seconds=wait_time):
+                time.sleep(wait_time)
+            return api_call(prompt, system_message, attempt+1, max_attempts, stage, max_tokens, tool)
         return None
         
     except APIStatusError as e:
-        if e.status_code == 529:  # Overloaded
-            print(f"API overloaded. Waiting before retry...")
-            if attempt < max_attempts:
-                wait_time = min(2 ** attempt * 10, 120)  # Longer exponential backoff
-                print(f"Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
-                return api_call(prompt, system_message, attempt+1, max_attempts)
-        else:
-            print(f"API error: {e}")
+        # Overload errors (529) never get here: the shared circuit breaker requeues those calls
+        event_log.error("api_error", f"API error: {e}", attempt=attempt)
         return None
         
     except Exception as e:
-        print(f"Error making API call: {e}")
+        event_log.error("call_failed", f"Error making API call: {e}", attempt=attempt)
         return None
 
 def generate_conversation_history(scenario, conversation_needed):
@@ -160,19 +200,20 @@ def generate_conversation_history(scenario, conversation_needed):
     
     system_message = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate realistic conversation histories and emotional states for challenging scenarios. IMPORTANT: Your response must be valid JSON that can be parsed directly."
     
-    response_text = api_call(prompt, system_message)
-    if not response_text:
-        return None
-    
-    data = extract_json_from_response(response_text)
-    
-    required_keys = ["conversation_objective", "conversation_history", "current_emotional_state", "conversation_point"]
-    if data and all(k in data for k in required_keys):
-        print("Successfully generated conversation history")
-        return data
-    else:
-        print("Failed to extract valid conversation history data")
-        return None
+    with event_log.call_context(stage="conversation_history"):
+        response_text = api_call(prompt, system_message, stage="conversation_history")
+        if not response_text:
+            return None
+        
+        data = extract_json_from_response(response_text)
+        
+        required_keys = ["conversation_objective", "conversation_history", "current_emotional_state", "conversation_point"]
+        if data and all(k in data for k in required_keys):
+            event_log.info("history_generated", "Successfully generated conversation history")
+            return data
+        else:
+            event_log.warning("history_invalid", "Failed to extract valid conversation history data")
+            return None
 
 def generate_optimal_response(scenario, conversation_data, persona_desc):
     """Generate the optimal next response based on scenario, conversation history, and persona."""
@@ -187,85 +228,145 @@ def generate_optimal_response(scenario, conversation_data, persona_desc):
     
     system_message = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate optimal responses that demonstrate emotional intelligence and help achieve conversation objectives. IMPORTANT: Your response must be valid JSON that can be parsed directly."
     
-    response_text = api_call(prompt, system_message)
-    if not response_text:
-        return None
+    with event_log.call_context(stage="optimal_response"):
+        response_text = api_call(prompt, system_message, stage="optimal_response")
+        if not response_text:
+            return None
+        
+        data = extract_json_from_response(response_text)
+        
+        if data and all(k in data for k in ["optimal_response", "reasoning", "eq_skills_demonstrated"]):
+            event_log.info("response_generated", "Successfully generated optimal response")
+            return data
+        else:
+            event_log.warning("response_invalid", "Failed to extract valid optimal response data")
+            return None
+
+def generate_training_example(scenario, conversation_needed, persona_desc):
+    """Combined mode: generate the conversation history and the optimal response in one schema-enforced call."""
+    TrainingExample = training_example_model()
+    tool = {
+        "name": "training_example",
+        "description": "build the training example object",
+        "input_schema": TrainingExample.model_json_schema()
+    }
+    prompt = generate_training_example_prompt(scenario, conversation_needed, persona_desc)
     
-    data = extract_json_from_response(response_text)
+    system_message = "You are an expert in emotional intelligence and interpersonal dynamics. Your task is to generate realistic conversation histories and emotional states for challenging scenarios, and optimal responses that demonstrate emotional intelligence and help achieve conversation objectives."
     
-    if data and all(k in data for k in ["optimal_response", "reasoning", "eq_skills_demonstrated"]):
-        print("Successfully generated optimal response")
-        return data
+    # History and response together need more room than either call alone
+    with event_log.call_context(stage="training_example"):
+        data = api_call(prompt, system_message, stage="training_example", max_tokens=2000, tool=tool)
+        if not data:
+            return None
+        
+        try:
+            example = TrainingExample(**data)
+        except Exception as e:
+            event_log.warning("example_invalid", f"Failed to validate training example: {e}")
+            return None
+        event_log.info("example_generated", "Successfully generated training example")
+        return example.model_dump()
+
+def process_scenario(scenario, conversation_needed, persona, combined=False):
+    """Generate one row for a scenario, with two dependent calls or one combined call; returns None on failure"""
+    # Get the full persona description
+    persona_desc = persona_map.get(persona, persona)
+    
+    if combined:
+        conversation_data = response_data = generate_training_example(scenario, conversation_needed, persona_desc)
     else:
-        print("Failed to extract valid optimal response data")
+        # Generate conversation history
+        conversation_data = generate_conversation_history(scenario, conversation_needed)
+        # Generate optimal response
+        response_data = generate_optimal_response(scenario, conversation_data, persona_desc) if conversation_data else None
+    
+    if not response_data:
         return None
+    
+    # Combine all data
+    return {
+        "persona": persona,
+        "scenario": scenario,
+        "conversation_needed": conversation_needed,
+        "conversation_objective": conversation_data["conversation_objective"],
+        "conversation_history": conversation_data["conversation_history"],
+        "current_emotional_state": conversation_data["current_emotional_state"],
+        "conversation_point": conversation_data["conversation_point"],
+        "optimal_response": response_data["optimal_response"],
+        "reasoning": response_data["reasoning"],
+        "eq_skills_demonstrated": response_data["eq_skills_demonstrated"]
+    }
+
+def process_scenarios(input_file, output_file=None, persona_to_process=None, max_scenarios=None, combined=False,
+                      workers=1, pause=10):
+    """Process existing scenarios to generate conversation histories and optimal responses.
+
+    With combined=True each scenario takes one schema-enforced call instead of two. `workers` scenarios
+    are processed at once; each worker pauses `pause` seconds after a scenario.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    import pandas as pd
+    from tqdm import tqdm
 
-def process_scenarios(input_file, output_file=None, persona_to_process=None, max_scenarios=None):
-    """Process existing scenarios to generate conversation histories and optimal responses."""
     # Read the existing scenarios
     df = pd.read_csv(input_file)
-    print(f"Loaded {len(df)} scenarios from {input_file}")
+    event_log.info("scenarios_loaded", f"Loaded {len(df)} scenarios from {input_file}", scenarios=len(df))
     
     # If a specific persona is requested, filter for it
     if persona_to_process:
         df = df[df["persona"] == persona_to_process]
-        print(f"Filtered to {len(df)} scenarios for persona {persona_to_process}")
+        event_log.info("scenarios_filtered", f"Filtered to {len(df)} scenarios for persona {persona_to_process}",
+                       scenarios=len(df))
     
     # If max_scenarios is specified, limit the number of scenarios
     if max_scenarios and max_scenarios < len(df):
         df = df.sample(max_scenarios, random_state=42)
-        print(f"Sampled {len(df)} scenarios")
+        event_log.info("scenarios_sampled", f"Sampled {len(df)} scenarios", scenarios=len(df))
     
-    # Create a list to store the processed data
-    processed_data = []
+    # Rows by position in the input, so the output keeps the input order whatever finishes first
+    rows_by_position = {}
+    lock = threading.Lock()
+    usage_before = api_client.stage_usage.snapshot()
+    start_time = time.perf_counter()
     
     # Create a temporary file to save progress
     temp_output_file = output_file or f"data/eq_training_data_temp_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+    os.makedirs(os.path.dirname(temp_output_file) or ".", exist_ok=True)
     
-    # Process each scenario
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Processing scenarios"):
+    def process_row(position, idx, row):
         scenario = row["scenario"]
         conversation_needed = row["conversation_needed"]
         persona = row.get("persona", "Unknown")  # Use "Unknown" if persona is not in the data
         
-        print(f"\nProcessing scenario {idx+1}/{len(df)} for persona {persona}")
-        
-        # Get the full persona description
-        persona_desc = persona_map.get(persona, persona)
-        
-        # Generate conversation history
-        conversation_data = generate_conversation_history(scenario, conversation_needed)
-        
-        if conversation_data:
-            # Generate optimal response
-            response_data = generate_optimal_response(scenario, conversation_data, persona_desc)
+        with tracing.span("scenario", index=idx, persona=persona), event_log.context(scenario=idx):
+            event_log.info("scenario_start", f"Processing scenario {idx+1}/{len(df)} for persona {persona}",
+                           persona=persona)
+            combined_data = process_scenario(scenario, conversation_needed, persona, combined)
             
-            if response_data:
-                # Combine all data
-                combined_data = {
-                    "persona": persona,
-                    "scenario": scenario,
-                    "conversation_needed": conversation_needed,
-                    "conversation_objective": conversation_data["conversation_objective"],
-                    "conversation_history": conversation_data["conversation_history"],
-                    "current_emotional_state": conversation_data["current_emotional_state"],
-                    "conversation_point": conversation_data["conversation_point"],
-                    "optimal_response": response_data["optimal_response"],
-                    "reasoning": response_data["reasoning"],
-                    "eq_skills_demonstrated": response_data["eq_skills_demonstrated"]
-                }
-                
-                processed_data.append(combined_data)
-                
-                # Save progress
-                temp_df = pd.DataFrame(processed_data)
-                temp_df.to_csv(temp_output_file, index=False)
-                print(f"Progress saved to {temp_output_file}")
-        
-        # Rate limiting - be nice to the API
-        wait_time = 10
-        print(f"Waiting {wait_time} seconds before next scenario...")
-        time.sleep(wait_time)
+            if combined_data:
+                with lock:
+                    rows_by_position[position] = combined_data
+                    # Save progress
+                    temp_df = pd.DataFrame([rows_by_position[p] for p in sorted(rows_by_position)])
+                    with tracing.span("checkpoint_write", rows=len(rows_by_position)):
+                        temp_df.to_csv(temp_output_file, index=False)
+                event_log.debug("checkpoint_saved", f"Progress saved to {temp_output_file}")
+            
+            # Rate limiting - be nice to the API
+            if pause:
+                event_log.debug("pause", f"Waiting {pause} seconds before next scenario...", seconds=pause)
+                with tracing.span("pause", seconds=pause):
+                    time.sleep(pause)
+    
+    # Process the scenarios, `workers` at a time
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(process_row, position, idx, row)
+                   for position, (idx, row) in enumerate(df.iterrows())]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing scenarios"):
+            future.result()
+    
+    processed_data = [rows_by_position[p] for p in sorted(rows_by_position)]
     
     # Generate final output filename if not provided
     if not output_file:
@@ -275,18 +376,58 @@ def process_scenarios(input_file, output_file=None, persona_to_process=None, max
     # Save to CSV
     if processed_data:
         final_df = pd.DataFrame(processed_data)
-        final_df.to_csv(output_file, index=False)
-        print(f"\nProcessed {len(processed_data)} scenarios and saved to {output_file}")
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        with tracing.span("output_write", rows=len(processed_data)):
+            final_df.to_csv(output_file, index=False)
+        event_log.info("output_saved", f"Processed {len(processed_data)} scenarios and saved to {output_file}",
+                       rows=len(processed_data))
     else:
-        print("No data was processed successfully.")
+        event_log.warning("no_output", "No data was processed successfully.")
+    
+    # Throughput and cost of this run's mode
+    elapsed = time.perf_counter() - start_time
+    usage_after = api_client.stage_usage.snapshot()
+    calls = tokens = 0
+    for stage, totals in usage_after.items():
+        before = usage_before.get(stage, {})
+        calls += totals["calls"] - before.get("calls", 0)
+        tokens += (totals["input_tokens"] - before.get("input_tokens", 0)
+                   + totals["output_tokens"] - before.get("output_tokens", 0))
+    rows = max(1, len(processed_data))
+    event_log.info("throughput", f"{'Combined' if combined else 'Two-call'} mode with {workers} worker(s): "
+                   f"{len(processed_data) / (elapsed / 60):.1f} rows/minute, {tokens / rows:.0f} tokens/row, "
+                   f"{calls / rows:.2f} calls/row", rows_per_minute=len(processed_data) / (elapsed / 60),
+                   tokens_per_row=tokens / rows, calls_per_row=calls / rows)
     
     return processed_data
 
 if __name__ == "__main__":
-    # File paths
-    input_file = "data/eq_scenarios_20250227-161517.csv"
-    output_file = f"data/eq_training_data_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+    parser = argparse.ArgumentParser(description='Generate a conversation history and optimal response for each scenario')
+    parser.add_argument('--input', type=str, default="data/eq_scenarios_20250227-161517.csv",
+                        help='Input CSV file with scenarios')
+    parser.add_argument('--output', type=str, default=f"data/eq_training_data_{time.strftime('%Y%m%d-%H%M%S')}.csv",
+                        help='Output CSV file for training data')
+    parser.add_argument('--persona', type=str, default=None,
+                        help='Filter to process only scenarios for this persona')
+    parser.add_argument('--max_scenarios', type=int, default=None,
+                        help='Maximum number of scenarios to process')
+    parser.add_argument('--combined', action='store_true',
+                        help='Generate history and response in one schema-enforced call per scenario')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Scenarios processed concurrently')
+    parser.add_argument('--pause', type=float, default=10,
+                        help='Seconds each worker waits after a scenario')
+    api_client.add_routing_arguments(parser)
+    parser.add_argument('--trace', type=str, default=None,
+                        help='Write a trace of API calls and pipeline steps to this JSON file (also EQ_TRACE=path)')
+    event_log.add_arguments(parser)
+    
+    args = parser.parse_args()
+    api_client.apply_routing_arguments(args)
+    if args.trace:
+        tracing.start(args.trace)
+    event_log.apply_arguments(args)
     
-    # Process all scenarios or specify parameters to process a subset
-    # Example: process_scenarios(input_file, output_file, persona_to_process="Taylor", max_scenarios=2)
-    process_scenarios(input_file, output_file) 
\ No newline at end of file
+    process_scenarios(args.input, args.output, persona_to_process=args.persona, max_scenarios=args.max_scenarios,
+                      combined=args.combined, workers=args.workers, pause=args.pause)
+    event_log.info("breaker_summary", api_client.breaker.report())
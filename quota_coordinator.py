@@ -0,0 +1,300 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import tracing
+
+try:
+    import fcntl
+except ImportError:
+    # No file locking (Windows): the coordinator is disabled and every call is allowed
+    fcntl = None
+
+# Rolling window for the request and token budgets
+WINDOW_SECONDS = 60
+# Clients not seen for this long no longer get a share of the budget
+CLIENT_TIMEOUT = 120
+LIMIT_KEYS = ("rpm", "tpm")
+
+
+def default_state_file():
+    """One state file per API key, shared by every process on the machine"""
+    key_hash = hashlib.sha256(os.getenv("ANTHROPIC_API_KEY", "").encode("utf-8")).hexdigest()[:12]
+    return os.getenv("EQ_QUOTA_FILE", os.path.join(tempfile.gettempdir(), f"eq_quota_{key_hash}.json"))
+
+
+def env_limits():
+    """Budgets set with EQ_QUOTA_RPM / EQ_QUOTA_TPM (these override the ones stored with `config`)"""
+    limits = {}
+    for key in LIMIT_KEYS:
+        value = os.getenv(f"EQ_QUOTA_{key.upper()}")
+        if value:
+            limits[key] = int(value)
+    return limits
+
+
+def estimate_request_tokens(system, messages):
+    """Rough input token estimate for a request (about 4 characters per token)"""
+    return max(1, len(json.dumps(system)) // 4 + len(json.dumps(messages)) // 4)
+
+
+class QuotaCoordinator:
+    """File-locked token bucket shared by every process using the same API key.
+
+    Each API call first asks acquire() for permission. A call is admitted when the global requests per
+    minute and tokens per minute budgets have room and, while other clients are waiting, the caller is
+    within its fair share (budget / active clients). After the call, record() replaces the token
+    estimate with the actual usage.
+
+    The coordinator only enforces budgets that were configured (EQ_QUOTA_RPM / EQ_QUOTA_TPM, or
+    `quota_coordinator.py config`), since the limits of the API key are not known otherwise; with
+    none configured every call is admitted without touching the state file.
+    """
+
+    def __init__(self, state_file=None, client_name=None):
+        self.state_file = state_file or default_state_file()
+        self.lock_file = self.state_file + ".lock"
+        self.client_id = f"{client_name or os.path.basename(sys.argv[0]) or 'python'}:{os.getpid()}"
+        # Threads of one process share its client id, so the file lock is paired with a thread lock
+        self.thread_lock = threading.Lock()
+        # EQ_QUOTA_DISABLED=1 turns the coordinator off (e.g. against the local mock API)
+        self.available = fcntl is not None and os.getenv("EQ_QUOTA_DISABLED", "").lower() not in ("true", "1", "yes")
+        # Whether any budget is configured, looked up on the first call
+        self.enabled = None
+
+    @contextmanager
+    def locked_state(self):
+        """Yield the shared state under an exclusive lock and write it back afterwards"""
+        with self.thread_lock:
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            with open(self.lock_file, "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    state = self.read_state()
+                    yield state
+                    temp_file = f"{self.state_file}.{os.getpid()}.tmp"
+                    with open(temp_file, "w") as f:
+                        json.dump(state, f)
+                    os.replace(temp_file, self.state_file)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read_state(self):
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        # Budgets stored with `config`; "limits" of older state files held built-in defaults, not real limits
+        state.pop("limits", None)
+        state.setdefault("budgets", {})
+        state.setdefault("events", [])
+        state.setdefault("clients", {})
+        # Drop calls that left the window and clients that went away
+        now = time.time()
+        state["events"] = [e for e in state["events"] if now - e["time"] < WINDOW_SECONDS]
+        state["clients"] = {
+            cid: c for cid, c in state["clients"].items()
+            if now - c["last_seen"] < CLIENT_TIMEOUT and pid_alive(c["pid"])
+        }
+        return state
+
+    def limits(self, state):
+        """The budgets in force; a budget that is not configured is unlimited (None)"""
+        limits = {**state["budgets"], **env_limits()}
+        return {key: limits.get(key) for key in LIMIT_KEYS}
+
+    def configured(self):
+        """Whether a budget is set in the environment or in the state file"""
+        if env_limits():
+            return True
+        try:
+            with open(self.state_file) as f:
+                return any(json.load(f).get("budgets", {}).values())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+    def try_acquire(self, state, tokens):
+        """Admit the call if the budgets allow it; otherwise return how long to wait"""
+        now = time.time()
+        limits = {key: value or float("inf") for key, value in self.limits(state).items()}
+        me = state["clients"].setdefault(self.client_id, {"pid": os.getpid(), "waiting_since": None})
+        me["last_seen"] = now
+
+        events = state["events"]
+        used_requests = len(events)
+        used_tokens = sum(e["tokens"] for e in events)
+        my_requests = sum(1 for e in events if e["client"] == self.client_id)
+        my_tokens = sum(e["tokens"] for e in events if e["client"] == self.client_id)
+
+        others_waiting = any(
+            c.get("waiting_since") for cid, c in state["clients"].items() if cid != self.client_id
+        )
+        active_clients = {e["client"] for e in events} | {
+            cid for cid, c in state["clients"].items() if c.get("waiting_since")
+        } | {self.client_id}
+        share = 1 / len(active_clients)
+
+        fits_globally = used_requests + 1 <= limits["rpm"] and (used_tokens + tokens <= limits["tpm"] or not events)
+        fair = not others_waiting or (
+            my_requests + 1 <= limits["rpm"] * share and my_tokens + tokens <= limits["tpm"] * share
+        )
+        if fits_globally and fair:
+            ticket = f"{self.client_id}:{now}:{random.random()}"
+            events.append({"ticket": ticket, "client": self.client_id, "time": now, "tokens": tokens})
+            me["waiting_since"] = None
+            me["requests"] = me.get("requests", 0) + 1
+            return ticket, 0
+
+        me["waiting_since"] = me.get("waiting_since") or now
+        # Wait until the oldest call in the window expires (our own first if we are over our share)
+        mine = [e["time"] for e in events if e["client"] == self.client_id]
+        oldest = min(mine) if (not fair and mine) else min((e["time"] for e in events), default=now)
+        return None, max(0.05, oldest + WINDOW_SECONDS - now)
+
+    def acquire(self, tokens):
+        """Block until the call is admitted and return its ticket"""
+        if self.enabled is None:
+            self.enabled = self.available and self.configured()
+        if not self.enabled:
+            return None
+        while True:
+            with self.locked_state() as state:
+                ticket, wait_time = self.try_acquire(state, tokens)
+            if ticket:
+                return ticket
+            # Poll at least every second so a freed fair share is noticed quickly
+            with tracing.span("quota_wait", tokens=tokens):
+                time.sleep(min(wait_time, 1.0) * random.uniform(0.8, 1.2))
+
+    def record(self, ticket, tokens):
+        """Replace the estimated tokens of an admitted call with its actual usage"""
+        if ticket is None:
+            return
+        with self.locked_state() as state:
+            for event in state["events"]:
+                if event["ticket"] == ticket:
+                    event["tokens"] = tokens
+                    break
+
+    @contextmanager
+    def permit(self, estimated_tokens):
+        """Acquire permission for one API call; call .record(usage) on the result with the response usage"""
+        ticket = self.acquire(estimated_tokens)
+        yield Permit(self, ticket)
+
+    def status(self):
+        """Current usage in the window, overall and by client"""
+        with self.locked_state() as state:
+            events = state["events"]
+            by_client = {}
+            for cid, client in state["clients"].items():
+                by_client[cid] = {
+                    "requests": sum(1 for e in events if e["client"] == cid),
+                    "tokens": sum(e["tokens"] for e in events if e["client"] == cid),
+                    "waiting": bool(client.get("waiting_since")),
+                    "total_requests": client.get("requests", 0),
+                }
+            return {
+                "state_file": self.state_file,
+                "limits": self.limits(state),
+                "requests": len(events),
+                "tokens": sum(e["tokens"] for e in events),
+                "clients": by_client,
+            }
+
+    def set_limits(self, rpm=None, tpm=None):
+        """Store the global budgets for every process (0 removes a budget); running processes that started
+        without any budget pick them up when restarted"""
+        with self.locked_state() as state:
+            for key, value in (("rpm", rpm), ("tpm", tpm)):
+                if value:
+                    state["budgets"][key] = value
+                elif value == 0:
+                    state["budgets"].pop(key, None)
+            return state["budgets"]
+
+
+class Permit:
+    def __init__(self, coordinator, ticket):
+        self.coordinator = coordinator
+        self.ticket = ticket
+
+    def record(self, usage):
+        """Record the actual tokens of the call. Cache reads are left out: the API does not count them
+        against the input tokens per minute limit."""
+        tokens = sum(getattr(usage, key, 0) or 0 for key in (
+            "input_tokens", "output_tokens", "cache_creation_input_tokens"
+        ))
+        self.coordinator.record(self.ticket, tokens)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_coordinator = None
+
+
+def get_coordinator():
+    """Return this process's coordinator client, created on first use"""
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = QuotaCoordinator()
+    return _coordinator
+
+
+def permit(system, messages):
+    """Ask the shared coordinator for permission to send a request with this system prompt and messages"""
+    return get_coordinator().permit(estimate_request_tokens(system, messages))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Show or configure the API quota shared by all running scripts')
+    parser.add_argument('command', choices=['status', 'config'],
+                        help='status: show usage by client; config: set the global budgets')
+    parser.add_argument('--rpm', type=int, default=None,
+                        help='Global requests per minute (config; 0 removes the budget)')
+    parser.add_argument('--tpm', type=int, default=None,
+                        help='Global tokens per minute (config; 0 removes the budget)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Refresh the status every 2 seconds')
+
+    args = parser.parse_args()
+
+    if fcntl is None:
+        print("File locking is not available on this platform; the quota coordinator is disabled.")
+        sys.exit(1)
+
+    coordinator = QuotaCoordinator(client_name="status")
+    if args.command == "config":
+        print(f"Limits set: {coordinator.set_limits(args.rpm, args.tpm)}")
+    else:
+        while True:
+            status = coordinator.status()
+            limits = {key: value or "unlimited" for key, value in status["limits"].items()}
+            print(f"Quota state: {status['state_file']}")
+            if not any(status["limits"].values()):
+                print("No budget configured: calls are not coordinated (set one with config or EQ_QUOTA_RPM/TPM)")
+            print(f"Last {WINDOW_SECONDS}s: {status['requests']}/{limits['rpm']} requests, "
+                  f"{status['tokens']}/{limits['tpm']} tokens")
+            for cid, usage in sorted(status["clients"].items()):
+                print(f"  {cid:<40} {usage['requests']:>4} req {usage['tokens']:>8} tok "
+                      f"{'waiting' if usage['waiting'] else 'idle':>8} ({usage['total_requests']} total)")
+            if not args.watch:
+                break
+            time.sleep(2)
+            print()
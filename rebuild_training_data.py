@@ -0,0 +1,216 @@
+import os
+import time
+import argparse
+
+import api_client
+import event_log
+import tracing
+import graceful_shutdown
+import generate_eq_training_data as generator
+
+# Read as text: a hex hash of only digits would otherwise be parsed as a number
+LINEAGE_COLUMNS = ["scenario_hash", "variations_version", "response_version"]
+
+
+def row_scenario_hash(row):
+    """The row's scenario hash; computed for rows written before rows carried lineage"""
+    key = row.get("scenario_hash")
+    if isinstance(key, str):
+        return key
+    return generator.scenario_hash(row["scenario"], row["conversation_needed"])
+
+
+def plan_rebuild(previous_rows, scenarios, versions):
+    """Group the previous output rows by scenario and decide what each scenario needs.
+
+    Returns one entry per scenario with its rows and an action: "keep" (every row is current),
+    "responses" (the variations are current, the stale responses are regenerated from them),
+    "variations" (the variations are stale, so they and all responses are regenerated) or
+    "missing" (stale, but the scenario is no longer in the input; its rows are kept as they are).
+    Rows without lineage count as stale.
+    """
+    inputs = {generator.scenario_hash(s["scenario"], s["conversation_needed"]): s for s in scenarios}
+    groups = {}
+    for row in previous_rows:
+        groups.setdefault(row_scenario_hash(row), []).append(row)
+
+    plan = []
+    for key, rows in groups.items():
+        if any(row.get("variations_version") != versions["variations_version"] for row in rows):
+            action = "variations"
+        elif any(row.get("response_version") != versions["response_version"] for row in rows):
+            action = "responses"
+        else:
+            action = "keep"
+        if action != "keep" and key not in inputs:
+            action = "missing"
+        plan.append({"scenario_hash": key, "rows": rows, "input": inputs.get(key), "action": action})
+    return plan
+
+
+def planned_calls(entry, versions, num_variations=None):
+    """API calls the rebuild makes for one plan entry"""
+    if entry["action"] == "variations":
+        return 1 + (num_variations or len(entry["rows"]))
+    if entry["action"] == "responses":
+        return sum(1 for row in entry["rows"] if row.get("response_version") != versions["response_version"])
+    return 0
+
+
+def log_plan(plan, versions, num_variations=None):
+    counts = {action: 0 for action in ("keep", "responses", "variations", "missing")}
+    for entry in plan:
+        counts[entry["action"]] += 1
+    calls = sum(planned_calls(entry, versions, num_variations) for entry in plan)
+    # A full rerun makes one variations call per scenario and one optimal response call per row
+    full_calls = sum(1 + len(entry["rows"]) for entry in plan)
+    event_log.info("rebuild_plan", "\n".join([
+        f"Current versions: variations {versions['variations_version']}, response {versions['response_version']}",
+        f"{len(plan)} scenarios: {counts['keep']} current, {counts['responses']} with stale responses, "
+        f"{counts['variations']} with stale variations, {counts['missing']} stale but not in the input (kept)",
+        f"Planned calls: {calls} instead of {full_calls} for a full rerun "
+        f"({full_calls - calls} saved, {1 - calls / max(1, full_calls):.0%})",
+    ]), **counts, calls=calls, full_calls=full_calls)
+    return calls, full_calls
+
+
+def rebuild_entry(entry, versions, shutdown, num_variations=None):
+    """Regenerate the stale parts of one scenario; returns its rows (stale rows are kept if regeneration fails)"""
+    source = entry["input"]
+    scenario, conversation_needed = source["scenario"], source["conversation_needed"]
+    persona = source.get("persona", "Unknown")
+    persona_desc = generator.persona_map.get(persona, persona)
+    lineage = {"scenario_hash": entry["scenario_hash"], **versions}
+
+    if entry["action"] == "variations":
+        variations = generator.generate_diverse_conversation_histories(
+            scenario, conversation_needed, num_variations=num_variations or len(entry["rows"])
+        )
+        if not variations:
+            return entry["rows"]
+        rows = []
+        for i, variation in enumerate(variations):
+            if shutdown.requested:
+                break
+            with event_log.context(variation=variation.get("variation_id", i + 1)):
+                response_data = generator.generate_optimal_response(scenario, variation, persona_desc)
+            if response_data:
+                rows.append(generator.training_row(scenario, conversation_needed, variation, response_data, lineage,
+                                                   persona))
+        if len(rows) < len(variations):
+            # Partial new rows would carry the current lineage and hide the missing variations from the next
+            # rebuild: keep the stale rows so the whole scenario is regenerated then
+            event_log.warning("variations_incomplete", f"Rebuilt {len(rows)} of {len(variations)} variations; "
+                              "keeping the stale rows", rebuilt=len(rows), variations=len(variations))
+            return entry["rows"]
+        return rows
+
+    rows = []
+    for row in entry["rows"]:
+        if row.get("response_version") == versions["response_version"] or shutdown.requested:
+            rows.append(row)
+            continue
+        # The variation is still current: reuse it from the row
+        variation = {key: row[key] for key in generator.VARIATION_KEYS + ["variation_id", "variation_description"]}
+        with event_log.context(variation=variation["variation_id"]):
+            response_data = generator.generate_optimal_response(scenario, variation, persona_desc)
+        rows.append(generator.training_row(scenario, conversation_needed, variation, response_data, lineage, persona)
+                    if response_data else row)
+    return rows
+
+
+def write_rows(rows, output_file):
+    import pandas as pd
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    partial_file = output_file + ".partial"
+    with tracing.span("checkpoint_write", rows=len(rows)):
+        pd.DataFrame(rows).to_csv(partial_file, index=False)
+    os.replace(partial_file, output_file)
+
+
+def rebuild(input_file, previous_file, output_file, num_variations=None, dry_run=False):
+    """Regenerate only the rows of previous_file that are stale for the current prompts and models.
+
+    The output is rewritten after every rebuilt scenario with the remaining rows unchanged, so an
+    interrupted rebuild is continued by rebuilding its output.
+    """
+    import pandas as pd
+
+    scenarios = pd.read_csv(input_file).to_dict("records")
+    previous_rows = pd.read_csv(previous_file, dtype={column: str for column in LINEAGE_COLUMNS}).to_dict("records")
+    event_log.info("rebuild_loaded", f"Loaded {len(previous_rows)} rows from {previous_file} and {len(scenarios)} "
+                   f"scenarios from {input_file}", rows=len(previous_rows), scenarios=len(scenarios))
+
+    versions = generator.prompt_versions()
+    plan = plan_rebuild(previous_rows, scenarios, versions)
+    calls, full_calls = log_plan(plan, versions, num_variations)
+    if dry_run or not calls:
+        return
+
+    before = api_client.stage_usage.snapshot()
+    shutdown = graceful_shutdown.install()
+    try:
+        for i, entry in enumerate(plan):
+            if entry["action"] not in ("variations", "responses") or shutdown.requested:
+                continue
+            with event_log.context(scenario=entry["scenario_hash"]):
+                event_log.info("scenario_start", f"Rebuilding {entry['action']} of scenario {i + 1}/{len(plan)} "
+                               f"({entry['scenario_hash']})", action=entry["action"])
+                entry["rows"] = rebuild_entry(entry, versions, shutdown, num_variations)
+            write_rows([row for e in plan for row in e["rows"]], output_file)
+    except KeyboardInterrupt as e:
+        event_log.warning("interrupted", f"Interrupted: {e}")
+    finally:
+        graceful_shutdown.uninstall()
+    write_rows([row for e in plan for row in e["rows"]], output_file)
+
+    after = api_client.stage_usage.snapshot()
+    made = sum(after.get(stage, {}).get("calls", 0) - before.get(stage, {}).get("calls", 0)
+               for stage in ("variations", "optimal_response"))
+    event_log.info("output_saved", f"Wrote {sum(len(e['rows']) for e in plan)} rows to {output_file}. Made {made} calls "
+                   f"instead of {full_calls} for a full rerun ({full_calls - made} saved)",
+                   rows=sum(len(e['rows']) for e in plan), calls=made, full_calls=full_calls)
+    if shutdown.requested:
+        event_log.info("stopped", f"Stopped early: continue with --previous {output_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Regenerate only the training data rows made stale by prompt or model changes')
+    parser.add_argument('--previous', type=str, required=True,
+                        help='Output CSV of an earlier generate_eq_training_data.py run')
+    parser.add_argument('--input', type=str, default="data/eq_scenarios_20250227-161517.csv",
+                        help='Input CSV file with the scenarios of that run')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Output CSV file (default: the previous file with a _rebuilt suffix)')
+    parser.add_argument('--variations', type=int, default=None,
+                        help='Variations to generate for scenarios with stale variations (default: as many as before)')
+    parser.add_argument('--dry_run', action='store_true',
+                        help='Only report which rows are stale and the calls a rebuild would make')
+    parser.add_argument('--hedge', action='store_true',
+                        help='Send a duplicate request when a call is slower than usual (also EQ_HEDGE=1)')
+    api_client.add_routing_arguments(parser)
+    parser.add_argument('--trace', type=str, default=None,
+                        help='Write a trace of API calls and pipeline steps to this JSON file (also EQ_TRACE=path)')
+    event_log.add_arguments(parser)
+
+    args = parser.parse_args()
+
+    if args.hedge:
+        api_client.hedging.configure(enabled=True)
+    # Routing is part of the prompt versions: a changed model makes its stage stale
+    api_client.apply_routing_arguments(args)
+    if args.trace:
+        tracing.start(args.trace)
+    event_log.apply_arguments(args)
+
+    start = time.perf_counter()
+    rebuild(
+        input_file=args.input,
+        previous_file=args.previous,
+        output_file=args.output or f"{os.path.splitext(args.previous)[0]}_rebuilt.csv",
+        num_variations=args.variations,
+        dry_run=args.dry_run,
+    )
+    event_log.info("run_done", f"Done in {time.perf_counter() - start:.1f}s", seconds=time.perf_counter() - start)
+    event_log.info("breaker_summary", api_client.breaker.report())
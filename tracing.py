@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import atexit
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+
+# Returned by span() while tracing is off, so disabled spans cost one function call
+_NULL_SPAN = nullcontext()
+
+_path = None
+_events = []
+_thread_ids = {}
+_lock = threading.Lock()
+
+
+def enabled():
+    return _path is not None
+
+
+def start(path):
+    """Record spans from now on and write them to `path` (Chrome/Perfetto trace-event JSON) at exit.
+
+    "{pid}" in the path is replaced by the process id, so several processes can trace at once.
+    """
+    global _path
+    if _path is None:
+        atexit.register(save)
+    _path = path.replace("{pid}", str(os.getpid()))
+
+
+def thread_id():
+    """Small stable id for the current thread; each thread gets its own track in the viewer"""
+    ident = threading.get_ident()
+    tid = _thread_ids.get(ident)
+    if tid is None:
+        with _lock:
+            tid = _thread_ids.setdefault(ident, len(_thread_ids) + 1)
+            _events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                            "args": {"name": threading.current_thread().name}})
+    return tid
+
+
+@contextmanager
+def _span(name, args):
+    start_us = time.perf_counter_ns() // 1000
+    event = {"name": name, "ph": "X", "pid": os.getpid(), "tid": thread_id(), "ts": start_us, "args": args}
+    try:
+        yield event["args"]
+    finally:
+        event["dur"] = time.perf_counter_ns() // 1000 - start_us
+        _events.append(event)
+
+
+def span(name, **args):
+    """Context manager timing a block as a span; yields a dict that may receive more args (e.g. tokens)"""
+    if _path is None:
+        return _NULL_SPAN
+    return _span(name, args)
+
+
+def traced(name):
+    """Decorator recording every call of the function as a span"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _path is None:
+                return function(*args, **kwargs)
+            with _span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def save():
+    """Write the spans recorded so far to the trace file"""
+    if _path is None or not _events:
+        return
+    os.makedirs(os.path.dirname(_path) or ".", exist_ok=True)
+    with _lock:
+        events = list(_events)
+    with open(_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+    print(f"Trace with {len(events)} events written to {_path} (open in ui.perfetto.dev or chrome://tracing)")
+
+
+# EQ_TRACE=path turns tracing on for any script
+if os.getenv("EQ_TRACE"):
+    start(os.getenv("EQ_TRACE"))